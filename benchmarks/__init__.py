@@ -0,0 +1,10 @@
+"""Benchmarks for loading, querying and writing the close approach data set.
+
+Each module in this package is a standalone script. To run one from the
+project root, run (for example):
+
+    $ python3 -m benchmarks.bench_extract
+
+By default, the benchmarks use the full data set in `data/` when it exists,
+and otherwise fall back to the (much smaller) test data files in `tests/`.
+"""
@@ -0,0 +1,124 @@
+"""Measure many concurrent `aquery` clients against the same queries run in turn.
+
+Each of the clients issues one query, with a filter set drawn (reproducibly)
+from a mix of full scans on distance and velocity and indexed queries on dates
+and NEO attributes. This reports:
+
+- `sequential`: every query run in turn with `query`.
+- `aquery`: every query started at once with `aquery`, so that the full scans
+  share a pass over the close approaches.
+
+For `aquery`, it also reports the median and worst latency of the clients,
+how many passes the full scans took, and the longest the event loop went
+without running a ticker task - how long the event loop was blocked.
+
+    $ python3 -m benchmarks.bench_async [--factor N] [--clients N]
+"""
+import argparse
+import asyncio
+import datetime
+import pathlib
+import random
+import statistics
+import tempfile
+import time
+import unittest.mock
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+from filters import create_filters
+
+
+def random_criteria(rng):
+    """Draw a set of criteria from the mix of queries."""
+    kind = rng.choice(('distance', 'velocity', 'both', 'date', 'neo'))
+    if kind == 'distance':
+        return dict(distance_max=rng.uniform(0.01, 0.2))
+    if kind == 'velocity':
+        return dict(velocity_min=rng.uniform(5, 40))
+    if kind == 'both':
+        return dict(distance_min=rng.uniform(0, 0.3), velocity_max=rng.uniform(5, 30))
+    if kind == 'date':
+        start = datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randrange(300))
+        return dict(start_date=start, end_date=start + datetime.timedelta(days=7))
+    return dict(hazardous=rng.choice((True, False)), diameter_min=rng.uniform(0, 2))
+
+
+async def clients(db, filter_sets):
+    """Run every query at once, and return each latency and the loop's worst stall."""
+    done = False
+    stall = 0.0
+
+    async def ticker():
+        nonlocal stall
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0)
+            now = time.perf_counter()
+            stall = max(stall, now - last)
+            last = now
+
+    async def client(filters):
+        start = time.perf_counter()
+        count = 0
+        async for _ in db.aquery(filters):
+            count += 1
+        return time.perf_counter() - start
+
+    tick = asyncio.ensure_future(ticker())
+    latencies = await asyncio.gather(*[client(filters) for filters in filter_sets])
+    done = True
+    await tick
+    return latencies, stall
+
+
+def run(neo_file, cad_file, label, n):
+    """Benchmark the clients against one close approach file."""
+    rng = random.Random(0)
+    filter_sets = [create_filters(**random_criteria(rng)) for _ in range(n)]
+    for kind, backend in (('objects', NEODatabase), ('columnar', ColumnarNEODatabase)):
+        db, _ = timed(lambda: backend(load_neos(neo_file), stream_approaches(cad_file)))
+        full_scans = sum(db.plan(filters).access == 'full scan' for filters in filter_sets)
+
+        _, sequential = timed(lambda: [sum(1 for _ in db.query(filters))
+                                       for filters in filter_sets])
+        report(f"{label} {kind} sequential", clients=n, full_scans=full_scans,
+               seconds=f"{sequential:.3f}")
+
+        loop = asyncio.new_event_loop()
+        try:
+            with unittest.mock.patch.object(db, '_execute_shared',
+                                            wraps=db._execute_shared) as shared:
+                (latencies, stall), elapsed = timed(
+                    loop.run_until_complete, clients(db, filter_sets))
+        finally:
+            loop.close()
+        chunks = -(-len(db._approaches) // db.ASYNC_CHUNK_SIZE)
+        report(f"{label} {kind} aquery", clients=n, passes=shared.call_count // chunks,
+               seconds=f"{elapsed:.3f}",
+               median_ms=f"{statistics.median(latencies) * 1000:,.1f}",
+               worst_ms=f"{max(latencies) * 1000:,.1f}",
+               stall_ms=f"{stall * 1000:,.1f}")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark concurrent async queries.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    parser.add_argument('--clients', type=int, default=100,
+                        help="How many concurrent clients to run.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    if args.factor == 1:
+        run(neo_file, cad_file, 'x1', args.clients)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        big = enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json')
+        run(neo_file, big, f'x{args.factor}', args.clients)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Compare answering many queries in one batch with answering each in turn.
+
+The queries are like a nightly job's: a date window, and distance and velocity
+thresholds, drawn reproducibly. For each number of queries, this reports how
+long it takes:
+
+- `each`: to run each query in turn with `query`.
+- `pass`: for `batch_query` to find the matching rows of every query.
+- `batch`: for `batch_query` to find them and build every matching
+  `CloseApproach` - which is also part of `each`.
+
+`scans` compares `pass` to one full scan with a single filter.
+
+    $ python3 -m benchmarks.bench_batch [--factor N]
+"""
+import argparse
+import collections
+import datetime
+import pathlib
+import random
+import tempfile
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+from filters import create_filters
+
+
+COUNTS = (1, 10, 100, 300)
+
+
+def random_criteria(rng):
+    """Draw the criteria of one query of the nightly job."""
+    start = datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randrange(365))
+    criteria = dict(start_date=start, end_date=start + datetime.timedelta(days=rng.randrange(180)))
+    if rng.random() < 0.3:
+        # Some of the queries cover every date.
+        criteria = {}
+    criteria['distance_max'] = rng.uniform(0.01, 0.5)
+    if rng.random() < 0.5:
+        criteria['velocity_min'] = rng.uniform(1, 30)
+    return criteria
+
+
+def run(neo_file, cad_file, label):
+    """Benchmark each number of queries against one close approach file."""
+    rng = random.Random(0)
+    filter_sets = [create_filters(**random_criteria(rng)) for _ in range(max(COUNTS))]
+    for kind, backend in (('objects', NEODatabase), ('columnar', ColumnarNEODatabase)):
+        db, _ = timed(lambda: backend(load_neos(neo_file), stream_approaches(cad_file)))
+        _, scan = timed(collections.deque, db.query(create_filters(distance_max=0.5)), 0)
+        report(f"{label} {kind} one full scan", seconds=f"{scan:.3f}")
+        for n in COUNTS:
+            queries = filter_sets[:n]
+            _, each = timed(lambda: [collections.deque(db.query(filters), 0)
+                                     for filters in queries])
+            _, single_pass = timed(db.batch_query, queries)
+            _, batch = timed(lambda: [collections.deque(stream, 0)
+                                      for stream in db.batch_query(queries)])
+            report(f"{label} {kind} {n} queries", each=f"{each:.3f}s",
+                   pass_=f"{single_pass:.3f}s", batch=f"{batch:.3f}s",
+                   scans=f"{single_pass / scan:,.1f}", speedup=f"{each / batch:,.1f}x")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark batch queries.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    if args.factor == 1:
+        run(neo_file, cad_file, 'x1')
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        big = enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json')
+        run(neo_file, big, f'x{args.factor}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare an interactive session's queries with and without the query cache.
+
+The session is like a user exploring the data: a broad query, the same query
+again to see more of its results, and then narrower and narrower versions of
+it. For each query, this reports how long it takes to find every matching
+close approach directly from the database, and through a `QueryCache`.
+
+    $ python3 -m benchmarks.bench_cache [--factor N]
+"""
+import argparse
+import collections
+import datetime
+import pathlib
+import tempfile
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from cache import QueryCache
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+from filters import create_filters
+
+
+SESSION = (
+    ('broad', dict(distance_max=0.3)),
+    ('again', dict(distance_max=0.3)),
+    ('+velocity', dict(distance_max=0.3, velocity_min=15)),
+    ('+dates', dict(distance_max=0.3, velocity_min=15,
+                    start_date=datetime.date(2020, 1, 1), end_date=datetime.date(2021, 12, 31))),
+    ('+hazardous', dict(distance_max=0.3, velocity_min=15, hazardous=True,
+                        start_date=datetime.date(2020, 1, 1), end_date=datetime.date(2021, 12, 31))),
+    ('again', dict(distance_max=0.3, velocity_min=15, hazardous=True,
+                   start_date=datetime.date(2020, 1, 1), end_date=datetime.date(2021, 12, 31))),
+)
+
+
+def run(neo_file, cad_file, label):
+    """Benchmark the session against one close approach file."""
+    for kind, backend in (('objects', NEODatabase), ('columnar', ColumnarNEODatabase)):
+        db, _ = timed(lambda: backend(load_neos(neo_file), stream_approaches(cad_file)))
+        cache = QueryCache(db)
+        for name, criteria in SESSION:
+            filters = create_filters(**criteria)
+            _, direct = timed(collections.deque, db.query(filters), 0)
+            _, cached = timed(lambda: collections.deque(cache.query(filters), 0))
+            report(f"{label} {kind} {name}", direct=f"{direct * 1000:,.1f}ms",
+                   cached=f"{cached * 1000:,.1f}ms", speedup=f"{direct / cached:,.1f}x")
+        report(f"{label} {kind} cache", **cache.statistics())
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the query cache.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    if args.factor == 1:
+        run(neo_file, cad_file, 'x1')
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        big = enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json')
+        run(neo_file, big, f'x{args.factor}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Compare the memory held by an `NEODatabase` and a `ColumnarNEODatabase`.
+
+For each backend, this builds a database from the data set and reports how
+much memory it retains, overall and per close approach, along with the time
+taken by a full-table `query` that matches nothing and one that matches
+everything.
+
+    $ python3 -m benchmarks.bench_columnar [--factor N]
+"""
+import argparse
+import contextlib
+import gc
+import io
+import pathlib
+import tempfile
+import tracemalloc
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+from filters import create_filters
+
+
+def retained(build):
+    """Build something, and return it and the memory it retains, in bytes."""
+    gc.collect()
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        try:
+            result = build()
+            gc.collect()
+            return result, tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+
+def run(neo_file, cad_file, label):
+    """Benchmark both backends against one close approach file."""
+    for backend in (NEODatabase, ColumnarNEODatabase):
+        db, size = retained(lambda: backend(load_neos(neo_file), stream_approaches(cad_file)))
+        count = len(db._approaches)
+        neos_size = retained(lambda: load_neos(neo_file))[1]
+
+        _, none = timed(lambda: sum(1 for _ in db.query(create_filters(distance_max=-1))))
+        _, every = timed(lambda: sum(1 for _ in db.query()))
+        report(f"{label} {backend.__name__}", rows=count,
+               total_mib=f"{size / 2 ** 20:,.1f}",
+               bytes_per_approach=f"{(size - neos_size) / count:,.0f}",
+               scan_none_ms=f"{none * 1000:,.0f}",
+               scan_all_ms=f"{every * 1000:,.0f}")
+        del db
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the database backends.")
+    parser.add_argument('--factor', type=int, default=10,
+                        help="How many times to enlarge the data set.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        big = enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json')
+        run(neo_file, cad_file, 'x1')
+        run(neo_file, big, f'x{args.factor}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Measure the throughput of exporting every close approach to CSV.
+
+The batched `write.write_to_csv` is compared with the original version, which
+built a dict for each result and wrote it with `csv.DictWriter.writerow`.
+
+    $ python3 -m benchmarks.bench_csv [--factor N]
+"""
+import argparse
+import csv
+import pathlib
+import tempfile
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+from write import write_to_csv
+
+
+FIELDNAMES = ('datetime_utc', 'distance_au', 'velocity_km_s',
+              'designation', 'name', 'diameter_km', 'potentially_hazardous')
+
+
+def write_to_csv_with_dicts(results, filename):
+    """Write close approaches to CSV the original way, a dict at a time."""
+    with open(filename, 'w', encoding='UTF8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES, lineterminator='\n')
+        writer.writeheader()
+        for result in results:
+            writer.writerow({
+                'datetime_utc': result.time,
+                'distance_au': result.distance,
+                'velocity_km_s': result.velocity,
+                'designation': result.designation,
+                'name': result.neo.name,
+                'diameter_km': result.neo.diameter,
+                'potentially_hazardous': result.neo.hazardous,
+            })
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark writing CSV.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        if args.factor > 1:
+            cad_file = enlarge_cad(cad_file, args.factor, tmp / 'cad.json')
+        for kind, backend in (('objects', NEODatabase), ('columnar', ColumnarNEODatabase)):
+            db, _ = timed(lambda: backend(load_neos(neo_file), stream_approaches(cad_file)))
+            rows = len(db._approaches)
+            elapsed = {}
+            for label, writer in (('dicts', write_to_csv_with_dicts), ('batched', write_to_csv)):
+                outfile = tmp / f'{label}.csv'
+                _, elapsed[label] = timed(writer, db.query(), outfile)
+                report(f"x{args.factor} {kind} {label}", rows=rows,
+                       rows_s=f"{rows / elapsed[label]:,.0f}",
+                       seconds=f"{elapsed[label]:.3f}")
+            same = (tmp / 'dicts.csv').read_bytes() == (tmp / 'batched.csv').read_bytes()
+            report(f"x{args.factor} {kind} speedup",
+                   speedup=f"{elapsed['dicts'] / elapsed['batched']:,.2f}x", identical=same)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Compare parsing NASA's calendar dates with `strptime` and `cd_to_datetime`.
+
+This reports how many calendar dates per second each parser converts, over the
+`cd` field of every close approach, and how long `extract.load_approaches`
+takes with each of them.
+
+    $ python3 -m benchmarks.bench_dates [--factor N]
+"""
+import argparse
+import datetime
+import json
+import pathlib
+import tempfile
+import unittest.mock
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from extract import load_approaches
+from helpers import cd_to_datetime
+
+
+def strptime(calendar_date):
+    """Parse a calendar date the way `cd_to_datetime` used to."""
+    return datetime.datetime.strptime(calendar_date, "%Y-%b-%d %H:%M")
+
+
+def run(cad_file, label):
+    """Benchmark both parsers against one close approach file."""
+    with open(cad_file) as f:
+        contents = json.load(f)
+    index = contents['fields'].index('cd')
+    dates = [row[index] for row in contents['data']]
+
+    expected, slow = timed(lambda: list(map(strptime, dates)))
+    received, fast = timed(lambda: list(map(cd_to_datetime, dates)))
+    assert received == expected
+    report(f"{label} parse", dates=len(dates),
+           strptime=f"{len(dates) / slow:,.0f}/s",
+           fast=f"{len(dates) / fast:,.0f}/s",
+           speedup=f"{slow / fast:,.1f}x")
+
+    with unittest.mock.patch('models.cd_to_datetime', strptime):
+        _, slow = timed(load_approaches, cad_file)
+    _, fast = timed(load_approaches, cad_file)
+    report(f"{label} load_approaches", strptime=f"{slow:.3f}s", fast=f"{fast:.3f}s",
+           speedup=f"{slow / fast:,.1f}x")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark calendar date parsing.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the data set.")
+    args = parser.parse_args()
+
+    _, cad_file = data_files()
+    if args.factor == 1:
+        run(cad_file, 'x1')
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        run(enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json'),
+            f'x{args.factor}')
+
+
+if __name__ == '__main__':
+    main()
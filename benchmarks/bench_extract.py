@@ -0,0 +1,50 @@
+"""Compare `load_approaches` to the streaming `stream_approaches` loader.
+
+For the data set and a synthetically enlarged copy of it, this reports each
+loader's throughput (close approaches per second) and its peak memory while
+loading and linking an `NEODatabase`.
+
+    $ python3 -m benchmarks.bench_extract [--factor N]
+"""
+import argparse
+import pathlib
+import tempfile
+
+from benchmarks.common import data_files, enlarge_cad, report, timed, traced
+from database import NEODatabase
+from extract import load_neos, load_approaches, stream_approaches
+
+
+def build(neo_file, loader, cad_file):
+    """Load close approaches with `loader` and link them to fresh NEOs."""
+    return NEODatabase(load_neos(neo_file), loader(cad_file))
+
+
+def run(neo_file, cad_file, label):
+    """Benchmark both loaders against one close approach file."""
+    for name, loader in (('load_approaches', load_approaches),
+                         ('stream_approaches', stream_approaches)):
+        db, seconds = timed(build, neo_file, loader, cad_file)
+        peak = traced(build, neo_file, loader, cad_file)
+        count = len(db._approaches)
+        report(f"{label} {name}", rows=count,
+               rows_per_s=f"{count / seconds:,.0f}",
+               peak_mib=f"{peak / 2 ** 20:,.1f}")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the cad.json loaders.")
+    parser.add_argument('--factor', type=int, default=10,
+                        help="How many times to enlarge the data set.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        big = enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json')
+        run(neo_file, cad_file, 'x1')
+        run(neo_file, big, f'x{args.factor}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Compare per-row and column-wise evaluation of each kind of filter.
+
+For each kind of filter, this reports how many close approaches per second are
+scanned by:
+
+- `objects`: `NEODatabase.query`, calling the filter on each `CloseApproach`.
+- `rows`: `ColumnarNEODatabase.query`, calling the filter on each row.
+- `columns`: `ColumnarNEODatabase.query`, evaluating the filter column-wise.
+
+The criteria are selective, so the scan dominates rather than building the
+matching close approaches.
+
+    $ python3 -m benchmarks.bench_filters [--factor N]
+"""
+import argparse
+import datetime
+import pathlib
+import tempfile
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+from filters import create_filters
+
+
+CRITERIA = {
+    'date': dict(date=datetime.date(2020, 3, 2)),
+    'date range': dict(start_date=datetime.date(2020, 3, 1),
+                       end_date=datetime.date(2020, 3, 7)),
+    'distance': dict(distance_max=0.001),
+    'velocity': dict(velocity_min=40),
+    'diameter': dict(diameter_min=1),
+    'hazardous': dict(hazardous=True, velocity_max=5),
+    'combined': dict(start_date=datetime.date(2020, 1, 1), distance_max=0.05,
+                     velocity_min=30, hazardous=True),
+}
+
+
+class RowWise:
+    """Wrap a filter so that it can only be called on one row at a time."""
+
+    def __init__(self, flt):
+        """Create a new `RowWise` filter wrapping another filter."""
+        self.flt = flt
+
+    def __call__(self, approach):
+        """Invoke `self(approach)`."""
+        return self.flt(approach)
+
+
+def scan(db, filters):
+    """Count the results of a query."""
+    return sum(1 for _ in db.query(filters))
+
+
+def run(neo_file, cad_file, label):
+    """Benchmark each kind of filter against one close approach file."""
+    (db, columnar), _ = timed(lambda: (
+        NEODatabase(load_neos(neo_file), stream_approaches(cad_file)),
+        ColumnarNEODatabase(load_neos(neo_file), stream_approaches(cad_file))))
+    rows = len(columnar._time)
+
+    for name, criteria in CRITERIA.items():
+        filters = create_filters(**criteria)
+        matches, objects = timed(scan, db, filters)
+        _, per_row = timed(scan, columnar, [RowWise(flt) for flt in filters])
+        _, columns = timed(scan, columnar, filters)
+        report(f"{label} {name}", matches=matches,
+               objects=f"{rows / objects:,.0f}/s",
+               rows=f"{rows / per_row:,.0f}/s",
+               columns=f"{rows / columns:,.0f}/s",
+               speedup=f"{objects / columns:,.1f}x")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark filter evaluation.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the data set.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    if args.factor == 1:
+        run(neo_file, cad_file, 'x1')
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        big = enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json')
+        run(neo_file, big, f'x{args.factor}')
+
+
+if __name__ == '__main__':
+    main()
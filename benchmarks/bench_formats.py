@@ -0,0 +1,54 @@
+"""Measure the throughput of exporting every close approach in each format.
+
+Every close approach is written as CSV, JSON and JSON Lines, both plain and
+compressed with gzip, bz2 and xz - and, when compressed, also with the writing
+and compression moved to a background thread. Each row reports the rows and
+uncompressed megabytes written per second, and the size of the file.
+
+    $ python3 -m benchmarks.bench_formats [--factor N]
+"""
+import argparse
+import pathlib
+import tempfile
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase
+from extract import load_neos, stream_approaches
+from write import write_to_csv, write_to_json, write_to_jsonl
+
+
+WRITERS = (('csv', write_to_csv), ('json', write_to_json), ('jsonl', write_to_jsonl))
+COMPRESSIONS = ('', '.gz', '.bz2', '.xz')
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the output formats.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        if args.factor > 1:
+            cad_file = enlarge_cad(cad_file, args.factor, tmp / 'cad.json')
+        db, _ = timed(lambda: NEODatabase(load_neos(neo_file), stream_approaches(cad_file)))
+        rows = len(db._approaches)
+
+        for suffix, writer in WRITERS:
+            plain = tmp / f'all.{suffix}'
+            writer(db.query(), plain)
+            raw = plain.stat().st_size
+            for compression in COMPRESSIONS:
+                for background in ((False, True) if compression else (False,)):
+                    outfile = tmp / f'all.{suffix}{compression}'
+                    _, elapsed = timed(writer, db.query(), outfile, background=background)
+                    label = f"{suffix}{compression}{' background' if background else ''}"
+                    report(f"x{args.factor} {label}", rows_s=f"{rows / elapsed:,.0f}",
+                           mib_s=f"{raw / elapsed / 2 ** 20:,.1f}",
+                           size_mib=f"{outfile.stat().st_size / 2 ** 20:,.2f}")
+
+
+if __name__ == '__main__':
+    main()
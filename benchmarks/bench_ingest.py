@@ -0,0 +1,93 @@
+"""Compare ingesting a small delta of close approaches with rebuilding the database.
+
+The delta is 1% as many new close approaches as the database holds - either
+after its last approach (`tail`), which keeps the rows in chronological order,
+or throughout its time span (`spread`), which has to be spliced into the index
+of approach times. For each backend, this reports how long it takes to:
+
+- `rebuild`: read the data files again, with the delta, and build the database.
+- `ingest`: merge the delta into the database that's already built.
+
+and then, to save the result, how long it takes to:
+
+- `resave`: save the whole database to a snapshot again.
+- `append`: append just the delta to the snapshot it was restored from.
+
+along with how long it takes to restore the snapshot, into columns, after each
+(`restore_resaved` and `restore_appended`) - the latter ingests the delta again.
+
+    $ python3 -m benchmarks.bench_ingest [--factor N]
+"""
+import argparse
+import copy
+import datetime
+import pathlib
+import random
+import tempfile
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+from snapshot import read_snapshot, write_snapshot, append_snapshot
+
+
+def make_delta(approaches, kind, rng):
+    """Make 1% as many new close approaches, shifted from some existing ones."""
+    count = max(1, len(approaches) // 100)
+    if kind == 'tail':
+        chosen, shift = approaches[-count:], datetime.timedelta(days=3650)
+    else:
+        chosen, shift = rng.sample(approaches, count), datetime.timedelta(minutes=1)
+    delta = [copy.copy(approach) for approach in chosen]
+    for approach in delta:
+        approach.time += shift
+    return delta
+
+
+def run(neo_file, cad_file, label, tmp):
+    """Benchmark both kinds of delta against one close approach file."""
+    rng = random.Random(2020)
+    approaches = list(stream_approaches(cad_file))
+    sources = (neo_file, cad_file)
+    appended, resaved = tmp / 'appended.snapshot', tmp / 'resaved.snapshot'
+    for kind, backend in (('objects', NEODatabase), ('columnar', ColumnarNEODatabase)):
+        for shape in ('tail', 'spread'):
+            delta = make_delta(approaches, shape, rng)
+            _, rebuild = timed(lambda: backend(load_neos(neo_file),
+                                               list(stream_approaches(cad_file)) + delta))
+            db = backend(load_neos(neo_file), stream_approaches(cad_file))
+            write_snapshot(db, appended, sources)
+            counts, ingest = timed(db.ingest, (), delta)
+            report(f"{label} {kind} {shape}", delta=counts['new approaches'],
+                   rebuild=f"{rebuild * 1000:,.1f}ms", ingest=f"{ingest * 1000:,.1f}ms",
+                   fraction=f"{ingest / rebuild:.1%}")
+
+            # Saving again also builds the k-d tree again, as the delta left it
+            # out of date.
+            _, resave = timed(write_snapshot, db, resaved, sources)
+            _, append = timed(append_snapshot, appended, (), delta)
+            _, restore_resaved = timed(read_snapshot, resaved, sources, columnar=True)
+            _, restore_appended = timed(read_snapshot, appended, sources, columnar=True)
+            report(f"{label} {kind} {shape} save", resave=f"{resave * 1000:,.1f}ms",
+                   append=f"{append * 1000:,.1f}ms",
+                   restore_resaved=f"{restore_resaved * 1000:,.1f}ms",
+                   restore_appended=f"{restore_appended * 1000:,.1f}ms")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark ingesting a delta.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        if args.factor != 1:
+            cad_file = enlarge_cad(cad_file, args.factor, tmp / 'cad.json')
+        run(neo_file, cad_file, f'x{args.factor}', tmp)
+
+
+if __name__ == '__main__':
+    main()
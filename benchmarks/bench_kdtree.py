@@ -0,0 +1,64 @@
+"""Compare answering combined distance and velocity ranges with and without the k-d tree.
+
+For each query, this reports how long it takes to find every matching close
+approach by checking the filters on every row (`scan`), and from the k-d tree
+(`tree`), along with how many close approaches match. It also reports how long
+the tree takes to build, which the planner only pays for once the queries
+that could have used it add up to about as much (see `_rent_kd_tree`).
+
+    $ python3 -m benchmarks.bench_kdtree [--factor N]
+"""
+import argparse
+import collections
+import pathlib
+import tempfile
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase, ColumnarNEODatabase, QueryPlan
+from extract import load_neos, stream_approaches
+from filters import create_filters
+
+
+QUERIES = (
+    ('close and fast', dict(distance_max=0.01, velocity_min=25)),
+    ('very close', dict(distance_max=0.001)),
+    ('narrow box', dict(distance_min=0.05, distance_max=0.051, velocity_min=10, velocity_max=11)),
+    ('very fast', dict(velocity_min=40, distance_max=0.2)),
+)
+
+
+def run(neo_file, cad_file, label):
+    """Benchmark the queries against one close approach file."""
+    for kind, backend in (('objects', NEODatabase), ('columnar', ColumnarNEODatabase)):
+        db = backend(load_neos(neo_file), stream_approaches(cad_file))
+        _, build = timed(db._kd_tree_index)
+        report(f"{label} {kind} build", tree=f"{build * 1000:,.1f}ms")
+        for name, criteria in QUERIES:
+            filters = create_filters(**criteria)
+            scan_plan = QueryPlan(QueryPlan.FULL_SCAN, filters, [len(db._time_order)])
+            plan = db.plan(filters)
+            matches, scan = timed(lambda: len(list(db._execute(scan_plan))))
+            _, tree = timed(collections.deque, db._execute(plan), 0)
+            report(f"{label} {kind} {name}", access=plan.access, matches=matches,
+                   scan=f"{scan * 1000:,.2f}ms", tree=f"{tree * 1000:,.2f}ms",
+                   speedup=f"{scan / tree:,.1f}x")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the k-d tree.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    if args.factor == 1:
+        run(neo_file, cad_file, 'x1')
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        big = enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json')
+        run(neo_file, big, f'x{args.factor}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Compare start-up time and peak memory of eager and lazy model conversion.
+
+Each run is a fresh `python3 main.py --no-snapshot` process that builds the
+database from the data files, either converting every field up front (eager)
+or with `--lazy`. This reports the wall time and the peak resident set size of
+each process, for an `inspect` and for a narrow `query`.
+
+    $ python3 -m benchmarks.bench_lazy [--runs N] [--factor N]
+"""
+import argparse
+import csv
+import os
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import PROJECT_ROOT, data_files, enlarge_cad, report
+
+
+def run_main(*args):
+    """Run main.py once, and return the elapsed seconds and peak RSS in MiB."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, str(PROJECT_ROOT / 'main.py'), *args],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    _, status, usage = os.wait4(process.pid, 0)
+    elapsed = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, process.args)
+    # ru_maxrss is in KiB on Linux.
+    return elapsed, usage.ru_maxrss / 1024
+
+
+def run(neo_file, cad_file, runs, label):
+    """Benchmark eager and lazy start-up against one pair of data files."""
+    with open(neo_file, newline='') as f:
+        pdes = next(csv.DictReader(f))['pdes']
+    commands = {
+        'inspect': ['inspect', '--pdes', pdes],
+        'query': ['query', '--date', '2020-03-02'],
+    }
+    common = ['--no-snapshot', '--neofile', str(neo_file), '--cadfile', str(cad_file)]
+    for name, command in commands.items():
+        for mode, flags in (('eager', []), ('lazy', ['--lazy'])):
+            results = [run_main(*common, *flags, *command) for _ in range(runs)]
+            report(f"{label} {name} {mode}",
+                   best_ms=f"{min(elapsed for elapsed, _ in results) * 1000:,.0f}",
+                   peak_rss_mib=f"{max(rss for _, rss in results):,.1f}")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark lazy model conversion.")
+    parser.add_argument('--runs', type=int, default=3,
+                        help="How many times to run each configuration.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    if args.factor == 1:
+        run(neo_file, cad_file, args.runs, 'x1')
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        big = enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json')
+        run(neo_file, big, args.runs, f'x{args.factor}')
+
+
+if __name__ == '__main__':
+    main()
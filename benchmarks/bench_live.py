@@ -0,0 +1,81 @@
+"""Measure how a background reload affects the commands answered meanwhile.
+
+A `LiveDatabase` is built from a copy of the data files, and the close approach
+file is then touched, so that it's reloaded in the background. While the new
+version is being built, the old one keeps answering a one-day query. This
+reports:
+
+- `reload`: how long the background build took.
+- `idle` and `reloading`: the median time of the query with no reload going
+  on, and while the reload was being built (the build holds the GIL for much
+  of the time, so queries slow down - but they're still answered).
+- `swap`: how long `refresh` took to swap the new version in.
+
+    $ python3 -m benchmarks.bench_live [--factor N]
+"""
+import argparse
+import collections
+import datetime
+import os
+import pathlib
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+from filters import create_filters
+from live import LiveDatabase
+
+
+def run(neo_file, cad_file, label):
+    """Benchmark a reload of one close approach file."""
+    day = create_filters(date=datetime.date(2020, 1, 1))
+    for kind, backend in (('objects', NEODatabase), ('columnar', ColumnarNEODatabase)):
+        def load():
+            database = backend(load_neos(neo_file), stream_approaches(cad_file))
+            database._ensure_indexed()
+            return database
+
+        reloader, _ = timed(LiveDatabase, load, [neo_file, cad_file], interval=0.01)
+        database = reloader.database
+        idle = [timed(collections.deque, database.query(day), 0)[1] for _ in range(20)]
+
+        os.utime(cad_file)
+        reloader.start()
+        busy = []
+        swapped, swap = False, 0
+        while not swapped:
+            busy.append(timed(collections.deque, database.query(day), 0)[1])
+            swapped, swap = timed(reloader.refresh)
+            time.sleep(0.001)
+        reloader.stop()
+
+        _, _, seconds = reloader.history[-1]
+        report(f"{label} {kind}", reload=f"{seconds * 1000:,.1f}ms",
+               idle=f"{statistics.median(idle) * 1000:,.2f}ms",
+               reloading=f"{statistics.median(busy) * 1000:,.2f}ms", queries=len(busy),
+               swap=f"{swap * 1e6:,.1f}us")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark reloading in the background.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        if args.factor > 1:
+            cad_file = enlarge_cad(cad_file, args.factor, tmp / 'cad.json')
+        else:
+            cad_file = shutil.copy(cad_file, tmp / 'cad.json')
+        run(neo_file, cad_file, f'x{args.factor}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Report the memory retained per NEO and per close approach.
+
+The "after" rows load the data files as usual, with slotted model classes and
+interned designations. The "before" rows load them with equivalent model
+classes that have a per-instance `__dict__`, and without interning, as the
+models were originally.
+
+The memory retained by the loaded objects (not the peak while parsing) is
+measured with `tracemalloc` and divided by the number of objects, so it
+includes each object's strings and numbers as well as the object itself.
+
+    $ python3 -m benchmarks.bench_models
+"""
+import argparse
+import contextlib
+import gc
+import io
+import sys
+import tracemalloc
+import types
+import unittest.mock
+
+import extract
+from benchmarks.common import data_files, report
+from models import NearEarthObject, CloseApproach
+
+
+def unslotted(cls):
+    """Return a copy of a model class that has a `__dict__` instead of slots."""
+    namespace = {name: value for name, value in vars(cls).items()
+                 if name not in ('__slots__', '__weakref__')
+                 and not isinstance(value, types.MemberDescriptorType)}
+    return type(cls.__name__, (), namespace)
+
+
+def retained(func, *args):
+    """Call a function, and return its result and the bytes it keeps allocated."""
+    gc.collect()
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        try:
+            result = func(*args)
+            gc.collect()
+            return result, tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+
+
+def measure(neo_file, cad_file):
+    """Return the bytes retained per NEO and per close approach."""
+    neos, neo_bytes = retained(extract.load_neos, neo_file)
+    approaches, approach_bytes = retained(extract.load_approaches, cad_file)
+    return neo_bytes / len(neos), approach_bytes / len(approaches), len(neos), len(approaches)
+
+
+def main():
+    """Run the benchmark."""
+    argparse.ArgumentParser(description="Report memory per model object.").parse_args()
+    neo_file, cad_file = data_files()
+
+    with unittest.mock.patch('extract.NearEarthObject', unslotted(NearEarthObject)), \
+            unittest.mock.patch('extract.CloseApproach', unslotted(CloseApproach)), \
+            unittest.mock.patch('sys.intern', lambda string: string):
+        before = measure(neo_file, cad_file)
+    after = measure(neo_file, cad_file)
+
+    for label, (per_neo, per_approach, neos, approaches) in (('before', before),
+                                                              ('after', after)):
+        report(label, neos=neos, bytes_per_neo=f"{per_neo:,.0f}",
+               approaches=approaches, bytes_per_approach=f"{per_approach:,.0f}")
+    report('saved', per_neo=f"{1 - after[0] / before[0]:.0%}",
+           per_approach=f"{1 - after[1] / before[1]:.0%}")
+    print(f"(Python {sys.version.split()[0]})")
+
+
+if __name__ == '__main__':
+    main()
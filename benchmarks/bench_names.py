@@ -0,0 +1,88 @@
+"""Compare prefix and fuzzy searches of NEO names with scanning every NEO.
+
+For each search, this reports the average time over several repetitions:
+
+- `scan`: to check every NEO's designation and name in turn - with
+  `str.startswith` for a prefix, and with `difflib` for a fuzzy search.
+- `index`: to search the database's `NameIndex`.
+
+`--factor N` adds N - 1 renamed copies of each NEO, for a data set with as many
+NEOs as the full one (about 25,000) when benchmarking with the test data.
+
+    $ python3 -m benchmarks.bench_names [--factor N]
+"""
+import argparse
+import difflib
+import time
+
+from benchmarks.common import data_files, report, timed
+from database import NEODatabase
+from extract import load_neos
+from models import NearEarthObject
+from names import normalize
+
+
+SEARCHES = (
+    ('prefix', '2020 AY'),
+    ('prefix', '433'),
+    ('prefix', 'cer'),
+    ('fuzzy', 'cerberos'),
+    ('fuzzy', '1685 toro'),
+    ('fuzzy', '2020 ay'),
+    ('fuzzy', '2019 xk12'),
+)
+
+REPEAT = 5
+
+
+def average(func, *args):
+    """Return the average seconds a call takes, over `REPEAT` calls."""
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func(*args)
+    return (time.perf_counter() - start) / REPEAT
+
+
+def scan_prefix(neos, prefix, limit=10):
+    """Find NEOs by prefix without an index."""
+    prefix = normalize(prefix)
+    return [neo for neo in neos
+            if normalize(neo.designation).startswith(prefix)
+            or (neo.name and normalize(neo.name).startswith(prefix))][:limit]
+
+
+def scan_fuzzy(neos, text, limit=10):
+    """Find NEOs by similarity without an index."""
+    text = normalize(text)
+    return difflib.get_close_matches(text, [normalize(neo.designation) for neo in neos]
+                                     + [normalize(neo.name) for neo in neos if neo.name],
+                                     n=limit, cutoff=0.5)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark searching NEO names.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the NEO data.")
+    args = parser.parse_args()
+
+    neo_file, _ = data_files()
+    neos, _ = timed(load_neos, neo_file)
+    neos += [NearEarthObject(designation=f"{neo.designation}-{copy}",
+                             name=neo.name and f"{neo.name}-{copy}")
+             for copy in range(1, args.factor) for neo in neos]
+    db = NEODatabase(neos, [], lazy=True)
+    _, build = timed(db._names)
+    report(f"x{args.factor} build", neos=f"{len(neos):,}", seconds=f"{build:.3f}")
+
+    for kind, text in SEARCHES:
+        if kind == 'prefix':
+            scan, index = average(scan_prefix, neos, text), average(db.find_neos_by_prefix, text)
+        else:
+            scan, index = average(scan_fuzzy, neos, text), average(db.find_neos_like, text)
+        report(f"x{args.factor} {kind} {text!r}", scan=f"{scan * 1000:,.2f}ms",
+               index=f"{index * 1000:,.3f}ms", speedup=f"{scan / index:,.0f}x")
+
+
+if __name__ == '__main__':
+    main()
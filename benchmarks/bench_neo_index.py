@@ -0,0 +1,62 @@
+"""Compare answering NEO-level filters from the NEO indexes with a full scan.
+
+For each set of criteria on NEO attributes, this reports how long a query
+takes when planned as an NEO scan (selecting the matching NEOs from the NEO
+indexes and merging their close approaches) and when forced into a full scan
+(by wrapping each filter so that the planner can't see what it tests).
+
+    $ python3 -m benchmarks.bench_neo_index [--factor N]
+"""
+import argparse
+import pathlib
+import tempfile
+
+from benchmarks.bench_filters import RowWise, scan
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+from filters import create_filters
+
+
+CRITERIA = {
+    'hazardous': dict(hazardous=True),
+    'diameter': dict(diameter_min=1),
+    'hazardous & diameter': dict(hazardous=True, diameter_min=1),
+    'large diameter': dict(diameter_min=5),
+}
+
+
+def run(neo_file, cad_file, label):
+    """Benchmark each set of criteria against one close approach file."""
+    for kind, backend in (('objects', NEODatabase), ('columnar', ColumnarNEODatabase)):
+        db, _ = timed(lambda: backend(load_neos(neo_file), stream_approaches(cad_file)))
+        for name, criteria in CRITERIA.items():
+            filters = create_filters(**criteria)
+            plan = db.plan(filters)
+            matches, indexed = timed(scan, db, filters)
+            _, full = timed(scan, db, [RowWise(flt) for flt in filters])
+            report(f"{label} {kind} {name}", matches=matches,
+                   plan=plan.access.replace(' ', '-'),
+                   indexed=f"{indexed * 1000:,.2f}ms",
+                   full=f"{full * 1000:,.2f}ms",
+                   speedup=f"{full / indexed:,.1f}x")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the NEO indexes.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the data set.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    if args.factor == 1:
+        run(neo_file, cad_file, 'x1')
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        big = enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json')
+        run(neo_file, big, f'x{args.factor}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare opening a `.neodb` file with restoring a snapshot.
+
+For the same close approach data, this reports for a columnar snapshot and for
+a `.neodb` file:
+
+- `open`: how long it takes to restore or open the database.
+- `memory`: the peak memory traced while doing so. The pages of a `.neodb`
+  file are mapped rather than allocated, so they aren't counted - they're
+  shared with every other process that opens the file.
+- `inspect` and `day`: how long it then takes to look up an NEO with all of its
+  close approaches, and to query one day of close approaches.
+
+    $ python3 -m benchmarks.bench_neodb [--factor N]
+"""
+import argparse
+import collections
+import datetime
+import pathlib
+import tempfile
+
+from benchmarks.common import data_files, enlarge_cad, report, timed, traced
+from database import ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+from filters import create_filters
+from neodb import open_database, write_database
+from snapshot import read_snapshot, write_snapshot
+
+
+def run(neo_file, cad_file, label, tmp):
+    """Benchmark both formats for one close approach file."""
+    db = ColumnarNEODatabase(load_neos(neo_file), stream_approaches(cad_file))
+    snapshot, dbfile = tmp / 'neo.snapshot', tmp / 'neo.neodb'
+    write_snapshot(db, snapshot, (neo_file, cad_file))
+    write_database(db, dbfile, (neo_file, cad_file))
+    designation = max(db._neos, key=lambda neo: len(neo.approaches)).designation
+    day = create_filters(date=datetime.date(2020, 1, 1))
+    del db
+
+    for kind, restore in (('snapshot', lambda: read_snapshot(snapshot, (neo_file, cad_file),
+                                                             columnar=True)),
+                          ('neodb', lambda: open_database(dbfile))):
+        memory = traced(restore)
+        db, seconds = timed(restore)
+        _, inspect = timed(lambda: list(db.get_neo_by_designation(designation).approaches))
+        _, query = timed(collections.deque, db.query(day), 0)
+        report(f"{label} {kind}", open=f"{seconds * 1000:,.1f}ms",
+               memory=f"{memory / 2 ** 20:,.1f}MiB", inspect=f"{inspect * 1000:,.2f}ms",
+               day=f"{query * 1000:,.2f}ms")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark opening a .neodb file.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        if args.factor > 1:
+            cad_file = enlarge_cad(cad_file, args.factor, tmp / 'cad.json')
+        run(neo_file, cad_file, f'x{args.factor}', tmp)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Compare the projected NEO loader with one built on `csv.DictReader`.
+
+`extract.load_neos` reads only the four columns it needs from each row, with
+positions looked up once in the header. The reference loader is the original
+`csv.DictReader` version, which builds a dictionary of every column of every
+row. Both are timed on the NEO file and on synthetic enlargements of it.
+
+    $ python3 -m benchmarks.bench_neos [--factor N]
+"""
+import argparse
+import csv
+import pathlib
+import sys
+import tempfile
+
+from benchmarks.common import data_files, enlarge_neos, report, timed
+from extract import load_neos
+from models import NearEarthObject
+
+
+def load_neos_with_dict_reader(neo_csv_path):
+    """Load NEOs the original way, with a dictionary per row."""
+    neos = []
+    with open(neo_csv_path, 'r') as infile:
+        for row in csv.DictReader(infile, delimiter=','):
+            neos.append(NearEarthObject(designation=sys.intern(row['pdes']),
+                                        name=sys.intern(row['name']),
+                                        diameter=row['diameter'],
+                                        hazardous=row['pha']))
+    return neos
+
+
+def run(neo_file, label):
+    """Benchmark both loaders against one NEO file."""
+    expected, before = timed(load_neos_with_dict_reader, neo_file)
+    received, after = timed(load_neos, neo_file)
+    assert [repr(neo) for neo in received] == [repr(neo) for neo in expected]
+    report(label, neos=len(received), dict_reader=f"{before:.3f}s",
+           projected=f"{after:.3f}s", speedup=f"{before / after:.1f}x")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark loading NEOs.")
+    parser.add_argument('--factor', type=int, default=10,
+                        help="How many times to enlarge the NEO file.")
+    args = parser.parse_args()
+
+    neo_file, _ = data_files()
+    run(neo_file, 'x1')
+    with tempfile.TemporaryDirectory() as tmp:
+        run(enlarge_neos(neo_file, args.factor, pathlib.Path(tmp) / 'neos.csv'),
+            f'x{args.factor}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Measure how loading the data files scales with the number of workers.
+
+For each number of workers from 1 to N, this reports how long
+`parallel.load_database` takes to build a database, alongside the serial
+`NEODatabase(load_neos(...), stream_approaches(...))` for reference. The
+close approach file is written with its "fields" header first, as NASA's API
+does, so that it can be split.
+
+    $ python3 -m benchmarks.bench_parallel [--factor N] [--workers N]
+"""
+import argparse
+import os
+import pathlib
+import tempfile
+
+import parallel
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark parallel loading.")
+    parser.add_argument('--factor', type=int, default=10,
+                        help="How many times to enlarge the close approach data.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help="The largest number of workers to try.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        big = enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json')
+        for columnar in (False, True):
+            backend = ColumnarNEODatabase if columnar else NEODatabase
+            kind = 'columnar' if columnar else 'objects'
+            db, serial = timed(lambda: backend(load_neos(neo_file), stream_approaches(big)))
+            report(f"x{args.factor} {kind} serial", approaches=len(db._approaches),
+                   seconds=f"{serial:.3f}")
+            for workers in range(1, args.workers + 1):
+                _, elapsed = timed(parallel.load_database, neo_file, big, workers,
+                                   columnar=columnar)
+                report(f"x{args.factor} {kind} workers={workers}", seconds=f"{elapsed:.3f}",
+                       speedup=f"{serial / elapsed:.2f}x")
+    print(f"({os.cpu_count()} CPUs)")
+
+
+if __name__ == '__main__':
+    main()
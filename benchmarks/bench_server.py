@@ -0,0 +1,104 @@
+"""Compare the latency of answering a query in a fresh process and via a server.
+
+A fresh `python3 main.py query` process either builds the database from the
+data files (cold) or restores it from a snapshot (warm). With a `main.py serve`
+process running, the same command is routed to the server instead - which
+still pays for interpreter start-up and imports - and a round trip straight
+from this process with `server.request` shows the server's own latency, alone
+and with several requests at once.
+
+    $ python3 -m benchmarks.bench_server [--runs N] [--clients N]
+"""
+import argparse
+import io
+import pathlib
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_startup import run_main
+from benchmarks.common import PROJECT_ROOT, data_files, report
+import main as cli
+import server
+
+
+COMMAND = ['query', '--start-date', '2020-01-01', '--end-date', '2020-01-31',
+           '--max-distance', '0.025']
+
+
+def round_trip(path, params, sources):
+    """Send the query to the server once, and return the elapsed seconds."""
+    start = time.perf_counter()
+    status = server.request(path, 'query', params, sources,
+                            stdout=io.StringIO(), stderr=io.StringIO())
+    elapsed = time.perf_counter() - start
+    assert status == 0, status
+    return elapsed
+
+
+def concurrent(path, params, sources, clients):
+    """Send the query from several threads at once, and return their latencies."""
+    times = [None] * clients
+
+    def run(i):
+        times[i] = round_trip(path, params, sources)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return times
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the query server.")
+    parser.add_argument('--runs', type=int, default=5,
+                        help="How many times to run each configuration.")
+    parser.add_argument('--clients', type=int, default=8,
+                        help="How many requests to send at once.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        socket = tmp / 'neo.sock'
+        common = ['--neofile', str(neo_file), '--cadfile', str(cad_file),
+                  '--snapshot', str(tmp / 'neo.snapshot'), '--socket', str(socket)]
+
+        results = {}
+        results['cold (data files)'] = [run_main(*common, '--no-server', '--no-snapshot',
+                                                 *COMMAND) for _ in range(args.runs)]
+        run_main(*common, '--no-server', *COMMAND)  # Save the snapshot.
+        results['warm (snapshot)'] = [run_main(*common, '--no-server', *COMMAND)
+                                      for _ in range(args.runs)]
+
+        process = subprocess.Popen([sys.executable, str(PROJECT_ROOT / 'main.py'),
+                                    *common, 'serve'], stderr=subprocess.DEVNULL)
+        try:
+            while not server.listening(socket):
+                time.sleep(0.01)
+            results['routed to server'] = [run_main(*common, *COMMAND)
+                                           for _ in range(args.runs)]
+
+            query_args = cli.make_parser()[0].parse_args(common + COMMAND)
+            params, sources = cli.encode_args(query_args), cli._sources(query_args)
+            results['server round trip'] = [round_trip(socket, params, sources)
+                                            for _ in range(args.runs)]
+            results[f'{args.clients} concurrent round trips'] = [
+                elapsed for _ in range(args.runs)
+                for elapsed in concurrent(socket, params, sources, args.clients)]
+        finally:
+            process.terminate()
+            process.wait()
+
+    for label, times in results.items():
+        report(label, best_ms=f"{min(times) * 1000:,.1f}",
+               mean_ms=f"{sum(times) / len(times) * 1000:,.1f}")
+
+
+if __name__ == '__main__':
+    main()
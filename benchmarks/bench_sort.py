@@ -0,0 +1,74 @@
+"""Compare sorting the results of a query in full with keeping only the top k.
+
+For each sorted query, this reports how long it takes to find the first
+`--top` results by sorting every match and then slicing it (`sorted`), and
+with `query`'s `limit` (`top`), which keeps them in a bounded heap - or, for
+approach time and diameter, visits the candidates in the order of an index -
+along with how many close approaches match.
+
+    $ python3 -m benchmarks.bench_sort [--factor N] [--top K]
+"""
+import argparse
+import itertools
+import pathlib
+import tempfile
+
+from benchmarks.common import data_files, enlarge_cad, report, timed
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, stream_approaches
+from filters import create_filters
+
+
+QUERIES = (
+    ('closest', dict(), 'distance', False),
+    ('fastest hazardous', dict(hazardous=True), 'velocity', True),
+    ('largest', dict(), 'diameter', True),
+    ('smallest fast', dict(velocity_min=20), 'diameter', False),
+    ('latest', dict(), 'time', True),
+)
+
+
+def full_sort(db, filters, sort_by, descending, top):
+    """Sort every match, then keep the first `top`."""
+    rows = list(db._sort_rows(list(db._execute(db.plan(filters))), sort_by, descending))
+    return [db._approach(row) for row in itertools.islice(rows, top)]
+
+
+def run(neo_file, cad_file, label, top):
+    """Benchmark the queries against one close approach file."""
+    for kind, backend in (('objects', NEODatabase), ('columnar', ColumnarNEODatabase)):
+        db = backend(load_neos(neo_file), stream_approaches(cad_file))
+        # Build the k-d tree up front, so that a plan that uses it costs the same either way.
+        db._kd_tree_index()
+        for name, criteria, sort_by, descending in QUERIES:
+            filters = create_filters(**criteria)
+            matches = sum(1 for _ in db._execute(db.plan(filters)))
+            expected, full = timed(full_sort, db, filters, sort_by, descending, top)
+            received, heap = timed(lambda: list(db.query(filters, sort_by=sort_by,
+                                                         descending=descending, limit=top)))
+            assert received == expected
+            report(f"{label} {kind} {name}", matches=matches,
+                   sorted=f"{full * 1000:,.2f}ms", top=f"{heap * 1000:,.2f}ms",
+                   speedup=f"{full / heap:,.1f}x")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark sorted queries.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    parser.add_argument('--top', type=int, default=10,
+                        help="How many of the first results to find.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    if args.factor == 1:
+        run(neo_file, cad_file, 'x1', args.top)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        big = enlarge_cad(cad_file, args.factor, pathlib.Path(tmp) / 'cad.json')
+        run(neo_file, big, f'x{args.factor}', args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""Measure how long `main.py inspect --pdes 433` takes to start and answer.
+
+Each run is a fresh `python3 main.py` process, so this includes interpreter
+start-up and module imports. The cold runs build the database from the data
+files (and save a snapshot); the warm runs restore it from that snapshot,
+which `main.py` always restores into a `ColumnarNEODatabase`.
+
+To show what restoring into columns saves, this also times `read_snapshot`
+in this process with each backend: into objects (a `CloseApproach` for every
+row, linked to its NEO) and into columns.
+
+    $ python3 -m benchmarks.bench_startup [--runs N] [--factor N]
+"""
+import argparse
+import pathlib
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import (PROJECT_ROOT, data_files, enlarge_cad, report,
+                               timed)
+from snapshot import read_snapshot
+
+
+def run_main(*args):
+    """Run main.py once with some arguments, and return the elapsed seconds."""
+    start = time.perf_counter()
+    subprocess.run([sys.executable, str(PROJECT_ROOT / 'main.py'), *args],
+                   check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def run(neo_file, cad_file, snapshot, runs):
+    """Benchmark start-up against one close approach file."""
+    common = ['--neofile', str(neo_file), '--cadfile', str(cad_file),
+              '--snapshot', str(snapshot)]
+    command = ['inspect', '--pdes', '433']
+
+    cold = [run_main(*common, '--no-snapshot', *command) for _ in range(runs)]
+    run_main(*common, *command)  # Save the snapshot.
+    warm = [run_main(*common, *command) for _ in range(runs)]
+    baseline = [run_main('--help') for _ in range(runs)]
+
+    sources = (neo_file, cad_file)
+    restores = {
+        columnar: [timed(read_snapshot, snapshot, sources, columnar=columnar)[1]
+                   for _ in range(runs)]
+        for columnar in (False, True)
+    }
+
+    for label, times in (('interpreter + imports', baseline),
+                         ('cold (data files)', cold),
+                         ('warm (snapshot)', warm),
+                         ('restore into objects', restores[False]),
+                         ('restore into columns', restores[True])):
+        report(label, best_ms=f"{min(times) * 1000:,.0f}",
+               mean_ms=f"{sum(times) / len(times) * 1000:,.0f}")
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark start-up time.")
+    parser.add_argument('--runs', type=int, default=5,
+                        help="How many times to run each configuration.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        if args.factor != 1:
+            cad_file = enlarge_cad(cad_file, args.factor, tmp / 'cad.json')
+        run(neo_file, cad_file, tmp / 'neo.snapshot', args.runs)
+
+
+if __name__ == '__main__':
+    main()
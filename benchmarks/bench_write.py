@@ -0,0 +1,63 @@
+"""Measure the peak memory of exporting every close approach to JSON.
+
+The streaming `write.write_to_json` is compared with the original version,
+which collected every result into a list and then wrote it with `json.dump`.
+Peak memory is traced while the whole database is written to a temporary
+file, on top of the memory the database already holds.
+
+    $ python3 -m benchmarks.bench_write [--factor N]
+"""
+import argparse
+import json
+import pathlib
+import tempfile
+
+from benchmarks.common import data_files, enlarge_cad, report, timed, traced
+from database import NEODatabase
+from extract import load_neos, stream_approaches
+from helpers import datetime_to_str
+from write import write_to_json
+
+
+def write_to_json_with_list(results, filename):
+    """Write close approaches to JSON the original way, via one big list."""
+    output = [dict(datetime_utc=datetime_to_str(result.time),
+                   distance_au=result.distance,
+                   velocity_km_s=result.velocity,
+                   neo={"designation": result.neo.designation,
+                        "name": result.neo.name,
+                        "diameter_km": result.neo.diameter,
+                        "potentially_hazardous": result.neo.hazardous})
+              for result in results]
+    with open(filename, 'w') as f:
+        json.dump(output, f, indent=2)
+
+
+def main():
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark writing JSON.")
+    parser.add_argument('--factor', type=int, default=1,
+                        help="How many times to enlarge the close approach data.")
+    args = parser.parse_args()
+
+    neo_file, cad_file = data_files()
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = pathlib.Path(tmp)
+        if args.factor > 1:
+            cad_file = enlarge_cad(cad_file, args.factor, tmp / 'cad.json')
+        db, _ = timed(lambda: NEODatabase(load_neos(neo_file), stream_approaches(cad_file)))
+        outfile = tmp / 'all.json'
+
+        writers = (('list + json.dump', write_to_json_with_list, {}),
+                   ('streaming', write_to_json, {}),
+                   ('streaming compact', write_to_json, {'compact': True}))
+        for label, writer, kwargs in writers:
+            peak = traced(lambda: writer(db.query(), outfile, **kwargs))
+            _, elapsed = timed(lambda: writer(db.query(), outfile, **kwargs))
+            report(f"x{args.factor} {label}", results=len(db._approaches),
+                   peak_mib=f"{peak / 2 ** 20:,.2f}", seconds=f"{elapsed:.3f}",
+                   size_mib=f"{outfile.stat().st_size / 2 ** 20:,.1f}")
+
+
+if __name__ == '__main__':
+    main()
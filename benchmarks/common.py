@@ -0,0 +1,109 @@
+"""Shared helpers for the benchmark scripts.
+
+The `data_files` function locates the data set to benchmark against, and the
+`enlarge_cad` and `enlarge_neos` functions write synthetic copies of the data
+files that are some whole number of times larger than the originals.
+
+The `timed` and `traced` functions measure the wall time and the peak traced
+memory of a single call, and `report` prints a result row. The loaders in
+`extract` announce every file they open, so `timed` and `traced` silence
+standard output while the measured call runs.
+"""
+import contextlib
+import csv
+import io
+import json
+import pathlib
+import time
+import tracemalloc
+
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent.resolve()
+DATA_ROOT = PROJECT_ROOT / 'data'
+TESTS_ROOT = PROJECT_ROOT / 'tests'
+
+
+def data_files():
+    """Return the paths of the NEO CSV file and the close approach JSON file.
+
+    :return: A tuple of the full data set's paths if available, otherwise the
+             test data set's paths.
+    """
+    neo_file, cad_file = DATA_ROOT / 'neos.csv', DATA_ROOT / 'cad.json'
+    if neo_file.exists() and cad_file.exists():
+        return neo_file, cad_file
+    return TESTS_ROOT / 'test-neos-2020.csv', TESTS_ROOT / 'test-cad-2020.json'
+
+
+def enlarge_cad(cad_file, factor, outfile):
+    """Write a copy of a close approach JSON file with its rows repeated.
+
+    The "fields" header is written before the "data" array, like NASA's API.
+
+    :param cad_file: The path of the original JSON file.
+    :param factor: How many times to repeat the "data" array.
+    :param outfile: The path to write the enlarged file to.
+    :return: The path of the enlarged file.
+    """
+    with open(cad_file) as f:
+        original = json.load(f)
+    rows = original['data']
+
+    with open(outfile, 'w') as f:
+        f.write('{"signature":' + json.dumps(original.get('signature')))
+        f.write(',"count":"%d"' % (len(rows) * factor))
+        f.write(',"fields":' + json.dumps(original['fields']))
+        f.write(',"data":[\n')
+        for n in range(factor):
+            for i, row in enumerate(rows):
+                if n or i:
+                    f.write(',\n')
+                f.write(json.dumps(row))
+        f.write('\n]}\n')
+    return outfile
+
+
+def enlarge_neos(neo_file, factor, outfile):
+    """Write a copy of an NEO CSV file with its rows repeated.
+
+    :param neo_file: The path of the original CSV file.
+    :param factor: How many times to repeat the rows.
+    :param outfile: The path to write the enlarged file to.
+    :return: The path of the enlarged file.
+    """
+    with open(neo_file, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+
+    with open(outfile, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for _ in range(factor):
+            writer.writerows(rows)
+    return outfile
+
+
+def timed(func, *args, **kwargs):
+    """Call a function once, and return its result and the elapsed seconds."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        return result, time.perf_counter() - start
+
+
+def traced(func, *args, **kwargs):
+    """Call a function once, and return the peak traced memory in bytes."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+
+def report(label, **columns):
+    """Print one result row of a benchmark, with aligned columns."""
+    cells = '  '.join(f"{key}={value}" for key, value in columns.items())
+    print(f"{label:<32} {cells}")
@@ -0,0 +1,227 @@
+"""Cache the results of queries, for an interactive session.
+
+A `QueryCache` wraps an `NEODatabase` and remembers the matching rows of the
+queries it has answered, so that running a query again - say, to page through
+its results with a larger `--limit` - doesn't scan the database again.
+
+Each query is keyed on its normalized filters: the date filters folded into a
+single range of dates (see `filters.date_bounds`), and each other filter by its
+class, comparator and reference value. So `--date 2020-01-01` and
+`--start-date 2020-01-01 --end-date 2020-01-01` are the same query.
+
+A query that isn't cached can still be answered from a cached one whose
+results are a superset of its own - one whose date range covers the new
+query's, and whose other filters are a subset of the new query's. Only the
+extra filters are then checked, and only against the cached rows.
+
+The rows are kept as `array`s of 4-byte row numbers, and the least recently
+used queries are evicted when there are more than `max_entries` of them or
+they hold more than `max_rows` rows in total.
+"""
+import array
+import collections
+
+from database import QueryPlan, SORT_COLUMNS
+from filters import date_bounds
+
+
+# The default bounds on how much a `QueryCache` holds.
+MAX_ENTRIES = 128
+MAX_ROWS = 1 << 22
+
+
+def normalize(filters):
+    """Return a hashable key for a collection of filters, and its parts.
+
+    :param filters: A collection of filters, such as from `create_filters`.
+    :return: A tuple of the key - the first date, the last date and a
+             frozenset of the other filters' descriptions - and a dict of the
+             other filters by description, or None if a filter can't be
+             described (such as a plain function).
+    """
+    start, end, others = date_bounds(filters)
+    described = {}
+    for flt in others:
+        try:
+            description = (type(flt), flt.op, flt.value)
+            hash(description)
+        except (AttributeError, TypeError):
+            return None
+        described[description] = flt
+    return (start, end, frozenset(described)), described
+
+
+def _covers(outer, inner):
+    """Return whether one range of dates (as `date_bounds`) covers another."""
+    (outer_start, outer_end), (inner_start, inner_end) = outer, inner
+    if outer_start is not None \
+            and (inner_start is None or inner_start < outer_start):
+        return False
+    if outer_end is not None and (inner_end is None or inner_end > outer_end):
+        return False
+    return True
+
+
+class QueryCache:
+    """A size-bounded, least-recently-used cache of the results of queries.
+
+    The cache is for one database. If the database's data change (see
+    `NEODatabase.ingest`), the cache notices and forgets every query.
+    """
+
+    def __init__(self, database, max_entries=MAX_ENTRIES, max_rows=MAX_ROWS):
+        """Create a new, empty `QueryCache`.
+
+        :param database: The `NEODatabase` to answer queries from.
+        :param max_entries: At most how many queries to hold the results of.
+        :param max_rows: At most how many rows to hold, over every query.
+        """
+        self.database = database
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._entries = collections.OrderedDict()
+        self._rows = 0
+        self._generation = database._generation
+        self.hits = self.superset_hits = self.misses = 0
+        self.uncacheable = self.evictions = 0
+
+    def query(self, filters=(), sort_by=None, descending=False, limit=None):
+        """Query close approaches, through the cache.
+
+        The cached rows are in order of approach time; a sorted query sorts
+        them (see `NEODatabase._sort_rows`), but the cache keeps them as they
+        are.
+
+        :param filters: A collection of filters capturing user-specified
+                        criteria.
+        :param sort_by: One of `database.SORT_COLUMNS` to sort by, or None.
+        :param descending: Whether to sort from the greatest value to the
+                           least.
+        :param limit: At most how many close approaches to return, or 0 or
+                      None for all of them.
+        :return: A stream of matching `CloseApproach` objects, in the same
+                 order as from the database's `query`.
+        """
+        filters = list(filters)
+        if sort_by is None and descending:
+            sort_by = 'time'
+        if sort_by is not None and sort_by not in SORT_COLUMNS:
+            # Let the database explain.
+            return self.database.query(filters, sort_by, descending, limit)
+        rows = self.rows(filters)
+        if rows is None:
+            return self.database.query(filters, sort_by, descending, limit)
+        if sort_by is not None:
+            rows = self.database._sort_rows(rows, sort_by, descending, limit)
+        elif limit:
+            rows = rows[:limit]
+        return map(self.database._approach, rows)
+
+    def explain(self, filters=()):
+        """Describe how the database answers a query.
+
+        See `NEODatabase.explain`.
+        """
+        return self.database.explain(filters)
+
+    def rows(self, filters):
+        """Return the matching rows of a query, in order of approach time.
+
+        :param filters: A list of filters.
+        :return: An `array` of the matching rows, or None if the filters can't
+                 be cached.
+        """
+        normalized = normalize(filters)
+        if normalized is None:
+            self.uncacheable += 1
+            return None
+        key, described = normalized
+        if self._generation != self.database._generation:
+            self.clear()
+            self._generation = self.database._generation
+
+        rows = self._entries.get(key)
+        if rows is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rows
+
+        superset = self._superset(key)
+        if superset is not None:
+            self.superset_hits += 1
+            rows = self._narrow(superset, key, filters, described)
+        else:
+            self.misses += 1
+            database = self.database
+            rows = array.array('i', database._execute(database.plan(filters)))
+        self._store(key, rows)
+        return rows
+
+    def _superset(self, key):
+        """Find the smallest cached results that include those of a query.
+
+        :return: The key of the cached results, or None if there aren't any.
+        """
+        start, end, described = key
+        best = None
+        entries = self._entries
+        for other in entries:
+            other_start, other_end, other_described = other
+            if other_described <= described \
+                    and _covers((other_start, other_end), (start, end)) \
+                    and (best is None
+                         or len(entries[other]) < len(entries[best])):
+                best = other
+        return best
+
+    def _narrow(self, superset, key, filters, described):
+        """Check a superset's cached rows against a query's extra filters."""
+        start, end, _ = key
+        extra = [described[description]
+                 for description in key[2] - superset[2]]
+        if (start, end) != superset[:2]:
+            # The date range is narrower, so check the query's date filters
+            # too.
+            _, _, others = date_bounds(filters)
+            extra += [flt for flt in filters
+                      if not any(flt is other for other in others)]
+
+        self._entries.move_to_end(superset)
+        rows = self._entries[superset]
+        if not extra:
+            return rows
+        # The plan only orders the filters, so it doesn't count towards the
+        # k-d tree.
+        plan = self.database.plan(extra, rent=False)
+        plan = QueryPlan(QueryPlan.FULL_SCAN,
+                         plan.access_filters + plan.filters, [len(rows)])
+        return array.array('i', self.database._execute(plan, rows))
+
+    def _store(self, key, rows):
+        """Remember the rows of a query, evicting the least recently used."""
+        if len(rows) > self.max_rows or self.max_entries <= 0:
+            return
+        self._entries[key] = rows
+        self._rows += len(rows)
+        while len(self._entries) > self.max_entries \
+                or self._rows > self.max_rows:
+            _, evicted = self._entries.popitem(last=False)
+            self._rows -= len(evicted)
+            self.evictions += 1
+
+    def clear(self):
+        """Forget every cached query (but not the statistics)."""
+        self._entries.clear()
+        self._rows = 0
+
+    def statistics(self):
+        """Return the statistics of the cache, as a dict of counts."""
+        return {
+            'hits': self.hits,
+            'superset hits': self.superset_hits,
+            'misses': self.misses,
+            'uncacheable': self.uncacheable,
+            'evictions': self.evictions,
+            'entries': len(self._entries),
+            'rows': self._rows,
+        }
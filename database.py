@@ -9,7 +9,527 @@ Under normal circumstances, the main module creates one NEODatabase from the
 data on NEOs and close approaches extracted by `extract.load_neos` and
 `extract.load_approaches`.
 
+A `ColumnarNEODatabase` is a drop-in alternative that stores close approaches
+as compact columns of numbers rather than as `CloseApproach` objects, and only
+builds a `CloseApproach` for a row when it's actually needed.
+
+Both databases plan each query before running it. A `QueryPlan` picks how to
+find the candidate close approaches - by scanning all of them, by a range of
+the index of approach times, or by merging the approaches of the NEOs that
+match the filters on NEO attributes, which are looked up in indexes of the NEOs
+by diameter and by whether they're hazardous, or by searching a k-d tree of
+the approach distances and velocities (see `_KDTree`) - and orders the
+remaining filters so that the cheap and selective ones run first. The plan's
+estimates come from the `ColumnStatistics` gathered when the database is built.
+
+NEOs can also be looked up by the start of a designation or name, or by
+something like one, with `find_neos_by_prefix` and `find_neos_like` - from a
+`names.NameIndex`, built on the first such search.
+
+New or updated NEOs and close approaches can be merged into either database
+with `ingest`, which updates the indexes in place instead of rebuilding them.
+
+Both databases can also be queried from `asyncio` code with `aquery`, which
+runs the query in an executor a chunk of rows at a time. Concurrent queries
+that scan every close approach share a single pass over them (see
+`_SharedScan`).
 """
+import array
+import asyncio
+import bisect
+import collections
+import collections.abc
+import datetime
+import heapq
+import itertools
+import math
+import operator
+import threading
+import weakref
+
+from filters import compile_filters, date_bounds, is_vectorizable
+from helpers import minutes_to_datetime, datetime_to_minutes
+from models import CloseApproach
+from names import NameIndex, LIMIT
+
+
+class ColumnStatistics:
+    """Summary statistics of the values in one column.
+
+    A `ColumnStatistics` records the range of a column's values and an
+    equi-width histogram of them, from which it estimates the fraction of rows
+    that satisfy a comparison. A column with only a few distinct values (such
+    as whether an NEO is hazardous) keeps exact counts instead.
+
+    NaN values (such as unknown diameters) never satisfy a comparison, so they
+    count towards the total but not towards any bin.
+    """
+
+    BINS = 32
+
+    def __init__(self, values, weights=None):
+        """Create a new `ColumnStatistics`.
+
+        :param values: The values of the column (or a sample of them).
+        :param weights: How many rows each value stands for. Defaults to one.
+        """
+        if weights is None:
+            weights = itertools.repeat(1)
+        counts = collections.Counter()
+        for value, weight in zip(values, weights):
+            counts[value] += weight
+        self.total = sum(counts.values())
+
+        finite = {value: count for value, count in counts.items()
+                  if not (isinstance(value, float) and math.isnan(value))}
+        self.minimum = min(finite, default=None)
+        self.maximum = max(finite, default=None)
+
+        self.frequencies = None
+        self.bins = None
+        if len(finite) <= self.BINS:
+            self.frequencies = finite
+        else:
+            self.width = (self.maximum - self.minimum) / self.BINS
+            self.bins = [0] * self.BINS
+            for value, count in finite.items():
+                self.bins[self._bin(value)] += count
+
+    def _bin(self, value):
+        """Return the histogram bin that a value falls into."""
+        return min(int((value - self.minimum) / self.width), self.BINS - 1)
+
+    def _at_most(self, value):
+        """Estimate the number of rows whose value is at most `value`."""
+        if value < self.minimum:
+            return 0
+        if value >= self.maximum:
+            return self.total - self._nan_count()
+        index = self._bin(value)
+        within = (value - (self.minimum + index * self.width)) / self.width
+        return sum(self.bins[:index]) + self.bins[index] * min(within, 1)
+
+    def _nan_count(self):
+        """Return the number of rows whose value is NaN."""
+        if self.frequencies is not None:
+            counted = sum(self.frequencies.values())
+        else:
+            counted = sum(self.bins)
+        return self.total - counted
+
+    def fraction(self, op, value):
+        """Estimate the fraction of rows for which `op(row, value)` holds.
+
+        :param op: A comparator from the `operator` module.
+        :param value: The reference value.
+        :return: A fraction between 0 and 1 (1 for an unknown comparator).
+        """
+        if not self.total:
+            return 0.0
+        if self.frequencies is not None:
+            try:
+                matching = sum(count for known, count
+                               in self.frequencies.items() if op(known, value))
+            except TypeError:
+                return 1.0
+            return matching / self.total
+        if self.minimum is None:
+            return 0.0
+        if op in (operator.le, operator.lt):
+            return self._at_most(value) / self.total
+        if op in (operator.ge, operator.gt):
+            above = self.total - self._nan_count() - self._at_most(value)
+            return above / self.total
+        if op is operator.eq:
+            return 1 / self.total
+        return 1.0
+
+
+class QueryPlan:
+    """A plan for answering a query.
+
+    A plan has an access path, which produces the candidate rows, and a list
+    of the remaining filters, in the order they'll be evaluated on each
+    candidate. The access path is one of:
+
+    - `FULL_SCAN`: every close approach, in order of approach time.
+    - `TIME_INDEX`: a range of the index of approach times, for the dates
+      between `start` and `end`.
+    - `NEO_SCAN`: the close approaches of the NEOs that match the filters on
+      NEO attributes (`access_filters`).
+    - `KD_TREE`: the close approaches inside the box of distances and
+      velocities bounded by `access_filters`, from a k-d tree.
+
+    Alongside, the plan records its estimated number of rows: of candidates,
+    and after each of the remaining filters.
+    """
+
+    FULL_SCAN = 'full scan'
+    TIME_INDEX = 'time index'
+    NEO_SCAN = 'NEO scan'
+    KD_TREE = 'k-d tree'
+
+    def __init__(self, access, filters, estimates, access_filters=(),
+                 start=None, end=None):
+        """Create a new `QueryPlan`.
+
+        :param access: The access path.
+        :param filters: The remaining filters, in order of evaluation.
+        :param estimates: The estimated number of candidate rows, followed by
+                          the estimated number of rows after each filter.
+        :param access_filters: The filters answered by the access path.
+        :param start: For `TIME_INDEX`, the first date of the range.
+        :param end: For `TIME_INDEX`, the last date of the range.
+        """
+        self.access = access
+        self.filters = list(filters)
+        self.estimates = list(estimates)
+        self.access_filters = list(access_filters)
+        self.start = start
+        self.end = end
+
+    def describe(self, actual=None):
+        """Describe this plan, step by step, in human-readable lines.
+
+        :param actual: Optionally, the actual number of candidate rows and of
+                       rows after each filter, as from `NEODatabase.explain`.
+        :return: A multi-line string.
+        """
+        if self.access == self.TIME_INDEX:
+            start = self.start or 'the beginning'
+            detail = f" from {start} to {self.end or 'the end'}"
+        elif self.access in (self.NEO_SCAN, self.KD_TREE):
+            described = map(_describe_filter, self.access_filters)
+            detail = f" for {' and '.join(described)}"
+        else:
+            detail = ''
+        steps = [f"{self.access}{detail}"]
+        steps += [f"filter {_describe_filter(flt)}" for flt in self.filters]
+
+        lines = []
+        for i, (step, estimate) in enumerate(zip(steps, self.estimates)):
+            line = f"{'  ' * i}-> {step}  (estimated rows: {estimate:,.0f}"
+            if actual is not None:
+                line += f", actual rows: {actual[i]:,}"
+            lines.append(line + ")")
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        """Return `repr(self)`, a computer-readable string representation."""
+        return f"QueryPlan(access={self.access!r}, filters={self.filters!r})"
+
+
+def _describe_filter(flt):
+    """Describe a filter briefly, such as `distance <= 0.1`."""
+    symbols = {operator.eq: '==', operator.ne: '!=', operator.lt: '<',
+               operator.le: '<=', operator.gt: '>', operator.ge: '>='}
+    column = getattr(flt, 'column', None)
+    if column is not None and getattr(flt, 'op', None) in symbols:
+        return f"{column} {symbols[flt.op]} {flt.value}"
+    return repr(flt)
+
+
+# The columns that query results can be sorted by.
+SORT_COLUMNS = ('time', 'distance', 'velocity', 'diameter')
+
+# How many rows an index-ordered traversal checks against the filters at once.
+_SORT_CHUNK_SIZE = 4096
+
+
+# For each comparator, how to find the first and the end of the run of sorted
+# keys that satisfy it (None meaning the start or the end of the keys).
+_BISECT_BOUNDS = {
+    operator.ge: (bisect.bisect_left, None),
+    operator.gt: (bisect.bisect_right, None),
+    operator.le: (None, bisect.bisect_right),
+    operator.lt: (None, bisect.bisect_left),
+    operator.eq: (bisect.bisect_left, bisect.bisect_right),
+}
+
+
+class _NEOProbe:
+    """A stand-in for a close approach of a given NEO.
+
+    Filters on NEO attributes only read `.neo` from a close approach, so an
+    NEO can be checked against them without one of its close approaches.
+    """
+
+    __slots__ = ('neo',)
+
+    def __init__(self, neo=None):
+        """Create a new `_NEOProbe` for an NEO."""
+        self.neo = neo
+
+
+class _RowTimes:
+    """The approach times of some rows (as `_time_key`s), for `bisect`."""
+
+    __slots__ = ('_database', '_rows')
+
+    def __init__(self, database, rows):
+        """Create a new `_RowTimes` of some rows of a database."""
+        self._database = database
+        self._rows = rows
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        """Return the approach time of the row at a position."""
+        return self._database._values('time', (self._rows[index],))[0]
+
+
+class _KDTree:
+    """A k-d tree of the rows of a table, over a few of its numeric columns.
+
+    The tree answers box queries - a range of values in each column - by
+    visiting only the nodes whose bounding box overlaps the box. A node that's
+    entirely inside the box contributes all of its rows without checking them,
+    and only the rows of the leaves on the box's edges are checked one by one.
+
+    Rather than splitting each node in two, each level of the tree splits its
+    nodes many ways by one column, one level per column - like a k-d-B tree
+    (or a "sort-tile" packed R-tree). That takes one sort of each node's rows
+    per level, rather than one per binary split, so the tree builds in about
+    the time of a few sorts of the whole table. A NaN satisfies no
+    comparison, so a node with a NaN in a column is never entirely inside a
+    box that's bounded in that column.
+    """
+
+    # At most how many rows are in a leaf.
+    LEAF_SIZE = 64
+
+    def __init__(self, columns):
+        """Create a new `_KDTree`.
+
+        :param columns: A sequence of the tree's columns, each a sequence of
+                        numbers with one value per row.
+        """
+        rows = list(range(len(columns[0])))
+        leaves = max(1, math.ceil(len(rows) / self.LEAF_SIZE))
+        self._fanout = max(2, math.ceil(leaves ** (1 / len(columns))))
+
+        # Each node is a run `_starts[node]:_stops[node]` of `_rows`, with the
+        # positions in `_children` of its children (None for a leaf), and the
+        # least and greatest value of each column among its rows, and whether
+        # any of them is NaN.
+        self._columns = columns
+        self._rows = array.array('i')
+        self._starts, self._stops, self._children = [], [], []
+        self._lows = [[] for _ in columns]
+        self._highs = [[] for _ in columns]
+        self._nans = [[] for _ in columns]
+        self._build(rows, 0)
+        self._values = [array.array('d', map(column.__getitem__, self._rows))
+                        for column in columns]
+        self._bound(0)
+
+    def _build(self, rows, depth):
+        """Add the node of some rows (and its subtree); return its position."""
+        node = len(self._starts)
+        self._starts.append(len(self._rows))
+        self._stops.append(None)
+        self._children.append(None)
+        if len(rows) <= self.LEAF_SIZE:
+            self._rows.extend(rows)
+        else:
+            # Split the rows by the column of this level; past the last column,
+            # the leaves of the last level are split further by the first.
+            column = self._columns[depth % len(self._columns)]
+            rows.sort(key=column.__getitem__)
+            size = max(self.LEAF_SIZE, math.ceil(len(rows) / self._fanout))
+            self._children[node] = [self._build(rows[i:i + size], depth + 1)
+                                    for i in range(0, len(rows), size)]
+        self._stops[node] = len(self._rows)
+        return node
+
+    def _bound(self, node):
+        """Find the bounding boxes of a node and its subtree."""
+        children = self._children[node]
+        bounds = list(zip(self._lows, self._highs, self._nans, self._values))
+        for lows, highs, nans, _ in bounds:
+            lows.append(None)
+            highs.append(None)
+            nans.append(None)
+        if children is None:
+            start, stop = self._starts[node], self._stops[node]
+            for lows, highs, nans, values in bounds:
+                run = values[start:stop]
+                nans[node] = any(map(math.isnan, run))
+                if nans[node]:
+                    run = [value for value in run if not math.isnan(value)]
+                lows[node] = min(run, default=math.inf)
+                highs[node] = max(run, default=-math.inf)
+            return
+        for child in children:
+            self._bound(child)
+        for lows, highs, nans, _ in bounds:
+            lows[node] = min(lows[child] for child in children)
+            highs[node] = max(highs[child] for child in children)
+            nans[node] = any(nans[child] for child in children)
+
+    def columns(self):
+        """Flatten the tree into `array`s, to save it (see `from_columns`).
+
+        :return: A dict of names to `array`s. Each node's children are a run
+                 `children[child_offsets[node]:child_offsets[node + 1]]`,
+                 which is empty for a leaf.
+        """
+        children = array.array('i')
+        child_offsets = array.array('q', [0])
+        for nodes in self._children:
+            children.extend(nodes or ())
+            child_offsets.append(len(children))
+        columns = {
+            'rows': self._rows,
+            'starts': array.array('i', self._starts),
+            'stops': array.array('i', self._stops),
+            'children': children,
+            'child_offsets': child_offsets,
+        }
+        for dimension, values in enumerate(self._values):
+            columns[f'values_{dimension}'] = values
+            columns[f'lows_{dimension}'] = array.array(
+                'd', self._lows[dimension])
+            columns[f'highs_{dimension}'] = array.array(
+                'd', self._highs[dimension])
+            columns[f'nans_{dimension}'] = array.array(
+                'B', self._nans[dimension])
+        return columns
+
+    @classmethod
+    def from_columns(cls, columns):
+        """Restore a `_KDTree` from the `array`s of its `columns`.
+
+        :param columns: A mapping of the names from `columns` to sequences.
+        :return: A new `_KDTree`, which can search but not be rebuilt.
+        """
+        tree = cls.__new__(cls)
+        tree._columns = None
+        tree._rows = columns['rows']
+        tree._starts = columns['starts']
+        tree._stops = columns['stops']
+        children, offsets = columns['children'], columns['child_offsets']
+        tree._children = [
+            list(children[offsets[node]:offsets[node + 1]])
+            if offsets[node] < offsets[node + 1] else None
+            for node in range(len(offsets) - 1)
+        ]
+        dimensions = range(sum(1 for name in columns
+                               if name.startswith('values_')))
+        tree._values = [columns[f'values_{i}'] for i in dimensions]
+        tree._lows = [columns[f'lows_{i}'] for i in dimensions]
+        tree._highs = [columns[f'highs_{i}'] for i in dimensions]
+        tree._nans = [columns[f'nans_{i}'] for i in dimensions]
+        return tree
+
+    def search(self, filters):
+        """Find the rows inside a box.
+
+        :param filters: A collection of pairs of the position of a column and a
+                        vectorizable filter on it, with a comparator from
+                        `_BISECT_BOUNDS`, which together bound the box.
+        :return: An `array` of the matching rows, in no particular order.
+        """
+        matches = array.array('i')
+        stack = [0] if self._starts else []
+        while stack:
+            node = stack.pop()
+            inside = True
+            for dimension, flt in filters:
+                low = self._lows[dimension][node]
+                high = self._highs[dimension][node]
+                op, value = flt.op, flt.value
+                if not (op(low, value) and op(high, value)) \
+                        or self._nans[dimension][node]:
+                    inside = False
+                    # A comparator holds for a run of values, so the box
+                    # misses the node if neither end of its range is in it.
+                    if not (op(low, value) or op(high, value)) and not (
+                            op is operator.eq and low <= value <= high):
+                        break
+            else:
+                start, stop = self._starts[node], self._stops[node]
+                if inside:
+                    matches += self._rows[start:stop]
+                elif self._children[node] is not None:
+                    stack.extend(self._children[node])
+                else:
+                    mask = None
+                    for dimension, flt in filters:
+                        check = flt.mask(self._values[dimension][start:stop])
+                        if mask is not None:
+                            check = map(operator.and_, mask, check)
+                        mask = check
+                    rows = self._rows[start:stop]
+                    matches.extend(itertools.compress(rows, mask))
+        return matches
+
+
+class _FilterGroup:
+    """Filters from many filter sets that compare one column in the same way.
+
+    Each filter set of a batch is given one bit of a mask. Rather than calling
+    every filter of the group on a value, calling the group looks up the value
+    among the filters' sorted reference values with `bisect`, and returns the
+    mask of the filter sets that it doesn't rule out - those with a satisfied
+    filter in this group, and those with no filter in this group at all.
+    """
+
+    # For each comparator, whether a value satisfies the filters after or
+    # before its position among the sorted reference values, and how to find
+    # that position.
+    _RUNS = {
+        operator.le: (True, bisect.bisect_left),
+        operator.lt: (True, bisect.bisect_right),
+        operator.ge: (False, bisect.bisect_right),
+        operator.gt: (False, bisect.bisect_left),
+    }
+
+    def __init__(self, op):
+        """Create a new, empty `_FilterGroup` for a comparator."""
+        self.op = op
+        self._filters = []
+
+    def add(self, value, bit):
+        """Add the filter of one filter set (its bit), with its value."""
+        self._filters.append((value, bit))
+
+    def compile(self, everyone):
+        """Prepare to be called, once every filter has been added.
+
+        :param everyone: The mask of every filter set in the batch.
+        """
+        members = 0
+        for _, bit in self._filters:
+            members |= bit
+        self._others = everyone & ~members
+
+        if self.op is operator.eq:
+            self._by_value = collections.defaultdict(int)
+            for value, bit in self._filters:
+                self._by_value[value] |= bit
+            self._by_value = dict(self._by_value)
+            return
+        self._filters.sort(key=operator.itemgetter(0))
+        self._keys = [value for value, _ in self._filters]
+        after, self._position = self._RUNS[self.op]
+        # The mask of the filters after (or before) each position.
+        masks = [0]
+        bits = [bit for _, bit in self._filters]
+        for bit in (reversed(bits) if after else bits):
+            masks.append(masks[-1] | bit)
+        self._masks = masks[::-1] if after else masks
+
+    def __call__(self, value):
+        """Return the mask of the filter sets that a value doesn't rule out."""
+        if value != value:
+            # NaN satisfies no comparison.
+            return self._others
+        if self.op is operator.eq:
+            return self._by_value.get(value, 0) | self._others
+        return self._masks[self._position(self._keys, value)] | self._others
 
 
 class NEODatabase:
@@ -21,7 +541,45 @@ class NEODatabase:
     querying for close approaches that match criteria.
     """
 
-    def __init__(self, neos, approaches):
+    # Where the attribute behind each filter `column` is stored: on each
+    # close approach, or on each NEO.
+    _APPROACH_COLUMNS = {'time': 'time', 'distance': 'distance',
+                         'velocity': 'velocity'}
+    _NEO_COLUMNS = {'diameter': 'diameter', 'hazardous': 'hazardous'}
+
+    # At most how many close approaches are sampled for `ColumnStatistics`.
+    STATISTICS_SAMPLE = 10000
+
+    # How many rows `batch_query` reads the columns of at once.
+    BATCH_CHUNK_SIZE = 1 << 16
+
+    # How many candidate rows `aquery` checks in each call to the executor,
+    # and at most how many chunks of results it holds for a slow consumer.
+    ASYNC_CHUNK_SIZE = 4096
+    ASYNC_QUEUE_DEPTH = 4
+
+    # The full scan that queries from `aquery` can still join, if any.
+    _shared_scan = None
+
+    # The close approach columns that the k-d tree is built over, and what it
+    # costs to build, relative to checking a filter on every row. Rows that
+    # `ingest` adds or updates are checked alongside the tree, until there
+    # are more of them than this fraction of the tree's rows.
+    _KD_TREE_COLUMNS = ('distance', 'velocity')
+    KD_TREE_BUILD_COST = 3
+    KD_TREE_MAX_STALE = 1 / 16
+    _kd_tree = None
+    _kd_tree_stale = frozenset()
+
+    # How many times the data have changed (see `ingest`), so that anything
+    # derived from them can tell when it's out of date.
+    _generation = 0
+
+    # Held while the indexes are built on the first query, in case queries
+    # are planned in several threads at once.
+    _INDEX_LOCK = threading.Lock()
+
+    def __init__(self, neos, approaches, lazy=False):
         """Create a new `NEODatabase`.
 
         As a precondition, this constructor assumes that the collections of
@@ -36,30 +594,240 @@ class NEODatabase:
         NEO has a collection of that NEO's close approaches, and the `.neo`
         attribute of each close approach references the appropriate NEO.
 
+        The close approaches may also be a one-shot stream (such as the
+        generator from `extract.stream_approaches`) - each approach is linked
+        as soon as it arrives, so construction overlaps with parsing.
+
+        Building the indexes that queries use reads every approach time and
+        every NEO's diameter and hazard flag. With `lazy`, that's put off until
+        the first query, so that lazy models (see `models.LazyCloseApproach`)
+        aren't all converted up front just to inspect a few NEOs.
+
         :param neos: A collection of `NearEarthObject`s.
-        :param approaches: A collection of `CloseApproach`es.
+        :param approaches: A collection (or stream) of `CloseApproach`es.
+        :param lazy: Whether to build the query indexes on the first query.
         """
         self._neos = neos
-        self._approaches = approaches
+        self._approaches = []
+        self._index_neos()
+        # The position in `_neos` of each close approach's NEO.
+        self._neo_index = neo_index = array.array('i')
+
+        # link together the NEOs and their close approaches.
+        for approach in approaches:
+            # find the neo in approach
+            position = self._neo_positions[approach._designation]
+            neo = self._neos[position]
+            # link the neo to this approach
+            approach.neo = neo
+            # add this close approach to the neo's approaches list
+            neo.approaches.append(approach)
+            neo_index.append(position)
+            self._approaches.append(approach)
+
+        self._indexed = False
+        if not lazy:
+            self._index()
 
+    @classmethod
+    def from_columns(cls, neos, time, distance, velocity, neo_index):
+        """Create an `NEODatabase` from columns of close approach data.
+
+        A `CloseApproach` is built for each row of the columns, and linked to
+        the NEO at its position in `neos`.
+
+        :param neos: A sequence of `NearEarthObject`s.
+        :param time: An `array` of approach times, in minutes since the epoch.
+        :param distance: An `array` of approach distances, in au.
+        :param velocity: An `array` of approach velocities, in km/s.
+        :param neo_index: An `array` of positions in `neos`.
+        :return: A new `NEODatabase`.
+        """
+        neos = list(neos)
+        approaches = [
+            CloseApproach(designation=neos[index].designation,
+                          time=minutes_to_datetime(minutes),
+                          distance=distance, velocity=velocity)
+            for minutes, distance, velocity, index
+            in zip(time, distance, velocity, neo_index)
+        ]
+        return cls(neos, approaches)
+
+    def _index_neos(self):
+        """Map each NEO's designation and name to the NEO."""
         # add empty dictionaries for neo.designation and neo.name for mapping
         self._neo_by_designation = {}
         self._neo_by_name = {}
+        self._neo_positions = {}
 
-        # link together the NEOs and their close approaches.
-        for neo in self._neos:
+        for position, neo in enumerate(self._neos):
             # retrieve neo designation and name for their dictionaries
             self._neo_by_designation[neo.designation] = neo
             self._neo_by_name[neo.name] = neo
+            self._neo_positions[neo.designation] = position
+        self._name_index = None
 
-        for approach in self._approaches:
-            # find the neo in approach
-            designation = approach._designation
-            neo = self._neo_by_designation[designation]
-            # link the neo to this approach
-            approach.neo = neo
-            # add this close approach to the neo's approaches list
-            neo.approaches.append(approach)
+    def _index(self):
+        """Build the indexes and statistics that queries are planned with."""
+        self._index_times(self._times())
+        self._rows_by_neo = self._group_rows_by_neo(self._neo_index)
+        self._index_neo_attributes()
+        self._analyze()
+        self._kd_tree = None
+        self._kd_tree_stale = set()
+        self._kd_tree_rent = 0
+        self._indexed = True
+
+    def _ensure_indexed(self):
+        """Build the indexes, if the database was created lazily."""
+        if not self._indexed:
+            with self._INDEX_LOCK:
+                if not self._indexed:
+                    self._index()
+
+    def _names(self):
+        """Return the `NameIndex` of the NEOs, building it if need be.
+
+        It's only built on the first search, since most commands never search.
+        Two threads may both build it, but to the same effect.
+        """
+        if self._name_index is None:
+            self._name_index = NameIndex(self._neos)
+        return self._name_index
+
+    def _times(self):
+        """Return the approach time of each row, as from `_time_key`."""
+        return [approach.time for approach in self._approaches]
+
+    def _index_neo_attributes(self):
+        """Index the NEOs by diameter and by whether they're hazardous."""
+        # The positions of the hazardous NEOs, and of the others.
+        self._neos_by_hazardous = {True: array.array('i'),
+                                   False: array.array('i')}
+        for position, neo in enumerate(self._neos):
+            self._neos_by_hazardous[bool(neo.hazardous)].append(position)
+
+        # The positions of the NEOs with a known diameter, sorted by diameter,
+        # alongside the sorted diameters themselves.
+        self._diameter_order = array.array('i', sorted(
+            (position for position, neo in enumerate(self._neos)
+             if not math.isnan(neo.diameter)),
+            key=lambda position: self._neos[position].diameter))
+        self._diameter_keys = array.array('d', (
+            self._neos[position].diameter
+            for position in self._diameter_order))
+
+    def _index_times(self, keys):
+        """Build the index of rows in order of approach time.
+
+        A row is the position of a close approach in `_approaches`. The index
+        is `_time_order`, the rows sorted by approach time, alongside
+        `_time_keys`, the sorted times themselves. NASA's data is already in
+        chronological order, in which case the index is just a `range`.
+
+        :param keys: The approach time of each row, as from `_time_key`.
+        """
+        if all(map(operator.le, keys, itertools.islice(keys, 1, None))):
+            self._time_order = range(len(keys))
+            self._time_keys = keys
+            self._time_rank = None
+        else:
+            self._time_order = sorted(range(len(keys)), key=keys.__getitem__)
+            self._time_keys = [keys[row] for row in self._time_order]
+            # The position of each row in `_time_order`.
+            self._time_rank = array.array('i', bytes(4 * len(keys)))
+            for rank, row in enumerate(self._time_order):
+                self._time_rank[row] = rank
+
+    def _group_rows_by_neo(self, neo_index):
+        """Group the rows by NEO, each NEO's rows in order of approach time.
+
+        :param neo_index: The position in `_neos` of each row's NEO.
+        :return: A list with an `array` of rows for each NEO.
+        """
+        rows_by_neo = [array.array('i') for _ in self._neos]
+        for row in self._time_order:
+            rows_by_neo[neo_index[row]].append(row)
+        return rows_by_neo
+
+    @staticmethod
+    def _time_key(dt):
+        """Convert a datetime into the units of `_time_keys`."""
+        return dt
+
+    def _time_bounds(self, start=None, end=None):
+        """Find the positions in `_time_order` of a range of dates.
+
+        The index is searched with `bisect`, so this takes logarithmic time
+        no matter how many close approaches there are.
+
+        :param start: The first date of the range, or None if unbounded.
+        :param end: The last date of the range, or None if unbounded.
+        :return: A tuple of the first position in the range and the position
+                 after the last one (never less than the first).
+        """
+        keys = self._time_keys
+        lo, hi = 0, len(keys)
+        if start is not None:
+            first = datetime.datetime.combine(start, datetime.time())
+            lo = bisect.bisect_left(keys, self._time_key(first))
+        if end is not None:
+            after = datetime.datetime.combine(end, datetime.time()) \
+                + datetime.timedelta(days=1)
+            hi = bisect.bisect_left(keys, self._time_key(after))
+        return lo, max(lo, hi)
+
+    def _time_range(self, start=None, end=None):
+        """Find the rows of the close approaches within a range of dates.
+
+        :param start: The first date of the range, or None if unbounded.
+        :param end: The last date of the range, or None if unbounded.
+        :return: A sequence of the matching rows, in order of approach time.
+        """
+        lo, hi = self._time_bounds(start, end)
+        return self._time_order[lo:hi]
+
+    def _approach(self, row):
+        """Return the `CloseApproach` in a row."""
+        return self._approaches[row]
+
+    def _row_view(self, row):
+        """Return something that filters can be called on for a row."""
+        return self._approaches[row]
+
+    def _values(self, column, rows):
+        """Return the values of a close approach column in some rows."""
+        attribute = self._APPROACH_COLUMNS[column]
+        return [getattr(self._approaches[row], attribute) for row in rows]
+
+    def _neo_values(self, column):
+        """Return the values of an NEO column, one per NEO."""
+        attribute = self._NEO_COLUMNS[column]
+        return [getattr(neo, attribute) for neo in self._neos]
+
+    def _sample(self, column, rows):
+        """Return the values of a close approach column in the sampled rows."""
+        return self._values(column, rows)
+
+    def _analyze(self):
+        """Gather the column statistics that query plans are estimated from.
+
+        Close approach columns are estimated from an evenly spaced sample of
+        rows. NEO columns are small enough to use in full, with each NEO's
+        value weighted by its number of close approaches.
+        """
+        count = len(self._time_order)
+        sample = range(0, count, max(1, count // self.STATISTICS_SAMPLE))
+        scale = count / len(sample) if sample else 0
+        self._statistics = {
+            column: ColumnStatistics(self._sample(column, sample),
+                                     itertools.repeat(scale))
+            for column in self._APPROACH_COLUMNS if column != 'time'
+        }
+        weights = [len(rows) for rows in self._rows_by_neo]
+        for column in self._NEO_COLUMNS:
+            self._statistics[column] = ColumnStatistics(
+                self._neo_values(column), weights)
 
     def get_neo_by_designation(self, designation):
         """Find and return an NEO by its primary designation.
@@ -99,7 +867,213 @@ class NEODatabase:
         else:
             return None
 
-    def query(self, filters=()):
+    def find_neos_by_prefix(self, prefix, limit=LIMIT):
+        """Find the NEOs whose designation or name starts with a prefix.
+
+        Unlike `get_neo_by_designation` and `get_neo_by_name`, the matching
+        ignores case and extra spaces, so `find_neos_by_prefix('2020 ay')`
+        finds "2020 AY", "2020 AY1", and so on.
+
+        :param prefix: The start of a primary designation or name.
+        :param limit: At most how many NEOs to return.
+        :return: A list of the matching `NearEarthObject`s, in alphabetical
+                 order of the designation or name that matched.
+        """
+        positions = self._names().prefix(prefix, limit)
+        return [self._neos[position] for position in positions]
+
+    def find_neos_like(self, text, limit=LIMIT):
+        """Find the NEOs whose designation or name is most like some text.
+
+        This is for when the exact spelling isn't known:
+        `find_neos_like('haley')` finds "Halley". See `names.NameIndex.fuzzy`.
+
+        :param text: Something like a primary designation or name.
+        :param limit: At most how many NEOs to return.
+        :return: A list of pairs of a matching `NearEarthObject` and how
+                 similar it is to the text (from 0 to 1), from most to least
+                 similar.
+        """
+        return [(self._neos[position], similarity)
+                for position, similarity in self._names().fuzzy(text, limit)]
+
+    def ingest(self, neos=(), approaches=()):
+        """Merge new or updated NEOs and close approaches into the database.
+
+        An NEO with the primary designation of one already in the database
+        updates that NEO's name, diameter and hazard flag; any other NEO is
+        added. A close approach of the same NEO at the same time as one already
+        in the database updates its distance and velocity; any other close
+        approach is added, and linked to its NEO. If the delta itself has
+        duplicates, the last one wins.
+
+        The indexes are updated rather than rebuilt: only the new rows are
+        linked, and they're merged into the index of approach times and into
+        their NEOs' rows. When they all come after the existing close
+        approaches, the index of approach times is simply extended; otherwise
+        it's copied once, with the new rows spliced in.
+
+        Every close approach must be of an NEO that's in the database or among
+        `neos` - if one isn't, nothing is changed.
+
+        :param neos: A collection of `NearEarthObject`s, such as from
+                     `load_neos`.
+        :param approaches: A collection (or stream) of `CloseApproach`es, such
+                           as from `load_approaches`.
+        :return: A dict of how many NEOs and close approaches were added and
+                 updated.
+        :raise ValueError: If a close approach is of an NEO that isn't known.
+        """
+        neos = list(neos)
+        known = {neo.designation for neo in neos}
+        delta = {}
+        for approach in approaches:
+            if approach._designation not in self._neo_positions \
+                    and approach._designation not in known:
+                raise ValueError(f"A close approach is of an unknown NEO: "
+                                 f"{approach._designation}")
+            key = self._time_key(approach.time)
+            delta[approach._designation, key] = approach
+
+        self._ensure_indexed()
+        counts = dict.fromkeys(('new NEOs', 'updated NEOs',
+                                'new approaches', 'updated approaches'), 0)
+        for neo in neos:
+            position = self._neo_positions.get(neo.designation)
+            if position is None:
+                self._add_neo(neo)
+                counts['new NEOs'] += 1
+            else:
+                self._update_neo(position, neo)
+                counts['updated NEOs'] += 1
+
+        # Find the rows of close approaches that are already here, by bisecting
+        # the rows of their NEOs, which are in order of approach time.
+        added = []
+        updated = []
+        for (designation, key), approach in delta.items():
+            position = self._neo_positions[designation]
+            rows = self._rows_by_neo[position]
+            times = _RowTimes(self, rows)
+            i = bisect.bisect_left(times, key)
+            if i < len(rows) and times[i] == key:
+                self._update_row(rows[i], approach)
+                updated.append(rows[i])
+            else:
+                added.append((key, position, approach))
+        counts['updated approaches'] = len(delta) - len(added)
+        counts['new approaches'] = len(added)
+
+        # Number the new rows in order of approach time, so that if they all
+        # come after the existing ones, the rows stay in chronological order.
+        added.sort(key=operator.itemgetter(0))
+        new_rows = [(key, self._add_row(approach, position), position)
+                    for key, position, approach in added]
+        self._index_new_rows(new_rows)
+
+        if neos:
+            self._index_neo_attributes()
+            self._name_index = None
+        if self._kd_tree is not None:
+            # The k-d tree holds its own copies of the distances and
+            # velocities, so new or updated rows leave it out of date for
+            # them. They're checked alongside it until there are too many.
+            stale = self._kd_tree_stale
+            stale.update(updated)
+            stale.update(row for _, row, _ in new_rows)
+            if len(stale) > self.KD_TREE_MAX_STALE * len(self._time_order):
+                self._kd_tree = None
+                self._kd_tree_stale = set()
+                self._kd_tree_rent = 0
+        self._analyze()
+        self._generation += 1
+        return counts
+
+    def _add_neo(self, neo):
+        """Add a new NEO, with no close approaches yet."""
+        position = len(self._neos)
+        self._neos.append(neo)
+        self._neo_by_designation[neo.designation] = neo
+        self._neo_by_name[neo.name] = neo
+        self._neo_positions[neo.designation] = position
+        self._rows_by_neo.append(array.array('i'))
+        return position
+
+    def _update_neo(self, position, neo):
+        """Update the name, diameter and hazard flag of an NEO."""
+        existing = self._neos[position]
+        if neo.name != existing.name:
+            if self._neo_by_name.get(existing.name) is existing:
+                del self._neo_by_name[existing.name]
+            self._neo_by_name[neo.name] = existing
+        existing.name = neo.name
+        existing.diameter = neo.diameter
+        existing.hazardous = neo.hazardous
+
+    def _add_row(self, approach, position):
+        """Add a close approach of the NEO at a position; return its row."""
+        neo = self._neos[position]
+        approach.neo = neo
+        neo.approaches.append(approach)
+        self._neo_index.append(position)
+        self._approaches.append(approach)
+        return len(self._approaches) - 1
+
+    def _update_row(self, row, approach):
+        """Update the distance and velocity of the close approach in a row."""
+        existing = self._approaches[row]
+        existing.distance = approach.distance
+        existing.velocity = approach.velocity
+
+    def _index_new_rows(self, new_rows):
+        """Merge new rows into the time index and their NEOs' rows.
+
+        :param new_rows: A list of the approach time (as from `_time_key`), row
+                         and NEO position of each new row, in order of time.
+        """
+        if not new_rows:
+            return
+        count = len(self._time_order)
+        order, keys = self._time_order, self._time_keys
+
+        if isinstance(order, range) \
+                and (not count or new_rows[0][0] >= keys[count - 1]):
+            # The new rows (numbered in order) come after all of the others.
+            self._time_order = range(count + len(new_rows))
+            if len(keys) == count:
+                # Unless the keys are the time column itself, which already
+                # has them.
+                keys.extend(key for key, _, _ in new_rows)
+        else:
+            if isinstance(order, range):
+                order = array.array('i', order)
+            keys = keys[:count]
+            # Splice each new row in after the existing rows at the same time.
+            merged_order, merged_keys = order[:0], keys[:0]
+            start = 0
+            for key, row, _ in new_rows:
+                stop = bisect.bisect_right(keys, key, start, count)
+                merged_order += order[start:stop]
+                merged_keys += keys[start:stop]
+                merged_order.append(row)
+                merged_keys.append(key)
+                start = stop
+            merged_order += order[start:]
+            merged_keys += keys[start:]
+            self._time_order, self._time_keys = merged_order, merged_keys
+            self._time_rank = array.array('i', bytes(4 * len(merged_order)))
+            for rank, row in enumerate(merged_order):
+                self._time_rank[row] = rank
+
+        for key, row, position in new_rows:
+            rows = self._rows_by_neo[position]
+            times = _RowTimes(self, rows)
+            if rows and key < times[-1]:
+                rows.insert(bisect.bisect_right(times, key), row)
+            else:
+                rows.append(row)
+
+    def query(self, filters=(), sort_by=None, descending=False, limit=None):
         """Query close approaches, generate matches to filter collection.
 
         This generates a stream of `CloseApproach` objects that match all
@@ -107,19 +1081,402 @@ class NEODatabase:
 
         If no arguments are provided, generate all known close approaches.
 
-        The `CloseApproach` objects are generated in internal order,
-        which isn't guaranteed to be sorted meaningfully, although is
-        often sorted by time.
+        The `CloseApproach` objects are generated in order of approach time.
+        The filters are evaluated according to the query's `plan`, so only
+        the candidates of its access path are checked against the remaining
+        filters.
+
+        With `sort_by`, they're generated in order of that column instead,
+        with ties in order of approach time, and unknown values (such as
+        unknown diameters) last. Where there's an index in that order - the
+        index of approach times, or of NEOs by diameter - the candidates are
+        visited in its order, so the first results are generated without
+        sorting all of them. Otherwise, with a `limit`, only the best `limit`
+        matches are kept as they're found, in a bounded heap (see
+        `_sort_rows`).
 
         :param filters: A collection of filters capturing user-specified
                         criteria.
+        :param sort_by: One of `SORT_COLUMNS` to sort by, or None.
+        :param descending: Whether to sort from the greatest value to the
+                           least.
+        :param limit: At most how many close approaches to generate, or 0 or
+                      None for all of them.
         :return: A stream of matching `CloseApproach` objects.
+        :raise ValueError: If `sort_by` isn't a column that can be sorted by.
         """
-        for approach in self._approaches:
+        if sort_by is None and descending:
+            sort_by = 'time'
+        if sort_by is not None and sort_by not in SORT_COLUMNS:
+            raise ValueError(f"Can't sort by {sort_by!r}: use one of "
+                             f"{', '.join(SORT_COLUMNS)}.")
+        return self._query(filters, sort_by, descending, limit)
+
+    def _query(self, filters, sort_by, descending, limit):
+        """Generate the close approaches of `query`, with checked arguments."""
+        plan = self.plan(filters)
+        if sort_by is None or (sort_by == 'time' and not descending):
+            rows = self._execute(plan)
+        elif sort_by == 'time':
+            rows = self._execute(plan, self._candidates(plan)[::-1])
+        elif sort_by == 'diameter' and plan.access in (QueryPlan.FULL_SCAN,
+                                                       QueryPlan.NEO_SCAN):
+            rows = self._rows_by_diameter(plan, descending)
+        else:
+            rows = self._sort_rows(self._execute(plan), sort_by, descending,
+                                   limit)
+        for row in itertools.islice(rows, limit or None):
+            yield self._approach(row)
+
+    def _rows_by_diameter(self, plan, descending=False):
+        """Generate the rows that match a plan, in order of NEO diameter.
+
+        The NEOs are visited in the order of the index of NEOs by diameter, and
+        the rows of the NEOs with the same diameter are merged into order of
+        approach time. The NEOs of unknown diameter, which aren't in the index,
+        come last: their rows are picked out of the time index in one pass.
+
+        :param plan: A `QueryPlan`, with a `FULL_SCAN` or `NEO_SCAN` access
+                     path.
+        :param descending: Whether to visit the largest NEOs first.
+        """
+        diameters = self._neo_values('diameter')
+        positions = self._diameter_order
+        if descending:
+            positions = positions[::-1]
+        groups = [list(group) for _, group
+                  in itertools.groupby(positions, diameters.__getitem__)]
+        matching = None
+        if plan.access == QueryPlan.NEO_SCAN:
+            matching = set(self._matching_neos(plan.access_filters))
+            groups = [[position for position in group if position in matching]
+                      for group in groups]
+
+        # The chunks start small, so that the first few results (the usual
+        # case, with a `limit`) only cost the first few groups.
+        check = QueryPlan(QueryPlan.FULL_SCAN, plan.filters,
+                          [len(self._time_order)])
+        chunk, size = [], 16
+        for group in groups:
+            chunk.extend(self._merge_rows([self._rows_by_neo[position]
+                                           for position in group]))
+            if len(chunk) >= size:
+                yield from self._execute(check, chunk)
+                chunk, size = [], min(2 * size, _SORT_CHUNK_SIZE)
+        yield from self._execute(check, chunk)
+
+        unknown = [math.isnan(diameter) for diameter in diameters]
+        if matching is not None:
+            unknown = [is_unknown and position in matching
+                       for position, is_unknown in enumerate(unknown)]
+        if any(unknown):
+            time_order = self._time_order
+            neos = map(self._neo_index.__getitem__, time_order)
+            is_unknown = map(unknown.__getitem__, neos)
+            rows = itertools.compress(time_order, is_unknown)
+            yield from self._execute(check, list(rows))
+
+    def _sort_key(self, column):
+        """Return a function of a row that returns its value of a column."""
+        if column in self._NEO_COLUMNS:
+            values, neo_index = self._neo_values(column), self._neo_index
+            return lambda row: values[neo_index[row]]
+        approaches = self._approaches
+        attribute = operator.attrgetter(self._APPROACH_COLUMNS[column])
+        return lambda row: attribute(approaches[row])
+
+    def _sort_rows(self, rows, sort_by, descending=False, limit=None):
+        """Sort a stream of rows, in order of approach time, by a column.
+
+        Ties stay in order of approach time, and unknown (NaN) values go last.
+        With a `limit`, only the best `limit` rows are kept as the stream is
+        read - in a heap, with `heapq.nsmallest` or `heapq.nlargest` - which
+        takes O(n log k) time and O(k) memory for n rows and k = `limit`.
+
+        :param rows: An iterable of rows, in order of approach time.
+        :param sort_by: One of `SORT_COLUMNS`.
+        :param descending: Whether to sort from the greatest value to the
+                           least.
+        :param limit: At most how many rows to return, or 0 or None for all
+                      of them.
+        :return: An iterable of the sorted rows.
+        """
+        if sort_by == 'time':
+            if not descending:
+                return itertools.islice(rows, limit or None)
+            # The last rows in time order, latest first.
+            return reversed(collections.deque(rows, maxlen=limit or None))
+
+        value = self._sort_key(sort_by)
+
+        def key(row):
+            v = value(row)
+            # NaN is the only value that isn't equal to itself, and it
+            # compares false with everything, so give it a placeholder that
+            # ties with every other NaN and so keeps those rows in order.
+            if v != v:
+                return (False, 0.0) if descending else (True, 0.0)
+            return (True, v) if descending else (False, v)
+
+        if limit:
+            select = heapq.nlargest if descending else heapq.nsmallest
+            return select(limit, rows, key=key)
+        return sorted(rows, key=key, reverse=descending)
+
+    def _is_neo_filter(self, flt):
+        """Return whether a filter is known to only read NEO attributes."""
+        return is_vectorizable(flt) and flt.column in self._NEO_COLUMNS
+
+    def _selectivity(self, flt):
+        """Estimate the fraction of close approaches that satisfy a filter."""
+        total = len(self._time_order)
+        if not total or not is_vectorizable(flt):
+            return 1.0
+        if flt.column == 'time':
+            start, end, residual = date_bounds([flt])
+            if residual:
+                return 1.0
+            return len(self._time_range(start, end)) / total
+        statistics = self._statistics.get(flt.column)
+        return statistics.fraction(flt.op, flt.value) if statistics else 1.0
+
+    def plan(self, filters=(), rent=True):
+        """Plan how to answer a query for a collection of filters.
+
+        Each possible access path is costed by the number of rows it visits:
+
+        - A full scan visits every close approach.
+        - A time index range, if there are date filters, visits exactly the
+          close approaches between those dates.
+        - An NEO scan, if there are filters on NEO attributes, visits the NEOs
+          selected by the NEO indexes (see `_indexed_neos`) and then the
+          (estimated) close approaches of the matching ones.
+
+        The cheapest path is chosen, and the remaining filters are ordered by
+        rank - how much each is expected to narrow the rows, relative to its
+        cost - so that cheap, selective filters run first.
+
+        :param filters: A collection of filters capturing user-specified
+                        criteria.
+        :param rent: Whether the query counts towards building the k-d
+                     tree (see `_rent_kd_tree`) - not if the plan only orders
+                     filters that are checked some other way.
+        :return: A `QueryPlan`.
+        """
+        self._ensure_indexed()
+        filters = list(filters)
+        total = len(self._time_order)
+        start, end, others = date_bounds(filters)
+        date_filters = [flt for flt in filters
+                        if not any(flt is other for other in others)]
+        neo_filters = [flt for flt in others if self._is_neo_filter(flt)]
+
+        plans = [(total, QueryPlan(QueryPlan.FULL_SCAN, others, [total]))]
+        if start is not None or end is not None:
+            rows = len(self._time_range(start, end))
+            plans.append((rows, QueryPlan(QueryPlan.TIME_INDEX, others, [rows],
+                                          access_filters=date_filters,
+                                          start=start, end=end)))
+        if neo_filters:
+            rows = total
+            for flt in neo_filters:
+                rows *= self._selectivity(flt)
+            remaining = date_filters + [flt for flt in others
+                                        if flt not in neo_filters]
+            selected, _ = self._indexed_neos(neo_filters)
+            plans.append((len(selected) + rows,
+                          QueryPlan(QueryPlan.NEO_SCAN, remaining, [rows],
+                                    access_filters=neo_filters)))
+        box_filters = [flt for flt in others if self._is_box_filter(flt)]
+        if box_filters:
+            rows = total
+            for flt in box_filters:
+                rows *= self._selectivity(flt)
+            remaining = date_filters + [flt for flt in others
+                                        if flt not in box_filters]
+            # The matching rows are sorted into time order, and the rows the
+            # tree is out of date for are checked one by one.
+            cost = rows * (1 + math.log2(rows + 1) / 8) \
+                + len(self._kd_tree_stale)
+            cheapest = min(cost for cost, _ in plans)
+            if self._kd_tree is None \
+                    and not (rent and self._rent_kd_tree(cheapest)):
+                cost = math.inf
+            plans.append((cost, QueryPlan(QueryPlan.KD_TREE, remaining, [rows],
+                                          access_filters=box_filters)))
+        _, plan = min(plans, key=lambda candidate: candidate[0])
+
+        # A filter answered by the time index range is already accounted for.
+        selectivity = {id(flt): self._selectivity(flt) for flt in plan.filters}
+        plan.filters.sort(key=lambda flt: (selectivity[id(flt)] - 1)
+                          / getattr(flt, 'cost', 4))
+        for flt in plan.filters:
+            plan.estimates.append(plan.estimates[-1] * selectivity[id(flt)])
+        return plan
+
+    def _is_box_filter(self, flt):
+        """Return whether a filter bounds a box the k-d tree can search."""
+        return is_vectorizable(flt) \
+            and flt.column in self._KD_TREE_COLUMNS \
+            and flt.op in _BISECT_BOUNDS \
+            and isinstance(flt.value, (int, float)) \
+            and not math.isnan(flt.value)
+
+    def _rent_kd_tree(self, cost):
+        """Decide whether to build the k-d tree, for a query that could use it.
+
+        Building the tree only pays for itself over several queries, so until
+        it's built, each query that could use it is answered without it, and
+        its cost is added up. Once the total reaches the cost of building the
+        tree, the tree is built - so the queries never cost more than twice
+        what they would have if it had been built from the start.
+
+        :param cost: The estimated cost of answering the query without the
+                     tree.
+        :return: Whether the tree has been built.
+        """
+        self._kd_tree_rent += cost
+        build_cost = self.KD_TREE_BUILD_COST * len(self._time_order)
+        if self._kd_tree_rent < build_cost:
+            return False
+        self._kd_tree_index()
+        return True
+
+    def _kd_tree_index(self):
+        """Return the `_KDTree` of the approaches, building it if need be.
+
+        Two threads may both build it, but to the same effect.
+        """
+        if self._kd_tree is None:
+            rows = range(len(self._time_order))
+            self._kd_tree_stale = set()
+            self._kd_tree = _KDTree([self._values(column, rows)
+                                     for column in self._KD_TREE_COLUMNS])
+        return self._kd_tree
+
+    def _kd_tree_search(self, filters):
+        """Find the rows inside the box of some filters, with the k-d tree.
+
+        The rows the tree is out of date for (see `ingest`) are left out of
+        its matches, and checked against the filters one by one instead.
+
+        :param filters: A collection of box filters (see `_is_box_filter`).
+        :return: A sequence of the matching rows, in no particular order.
+        """
+        rows = self._kd_tree_index().search(
+            [(self._KD_TREE_COLUMNS.index(flt.column), flt)
+             for flt in filters])
+        stale = self._kd_tree_stale
+        if not stale:
+            return rows
+        rows = [row for row in rows if row not in stale]
+        stale = sorted(stale)
+        mask = None
+        for flt in filters:
+            check = flt.mask(self._values(flt.column, stale))
+            if mask is not None:
+                check = map(operator.and_, mask, check)
+            mask = check
+        rows.extend(itertools.compress(stale, mask))
+        return rows
+
+    def _indexed_neos(self, filters):
+        """Narrow down the NEOs that can match filters on NEO attributes.
+
+        Each filter on the diameter selects a range of the NEOs sorted by
+        diameter, and a filter on whether an NEO is hazardous selects one of
+        the two lists of NEOs; the smallest selection is used. Both take time
+        proportional to the number of NEOs selected, not to the number of
+        NEOs in the database.
+
+        :param filters: A collection of filters on NEO attributes.
+        :return: A tuple of a sequence of the positions of the selected NEOs,
+                 and a list of the filters that they have yet to be checked
+                 against.
+        """
+        keys = self._diameter_keys
+        lo, hi = 0, len(keys)
+        diameter = []
+        selections = []
+        for flt in filters:
+            if flt.column == 'diameter' and flt.op in _BISECT_BOUNDS:
+                first, last = _BISECT_BOUNDS[flt.op]
+                lo = max(lo, first(keys, flt.value) if first else 0)
+                hi = min(hi, last(keys, flt.value) if last else len(keys))
+                diameter.append(flt)
+            elif flt.column == 'hazardous' and flt.op is operator.eq \
+                    and flt.value in (True, False):
+                hazardous = self._neos_by_hazardous[bool(flt.value)]
+                selections.append((hazardous, flt))
+        if diameter:
+            selections.append((self._diameter_order[lo:max(lo, hi)], diameter))
+        if not selections:
+            return range(len(self._neos)), list(filters)
+
+        positions, used = min(selections,
+                              key=lambda selection: len(selection[0]))
+        used = used if isinstance(used, list) else [used]
+        return positions, [flt for flt in filters
+                           if not any(flt is other for other in used)]
+
+    def _check_neos(self, positions, filters):
+        """Return the positions of the NEOs that also match some filters."""
+        probe = _NEOProbe()
+        matching = []
+        for position in positions:
+            probe.neo = self._neos[position]
+            if all(flt(probe) for flt in filters):
+                matching.append(position)
+        return matching
+
+    def _matching_neos(self, filters):
+        """Return the positions of the NEOs that match filters on NEOs."""
+        positions, filters = self._indexed_neos(filters)
+        return self._check_neos(positions, filters) if filters else positions
+
+    def _merge_rows(self, rows_by_neo):
+        """Merge the rows of several NEOs into order of approach time.
+
+        Each NEO's rows are already in time order, so they're merged with
+        `heapq.merge`, in time proportional to the number of rows.
+        """
+        if len(rows_by_neo) == 1:
+            return rows_by_neo[0]
+        if self._time_rank is None:
+            return list(heapq.merge(*rows_by_neo))
+        return list(heapq.merge(*rows_by_neo, key=self._time_rank.__getitem__))
+
+    def _candidates(self, plan):
+        """Return the candidate rows of a plan's access path, in time order."""
+        if plan.access == QueryPlan.TIME_INDEX:
+            return self._time_range(plan.start, plan.end)
+        if plan.access == QueryPlan.NEO_SCAN:
+            positions = self._matching_neos(plan.access_filters)
+            return self._merge_rows([self._rows_by_neo[position]
+                                     for position in positions])
+        if plan.access == QueryPlan.KD_TREE:
+            rows = self._kd_tree_search(plan.access_filters)
+            if self._time_rank is None:
+                return sorted(rows)
+            return sorted(rows, key=self._time_rank.__getitem__)
+        return self._time_order
+
+    def _execute(self, plan, candidates=None):
+        """Generate the rows that match a plan.
+
+        :param plan: A `QueryPlan`.
+        :param candidates: The rows to check, if not every candidate of the
+                           plan's access path (such as one chunk of them).
+        """
+        approaches = self._approaches
+        if candidates is None:
+            candidates = self._candidates(plan)
+
+        for row in candidates:
+            approach = approaches[row]
             is_matched = True
             # check each filter in collection
-            for filter in filters:
-                # no arguments provided
+            for filter in plan.filters:
                 if not filter(approach):
                     # filter failed
                     is_matched = False
@@ -128,5 +1485,692 @@ class NEODatabase:
 
             # all filters succeeded for that approach object
             if is_matched:
-                # sequence of approach values for generator function
-                yield approach
+                yield row
+
+    def _execute_shared(self, plans, candidates):
+        """Find the rows that match each of several plans, in one pass.
+
+        Each candidate row's close approach is fetched once, and then checked
+        against the filters of every plan.
+
+        :param plans: A sequence of `QueryPlan`s.
+        :param candidates: The rows to check.
+        :return: A list of the matching rows of each plan.
+        """
+        approaches = self._approaches
+        matches = [[] for _ in plans]
+        checks = list(zip([plan.filters for plan in plans], matches))
+        for row in candidates:
+            approach = approaches[row]
+            for filters, rows in checks:
+                for filter in filters:
+                    if not filter(approach):
+                        break
+                else:
+                    rows.append(row)
+        return matches
+
+    def explain(self, filters=()):
+        """Plan a query, run it, and describe the plan with its row counts.
+
+        The query is run to completion, counting how many rows each step of
+        the plan produces. The filters are called one row at a time, so that
+        every step can be counted.
+
+        :param filters: A collection of filters capturing user-specified
+                        criteria.
+        :return: A multi-line string describing the plan, with estimated and
+                 actual row counts.
+        """
+        plan = self.plan(filters)
+        candidates = self._candidates(plan)
+        actual = [len(candidates)] + [0] * len(plan.filters)
+        for row in candidates:
+            view = self._row_view(row)
+            for step, flt in enumerate(plan.filters, start=1):
+                if not flt(view):
+                    break
+                actual[step] += 1
+        return plan.describe(actual)
+
+    def batch_query(self, filter_sets, orders=None):
+        """Query close approaches for many collections of filters at once.
+
+        All of the queries are answered in a single pass over the close
+        approaches, in order of approach time, that costs about as much as
+        one query, however many there are:
+
+        - Each filter set's date filters become a range of the time index, and
+          the pass only visits rows inside at least one filter set's range.
+        - Filters on NEO attributes are evaluated once per NEO, up front.
+        - The other filters on stored columns are grouped by column and
+          comparator (see `_FilterGroup`), so each value is looked up once in
+          each group, rather than compared with every filter set's filter.
+        - Any other filter is only called on the rows that match everything
+          else in its filter set.
+
+        The pass happens in this call. The matching rows of each filter set are
+        kept as compact arrays, and only turned into `CloseApproach` objects as
+        each filter set's stream is consumed.
+
+        :param filter_sets: A sequence of collections of filters, such as from
+                            `create_filters`.
+        :param orders: Optionally, for each filter set, a tuple of the
+                       `sort_by`, `descending` and `limit` arguments of
+                       `query`, to sort its matches (with `_sort_rows`).
+        :return: A list with a stream of matching `CloseApproach` objects
+                 for each filter set, each in order of approach time unless
+                 it's sorted otherwise.
+        """
+        self._ensure_indexed()
+        filter_sets = [list(filters) for filters in filter_sets]
+        everyone = (1 << len(filter_sets)) - 1
+        starts = collections.defaultdict(int)
+        stops = collections.defaultdict(int)
+        approach_groups = {}
+        neo_groups = {}
+        residuals = {}
+
+        for position, filters in enumerate(filter_sets):
+            bit = 1 << position
+            start, end, others = date_bounds(filters)
+            lo, hi = self._time_bounds(start, end)
+            if lo == hi:
+                continue
+            starts[lo] |= bit
+            stops[hi] |= bit
+            for flt in others:
+                if is_vectorizable(flt) and flt.op in _BISECT_BOUNDS:
+                    if flt.column in self._NEO_COLUMNS:
+                        groups = neo_groups
+                    elif flt.column in self._APPROACH_COLUMNS \
+                            and flt.column != 'time':
+                        groups = approach_groups
+                    else:
+                        groups = None
+                    if groups is not None:
+                        key = (flt.column, flt.op)
+                        if key not in groups:
+                            groups[key] = _FilterGroup(flt.op)
+                        groups[key].add(flt.value, bit)
+                        continue
+                residuals.setdefault(bit, []).append(flt)
+
+        for group in itertools.chain(approach_groups.values(),
+                                     neo_groups.values()):
+            group.compile(everyone)
+
+        # The filter sets that each NEO doesn't rule out.
+        neo_masks = [everyone] * len(self._neos)
+        for (column, _), group in neo_groups.items():
+            neo_masks = list(map(operator.and_, neo_masks,
+                                 map(group, self._neo_values(column))))
+
+        matches = [array.array('i') for _ in filter_sets]
+        bounds = sorted(set(starts) | set(stops))
+        active = 0
+        for lo, hi in zip(bounds, bounds[1:]):
+            active = (active | starts[lo]) & ~stops[lo]
+            if not active:
+                continue
+            for chunk in range(lo, hi, self.BATCH_CHUNK_SIZE):
+                stop = min(hi, chunk + self.BATCH_CHUNK_SIZE)
+                self._batch_chunk(self._time_order[chunk:stop], active,
+                                  neo_masks, approach_groups, residuals,
+                                  matches)
+
+        if orders is not None:
+            matches = [rows if order[0] is None
+                       else self._sort_rows(rows, *order)
+                       for rows, order in zip(matches, orders)]
+        return [map(self._approach, rows) for rows in matches]
+
+    def _batch_chunk(self, rows, active, neo_masks, groups, residuals,
+                     matches):
+        """Check a chunk of rows against the filter sets of a batch.
+
+        :param rows: The rows to check, in order of approach time.
+        :param active: The mask of the filter sets whose date range covers the
+                       rows.
+        :param neo_masks: The mask of the filter sets that each NEO doesn't
+                          rule out.
+        :param groups: A dict of the `_FilterGroup`s of close approach columns,
+                       by column and comparator.
+        :param residuals: A dict of the other filters of each filter set, by
+                          its bit.
+        :param matches: An `array` of the matching rows of each filter set, to
+                        extend.
+        """
+        checks = [(group, self._values(column, rows))
+                  for (column, _), group in groups.items()]
+        residual_bits = 0
+        for bit in residuals:
+            residual_bits |= bit
+        neo_index = self._neo_index
+
+        for i, row in enumerate(rows):
+            mask = active & neo_masks[neo_index[row]]
+            for group, values in checks:
+                if not mask:
+                    break
+                mask &= group(values[i])
+            if not mask:
+                continue
+            if mask & residual_bits:
+                view = self._row_view(row)
+                pending = mask & residual_bits
+                while pending:
+                    bit = pending & -pending
+                    pending ^= bit
+                    if not all(flt(view) for flt in residuals[bit]):
+                        mask ^= bit
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                matches[bit.bit_length() - 1].append(row)
+
+    async def aget_neo_by_designation(self, designation):
+        """Find and return an NEO by its designation, from `asyncio` code.
+
+        The lookup is a dictionary access, so it never blocks the event loop.
+        See `get_neo_by_designation`.
+        """
+        return self.get_neo_by_designation(designation)
+
+    async def aget_neo_by_name(self, name):
+        """Find and return an NEO by its name, from `asyncio` code.
+
+        The lookup is a dictionary access, so it never blocks the event loop.
+        See `get_neo_by_name`.
+        """
+        return self.get_neo_by_name(name)
+
+    async def aexplain(self, filters=(), executor=None):
+        """Describe the plan of a query, in an executor. See `explain`."""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(executor, self.explain, filters)
+
+    async def aquery(self, filters=(), executor=None):
+        """Query close approaches from `asyncio` code.
+
+        This is an asynchronous generator of the same `CloseApproach` objects,
+        in the same order, as `query`. The query is planned, and its candidate
+        rows are checked, in an executor (by default, the event loop's) - a
+        chunk of `ASYNC_CHUNK_SIZE` rows per call - so the event loop is never
+        blocked for long. (Only a query that builds the indexes, on a lazy
+        database, is also planned in the executor.)
+
+        Only a little work is done ahead of the consumer: the next chunk is
+        checked while the current one is consumed, and a shared scan holds at
+        most `ASYNC_QUEUE_DEPTH` chunks of results for a consumer before it
+        waits. Cancelling the consumer (or closing this generator) stops the
+        query after the chunk in progress.
+
+        If the query is planned as a full scan, it joins any full scan that
+        other `aquery` calls have started in the same turn of the event loop,
+        so that they all share a single pass over the close approaches.
+
+        :param filters: A collection of filters capturing user-specified
+                        criteria.
+        :param executor: The `concurrent.futures.Executor` to run the query in,
+                         or None for the event loop's default executor.
+        :return: An asynchronous stream of matching `CloseApproach` objects.
+        """
+        loop = asyncio.get_event_loop()
+        if self._indexed:
+            # Planning is quick once the indexes are built.
+            plan = self.plan(filters)
+        else:
+            plan = await loop.run_in_executor(executor, self.plan, filters)
+
+        if plan.access == QueryPlan.FULL_SCAN:
+            scan = self._shared_scan
+            if scan is None or scan.loop is not loop \
+                    or scan.executor is not executor:
+                scan = self._shared_scan = _SharedScan(self, loop, executor)
+            results = scan.join(plan)
+            try:
+                while True:
+                    approaches = await results.get()
+                    if approaches is None:
+                        return
+                    if isinstance(approaches, BaseException):
+                        raise approaches
+                    for approach in approaches:
+                        yield approach
+            finally:
+                scan.leave(results)
+
+        candidates = await loop.run_in_executor(executor, self._candidates,
+                                                plan)
+        size = self.ASYNC_CHUNK_SIZE
+        current = None
+        try:
+            for start in range(0, len(candidates), size):
+                upcoming = loop.run_in_executor(
+                    executor, self._check_chunk, plan,
+                    candidates[start:start + size])
+                previous, current = current, upcoming
+                if previous is not None:
+                    for approach in await previous:
+                        yield approach
+            if current is not None:
+                for approach in await current:
+                    yield approach
+        finally:
+            if current is not None:
+                current.cancel()
+
+    def _check_chunk(self, plan, candidates):
+        """Return the close approaches in a chunk of rows that match a plan."""
+        return [self._approach(row) for row in self._execute(plan, candidates)]
+
+
+class _SharedScan:
+    """A single pass over every close approach, shared by several queries.
+
+    Queries join the scan with `join`, and get back a queue of their results.
+    The pass starts at the next turn of the event loop, so every full-scan
+    query made in the same turn (such as by `asyncio.gather`) joins it; a
+    query made later starts a new pass. Each chunk of rows is checked against
+    every query still in the scan in one call to `_execute_shared`, in the
+    executor, and its results are put on each query's queue.
+
+    The queues are bounded, so the pass moves only as fast as the slowest
+    query's consumer. A query that leaves (say, when its consumer is
+    cancelled) is dropped, and the pass stops once every query has left.
+    """
+
+    def __init__(self, database, loop, executor):
+        """Create a new `_SharedScan`, starting at the next turn of a loop."""
+        self.database = database
+        self.loop = loop
+        self.executor = executor
+        self._queries = {}
+        loop.call_soon(self._start)
+
+    def join(self, plan):
+        """Add a query's plan to the scan, and return the queue of its results.
+
+        The queue gets a list of matching `CloseApproach` objects per chunk,
+        then None at the end (or an exception, if the scan fails).
+        """
+        results = asyncio.Queue(self.database.ASYNC_QUEUE_DEPTH)
+        self._queries[results] = plan
+        return results
+
+    def leave(self, results):
+        """Remove a query from the scan, by the queue of its results."""
+        if self._queries.pop(results, None) is not None:
+            # Make room, in case the scan is waiting to put more results.
+            while not results.empty():
+                results.get_nowait()
+
+    def _start(self):
+        """Close the scan to new queries, and start the pass."""
+        if self.database._shared_scan is self:
+            self.database._shared_scan = None
+        self.loop.create_task(self._run())
+
+    async def _run(self):
+        """Pass over every close approach, a chunk at a time."""
+        database = self.database
+        order = database._time_order
+        size = database.ASYNC_CHUNK_SIZE
+        try:
+            for start in range(0, len(order), size):
+                if not self._queries:
+                    return
+                queries = list(self._queries.items())
+                matches = await self.loop.run_in_executor(
+                    self.executor, self._check_chunk,
+                    [plan for _, plan in queries], order[start:start + size])
+                for (results, _), approaches in zip(queries, matches):
+                    if approaches and results in self._queries:
+                        await results.put(approaches)
+            end = None
+        except Exception as err:
+            end = err
+        for results in list(self._queries):
+            await results.put(end)
+
+    def _check_chunk(self, plans, candidates):
+        """Return the close approaches in a chunk that match each plan."""
+        database = self.database
+        return [[database._approach(row) for row in rows]
+                for rows in database._execute_shared(plans, candidates)]
+
+
+class _ApproachRows(collections.abc.Sequence):
+    """A read-only sequence of the close approaches in some rows of a table.
+
+    Each `CloseApproach` is built from its row only when it's accessed.
+    """
+
+    __slots__ = ('_database', '_rows')
+
+    def __init__(self, database, rows):
+        """Create a new `_ApproachRows`.
+
+        :param database: The `ColumnarNEODatabase` holding the rows.
+        :param rows: A sequence of row numbers.
+        """
+        self._database = database
+        self._rows = rows
+
+    def __len__(self):
+        """Return the number of rows."""
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        """Return the close approach at a position, or a slice of them."""
+        if isinstance(index, slice):
+            return _ApproachRows(self._database, self._rows[index])
+        return self._database._approach(self._rows[index])
+
+    def __iter__(self):
+        """Generate the close approaches in order."""
+        approach = self._database._approach
+        for row in self._rows:
+            yield approach(row)
+
+    def __repr__(self):
+        """Return `repr(self)`, a computer-readable string representation."""
+        return f"<{len(self)} close approaches>"
+
+
+class _ApproachCursor:
+    """A stand-in for the close approach in one row of a columnar table.
+
+    Filters only read a handful of attributes from a close approach, so a
+    single cursor is pointed at each row in turn and the filters read those
+    attributes straight from the columns - no `CloseApproach` is built for a
+    row that doesn't match.
+    """
+
+    __slots__ = ('_database', 'row')
+
+    def __init__(self, database, row=0):
+        """Create a new `_ApproachCursor` over a `ColumnarNEODatabase`."""
+        self._database = database
+        self.row = row
+
+    @property
+    def time(self):
+        """Return the approach time of the current row."""
+        return minutes_to_datetime(self._database._time[self.row])
+
+    @property
+    def distance(self):
+        """Return the approach distance of the current row."""
+        return self._database._distance[self.row]
+
+    @property
+    def velocity(self):
+        """Return the approach velocity of the current row."""
+        return self._database._velocity[self.row]
+
+    @property
+    def neo(self):
+        """Return the NEO of the current row."""
+        return self._database._neos[self._database._neo_index[self.row]]
+
+    @property
+    def designation(self):
+        """Return the designation of the current row's NEO."""
+        return self.neo.designation
+
+
+class ColumnarNEODatabase(NEODatabase):
+    """A database of NEOs whose close approaches are stored as columns.
+
+    Rather than a list of `CloseApproach` objects, this keeps one array per
+    attribute, with one entry per close approach (a "row"):
+
+    - `_time`: the approach time, in minutes since the epoch (int64).
+    - `_distance`: the nominal approach distance, in au (float64).
+    - `_velocity`: the relative approach velocity, in km/s (float64).
+    - `_neo_index`: the position of the approach's NEO in `_neos` (int32).
+
+    That takes about 28 bytes per close approach. A `CloseApproach` is only
+    built for a row when it's returned by `query` or read through an NEO's
+    `.approaches`; while it's still referenced elsewhere, the same object is
+    returned for that row.
+
+    The NEOs themselves are ordinary `NearEarthObject`s, but each one's
+    `.approaches` is a lazy sequence over its rows. Their diameters and
+    hazardous flags are also kept as columns (one entry per NEO), so that
+    filters on them can be evaluated without touching the NEO objects.
+    """
+
+    # Columns with one value per close approach, and with one value per NEO.
+    _APPROACH_COLUMNS = {'time': '_time', 'distance': '_distance',
+                         'velocity': '_velocity'}
+    _NEO_COLUMNS = {'diameter': '_neo_diameter', 'hazardous': '_neo_hazardous'}
+
+    def __init__(self, neos, approaches):
+        """Create a new `ColumnarNEODatabase`.
+
+        This has the same preconditions as `NEODatabase`, and also accepts a
+        stream of close approaches. The supplied `CloseApproach` objects are
+        converted into columns and aren't kept (nor linked).
+
+        :param neos: A collection of `NearEarthObject`s.
+        :param approaches: A collection (or stream) of `CloseApproach`es.
+        """
+        neos = list(neos)
+        index = {neo.designation: i for i, neo in enumerate(neos)}
+
+        time = array.array('q')
+        distance = array.array('d')
+        velocity = array.array('d')
+        neo_index = array.array('i')
+        for approach in approaches:
+            time.append(datetime_to_minutes(approach.time))
+            distance.append(approach.distance)
+            velocity.append(approach.velocity)
+            neo_index.append(index[approach.designation])
+
+        self._attach(neos, time, distance, velocity, neo_index)
+
+    @classmethod
+    def from_columns(cls, neos, time, distance, velocity, neo_index):
+        """Create a `ColumnarNEODatabase` directly from its columns.
+
+        :param neos: A sequence of `NearEarthObject`s.
+        :param time: An `array` of approach times, in minutes since the epoch.
+        :param distance: An `array` of approach distances, in au.
+        :param velocity: An `array` of approach velocities, in km/s.
+        :param neo_index: An `array` of positions in `neos`.
+        :return: A new `ColumnarNEODatabase`.
+        """
+        database = cls.__new__(cls)
+        database._attach(list(neos), time, distance, velocity, neo_index)
+        return database
+
+    def _attach(self, neos, time, distance, velocity, neo_index):
+        """Take ownership of the NEOs and the columns, and link them."""
+        self._neos = neos
+        self._time = time
+        self._distance = distance
+        self._velocity = velocity
+        self._neo_index = neo_index
+        self._materialized = weakref.WeakValueDictionary()
+        self._index_neos()
+        self._neo_diameter = array.array('d', (neo.diameter for neo in neos))
+        self._neo_hazardous = array.array('B', (neo.hazardous for neo in neos))
+
+        self._approaches = _ApproachRows(self, range(len(time)))
+        self._index()
+
+        # Each NEO lists its own approaches from its group of rows.
+        for neo, rows in zip(neos, self._rows_by_neo):
+            neo.approaches = _ApproachRows(self, rows)
+
+    def _add_neo(self, neo):
+        """Add a new NEO, with no close approaches yet."""
+        position = super()._add_neo(neo)
+        self._neo_diameter.append(neo.diameter)
+        self._neo_hazardous.append(bool(neo.hazardous))
+        neo.approaches = _ApproachRows(self, self._rows_by_neo[position])
+        return position
+
+    def _update_neo(self, position, neo):
+        """Update the name, diameter and hazard flag of an NEO."""
+        super()._update_neo(position, neo)
+        self._neo_diameter[position] = neo.diameter
+        self._neo_hazardous[position] = bool(neo.hazardous)
+
+    def _add_row(self, approach, position):
+        """Add a close approach of the NEO at a position; return its row."""
+        self._time.append(datetime_to_minutes(approach.time))
+        self._distance.append(approach.distance)
+        self._velocity.append(approach.velocity)
+        self._neo_index.append(position)
+        self._approaches = _ApproachRows(self, range(len(self._time)))
+        return len(self._time) - 1
+
+    def _update_row(self, row, approach):
+        """Update the distance and velocity of the close approach in a row."""
+        self._distance[row] = approach.distance
+        self._velocity[row] = approach.velocity
+        materialized = self._materialized.get(row)
+        if materialized is not None:
+            materialized.distance = approach.distance
+            materialized.velocity = approach.velocity
+
+    def _times(self):
+        """Return the approach time of each row, in minutes since the epoch."""
+        return self._time
+
+    def _index_times(self, keys):
+        """Build the index of rows in order of approach time, as arrays."""
+        super()._index_times(keys)
+        if not isinstance(self._time_order, range):
+            self._time_order = array.array('i', self._time_order)
+            self._time_keys = array.array('q', self._time_keys)
+
+    _time_key = staticmethod(datetime_to_minutes)
+
+    def _approach(self, row):
+        """Return the `CloseApproach` in a row, building it if need be."""
+        approach = self._materialized.get(row)
+        if approach is None:
+            neo = self._neos[self._neo_index[row]]
+            approach = CloseApproach(designation=neo.designation,
+                                     time=minutes_to_datetime(self._time[row]),
+                                     distance=self._distance[row],
+                                     velocity=self._velocity[row],
+                                     neo=neo)
+            self._materialized[row] = approach
+        return approach
+
+    def _row_view(self, row):
+        """Return a cursor on a row, which filters can be called on."""
+        cursor = _ApproachCursor(self)
+        cursor.row = row
+        return cursor
+
+    def _values(self, column, rows):
+        """Return the values of a close approach column in some rows."""
+        values = getattr(self, self._APPROACH_COLUMNS[column])
+        return self._gather(values, rows)
+
+    def _sort_key(self, column):
+        """Return a function of a row that returns its value of a column."""
+        if column in self._APPROACH_COLUMNS:
+            return getattr(self, self._APPROACH_COLUMNS[column]).__getitem__
+        return super()._sort_key(column)
+
+    def _neo_values(self, column):
+        """Return the values of an NEO column, one per NEO."""
+        return getattr(self, self._NEO_COLUMNS[column])
+
+    def _stores(self, column):
+        """Return whether a column is stored by this database."""
+        return column in self._APPROACH_COLUMNS or column in self._NEO_COLUMNS
+
+    @staticmethod
+    def _gather(column, rows):
+        """Return the values of a column in some rows, in order."""
+        if isinstance(rows, range) and rows.step == 1:
+            if len(rows) == len(column):
+                return column
+            return column[rows.start:rows.stop]
+        return list(map(column.__getitem__, rows))
+
+    def _mask(self, flt, rows):
+        """Evaluate a vectorizable filter over some rows.
+
+        A filter on an NEO attribute is evaluated once per NEO, and each row
+        then looks up the result for its NEO.
+
+        :param flt: A filter whose `column` this database stores.
+        :param rows: The rows to evaluate the filter over.
+        :return: An iterator of whether each row satisfies the filter.
+        """
+        if flt.column in self._APPROACH_COLUMNS:
+            column = getattr(self, self._APPROACH_COLUMNS[flt.column])
+            return flt.mask(self._gather(column, rows))
+        by_neo = bytes(flt.mask(getattr(self, self._NEO_COLUMNS[flt.column])))
+        return map(by_neo.__getitem__, self._gather(self._neo_index, rows))
+
+    def _check_neos(self, positions, filters):
+        """Return the positions of the NEOs that also match some filters.
+
+        The filters are evaluated column-wise over the NEO columns.
+        """
+        masks = [flt.mask(self._gather(
+                     getattr(self, self._NEO_COLUMNS[flt.column]), positions))
+                 for flt in filters]
+        mask = masks[0]
+        for other in masks[1:]:
+            mask = map(operator.and_, mask, other)
+        return list(itertools.compress(positions, mask))
+
+    def _execute(self, plan, candidates=None):
+        """Generate the rows that match a plan.
+
+        Filters on a stored column are evaluated column-wise over the
+        candidate rows: their masks are combined with `map` and applied with
+        `itertools.compress`, so the columns are swept together, lazily, in a
+        single pass. Any other filter is then called on a cursor for each
+        remaining row. Both keep the order of the plan.
+
+        :param plan: A `QueryPlan`.
+        :param candidates: The rows to check, if not every candidate of the
+                           plan's access path (such as one chunk of them).
+        """
+        vectorized, residual = compile_filters(plan.filters)
+        # A custom filter may name a column that isn't stored here.
+        residual += [flt for flt in vectorized if not self._stores(flt.column)]
+        vectorized = [flt for flt in vectorized if self._stores(flt.column)]
+
+        if candidates is None:
+            candidates = self._candidates(plan)
+        rows = candidates
+        if vectorized:
+            mask = self._mask(vectorized[0], candidates)
+            for flt in vectorized[1:]:
+                mask = map(operator.and_, mask, self._mask(flt, candidates))
+            rows = itertools.compress(candidates, mask)
+
+        if not residual:
+            yield from rows
+            return
+        cursor = _ApproachCursor(self)
+        for row in rows:
+            cursor.row = row
+            for filter in residual:
+                if not filter(cursor):
+                    break
+            else:
+                yield row
+
+    def _execute_shared(self, plans, candidates):
+        """Find the rows that match each of several plans, in one pass.
+
+        The filters are evaluated column-wise, so each plan sweeps the chunk's
+        columns on its own; the chunk is still read from the index only once.
+        """
+        return [list(self._execute(plan, candidates)) for plan in plans]
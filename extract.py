@@ -7,6 +7,14 @@ The `load_approaches` function extracts close approach data from a JSON file,
 formatted as described in the project instructions, into a collection of
 `CloseApproach` objects.
 
+The `stream_approaches` function walks the same JSON file incrementally, row
+by row, and generates `CloseApproach` objects as they are parsed - without
+ever holding the whole document in memory.
+
+Each of them can instead produce `LazyNearEarthObject`s or
+`LazyCloseApproach`es (with `lazy=True`), which keep the raw values and convert
+them on first use.
+
 The main module calls these functions with the arguments provided at the
 command line, and uses the resulting collections to build an `NEODatabase`.
 """
@@ -15,75 +23,140 @@ import csv
 import json
 import pathlib
 import errno
-from pathlib import Path
-from os import path
-from models import NearEarthObject, CloseApproach
+import operator
+import sys
+from models import (NearEarthObject, CloseApproach, LazyNearEarthObject,
+                    LazyCloseApproach)
 
 
 # global variable to data directory
 data_dir = pathlib.Path(__file__).parent / 'data'
 
+# The order of the "fields" header of NASA's close approach API. It is only
+# relied upon when the "data" array precedes the "fields" header in the file.
+CAD_FIELDS = ('des', 'orbit_id', 'jd', 'cd', 'dist', 'dist_min', 'dist_max',
+              'v_rel', 'v_inf', 't_sigma_f', 'h')
+
+# The columns of the NEO CSV file that a `NearEarthObject` is built from, in
+# the order of its designation, name, diameter and hazardous flag.
+NEO_COLUMNS = ('pdes', 'name', 'diameter', 'pha')
+
+# Size of each read from the JSON file while streaming.
+STREAM_CHUNK_SIZE = 1 << 16
+
+
+def _resolve_data_file(filename):
+    """Resolve a data filename against the data directory, or fail loudly.
+
+    :param filename: A path (absolute, or relative to the data directory).
+    :return: A `pathlib.Path` to an existing file.
+    """
+    path = data_dir / filename
+
+    # verify the file exists
+    if path.exists():
+        print(f"File \"{path.absolute()}\" exists")
+    else:
+        print(f"File \"{path.absolute()}\" does not exist")
+        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT),
+                                filename)
+    return path
+
+
+def _cad_positions(fields):
+    """Find the positions of des, cd, dist and v_rel in a "fields" header.
 
-def load_neos(neo_csv_filename):
+    :param fields: A sequence of field names, as in the "fields" header.
+    :return: A tuple of the four positions.
+    """
+    try:
+        return tuple(fields.index(field)
+                     for field in ('des', 'cd', 'dist', 'v_rel'))
+    except ValueError:
+        raise ValueError(f"Close approach fields {fields!r} are missing one "
+                         f"of 'des', 'cd', 'dist' or 'v_rel'.") from None
+
+
+def _neo_positions(header, columns):
+    """Find the positions of some columns in the header of the NEO CSV file.
+
+    :param header: The column names, from the first row of the CSV file.
+    :param columns: The names of the columns to find.
+    :return: A tuple of the positions of the columns.
+    """
+    try:
+        return tuple(header.index(column) for column in columns)
+    except ValueError:
+        missing = [column for column in columns if column not in header]
+        raise ValueError(f"NEO columns {missing!r} are missing from the CSV "
+                         f"header.") from None
+
+
+def load_neos(neo_csv_filename, lazy=False, extra_columns=()):
     """Read near-Earth object information from a CSV file.
 
+    Only the pdes, name, diameter and pha columns are read from each row (the
+    file has dozens more). Their positions are looked up in the header once,
+    and then picked out of each row with an `operator.itemgetter`.
+
     :param neo_csv_path: A path to a CSV file containing data about near-Earth
                          objects.
+    :param lazy: Whether to create `LazyNearEarthObject`s instead.
+    :param extra_columns: The names of any other columns to read. Each NEO's
+                          `extra` maps these names to their raw values.
     :return: A collection of `NearEarthObject`s.
     """
-    # bring global variable into function
-    global data_dir
-    # use global variable to get path to filename in data directory
-    neo_csv_path = data_dir / neo_csv_filename
-
-    # verify csv file exists
-    if neo_csv_path.exists():
-        print(f"File \"{neo_csv_path.absolute()}\" exists")
-    else:
-        print(f"File \"{neo_csv_path.absolute()}\" does not exist")
-        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT),
-                                neo_csv_filename)
+    neo_csv_path = _resolve_data_file(neo_csv_filename)
+    model = LazyNearEarthObject if lazy else NearEarthObject
+    extra_columns = tuple(extra_columns)
 
     list_neos = []
 
     # load and read csv data
-    with open(neo_csv_path, 'r') as infile:
-        csv_reader = csv.DictReader(infile, delimiter=',')
+    with open(neo_csv_path, 'r', newline='') as infile:
+        csv_reader = csv.reader(infile, delimiter=',')
+        header = next(csv_reader, [])
+
+        # select specific csv columns
+        project = operator.itemgetter(*_neo_positions(header, NEO_COLUMNS))
+        extra_positions = _neo_positions(header, extra_columns)
+        extras = None
 
-    # select specific csv columns
         for row in csv_reader:
-            # create neo object to add to list
-            neo = NearEarthObject(
-                    designation=row['pdes'],
-                    name=row['name'],
-                    diameter=row['diameter'],
-                    hazardous=row['pha']
+            if len(row) < len(header):
+                if not row:
+                    # A blank line, which `csv.DictReader` would skip too.
+                    continue
+                # A short row is missing its last values, as with `DictReader`.
+                row += [''] * (len(header) - len(row))
+            designation, name, diameter, hazardous = project(row)
+            if extra_columns:
+                extras = {column: row[position] for column, position
+                          in zip(extra_columns, extra_positions)}
+            # create neo object to add to list, interning its strings so
+            # that its close approaches share its designation
+            neo = model(
+                    designation=sys.intern(designation),
+                    name=sys.intern(name),
+                    diameter=diameter,
+                    hazardous=hazardous,
+                    extra=extras
             )
             list_neos.append(neo)
 
     return list_neos
 
 
-def load_approaches(cad_json_filename):
+def load_approaches(cad_json_filename, lazy=False):
     """Read close approach data from a JSON file.
 
     :param cad_json_path: A path to a JSON file containing data about close
                           approaches.
+    :param lazy: Whether to create `LazyCloseApproach`es instead.
     :return: A collection of `CloseApproach`es.
     """
-    # bring global variable into function
-    global data_dir
-
-    # use global variable to get path to filename in data directory
-    cad_json_path = data_dir / cad_json_filename
-
-    # verify json file exists
-    if cad_json_path.exists():
-        print(f"File \"{cad_json_path.absolute()}\" exists")
-    else:
-        print("File \"cad.json_path.absolute()}\" does not exist")
-        raise FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT),
-                                cad_json_filename)
+    cad_json_path = _resolve_data_file(cad_json_filename)
+    model = LazyCloseApproach if lazy else CloseApproach
 
     cad_data = []
     with open(cad_json_path, 'r') as json_data:
@@ -91,15 +164,170 @@ def load_approaches(cad_json_filename):
         # load json data
         data_load = json.load(json_data)
 
-        # iterate through "data" tuples selecting des, cd, dist, v_rel
+        # locate des, cd, dist, v_rel from the "fields" header
+        des, cd, dist, v_rel = _cad_positions(
+            data_load.get("fields", CAD_FIELDS))
+
+        # iterate through "data" tuples selecting des, cd, dist, v_rel,
+        # interning des to share it with the NEO's designation
         for i in data_load["data"]:
-            # create close approach object using positional location
-            cad = CloseApproach(designation=i[0],
-                                time=i[3],
-                                distance=i[4],
-                                velocity=i[7]
-                                )
+            cad = model(designation=sys.intern(i[des]),
+                        time=i[cd],
+                        distance=i[dist],
+                        velocity=i[v_rel]
+                        )
             # append the selected tuples
             cad_data.append(cad)
 
     return cad_data
+
+
+class _JSONStream:
+    """A minimal pull-parser over a JSON text file.
+
+    The stream keeps only a window of the file in memory. Whole values are
+    decoded with the C-accelerated `json.JSONDecoder.raw_decode`, and the
+    window is refilled whenever a value runs past its end.
+    """
+
+    _WHITESPACE = ' \t\n\r'
+
+    def __init__(self, infile, chunk_size=STREAM_CHUNK_SIZE):
+        """Create a new `_JSONStream` reading from a text file object."""
+        self._infile = infile
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+        # How many characters were dropped from the front of the window.
+        self._dropped = 0
+
+    def _fill(self):
+        """Read another chunk into the window. Return False at end of file."""
+        if self._eof:
+            return False
+        chunk = self._infile.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        # drop the consumed prefix so the window stays small
+        self._dropped += self._pos
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    @property
+    def offset(self):
+        """Return how many characters of the file have been consumed."""
+        return self._dropped + self._pos
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at EOF)."""
+        while True:
+            buf, pos = self._buf, self._pos
+            while pos < len(buf) and buf[pos] in self._WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        """Consume the next non-whitespace character, which must be `char`."""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Malformed JSON: expected {char!r} at offset "
+                             f"{self.offset}, found {found!r}.")
+        self._pos += 1
+
+    def value(self):
+        """Decode and return the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number could be cut off by the end of the window, so only
+            # trust a value that is followed by something (or by EOF).
+            if end < len(self._buf) or not self._fill():
+                self._pos = end
+                return obj
+
+    def array(self):
+        """Generate the elements of the JSON array starting at the cursor."""
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.peek() == ',':
+                self._pos += 1
+            else:
+                self.expect(']')
+                return
+
+
+def stream_approaches(cad_json_filename, lazy=False):
+    """Generate close approaches from a JSON file, one row at a time.
+
+    Unlike `load_approaches`, the file is never decoded in one piece: the
+    top-level object is walked key by key and the "data" array row by row, so
+    each `CloseApproach` is produced as soon as its row has been read.
+
+    The "fields" header decides which position in a row holds each value. The
+    header normally comes before "data"; if it doesn't, rows are read in
+    NASA's documented field order and the header is checked against that
+    order once it's reached.
+
+    :param cad_json_filename: A path to a JSON file containing data about
+                              close approaches.
+    :param lazy: Whether to generate `LazyCloseApproach`es instead.
+    :yield: `CloseApproach`es, in file order.
+    """
+    cad_json_path = _resolve_data_file(cad_json_filename)
+    model = LazyCloseApproach if lazy else CloseApproach
+
+    with open(cad_json_path, 'r') as json_data:
+        stream = _JSONStream(json_data)
+        positions = None
+
+        stream.expect('{')
+        if stream.peek() == '}':
+            return
+        while True:
+            key = stream.value()
+            stream.expect(':')
+
+            if key == 'fields':
+                fields = stream.value()
+                if positions is None:
+                    positions = _cad_positions(fields)
+                elif _cad_positions(fields) != positions:
+                    raise ValueError(
+                        f"The \"fields\" header {fields!r} follows the "
+                        f"\"data\" array and disagrees with the default "
+                        f"field order.")
+            elif key == 'data':
+                if positions is None:
+                    positions = _cad_positions(CAD_FIELDS)
+                des, cd, dist, v_rel = positions
+                for i in stream.array():
+                    yield model(designation=sys.intern(i[des]),
+                                time=i[cd],
+                                distance=i[dist],
+                                velocity=i[v_rel])
+            else:
+                # signature, count, and anything else we don't need
+                stream.value()
+
+            if stream.peek() == ',':
+                stream.expect(',')
+            else:
+                stream.expect('}')
+                return
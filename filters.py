@@ -11,6 +11,16 @@ from a comparator (from the `operator` module), a reference value, and a
 class method `get` that subclasses can override to fetch an attribute of
 interest from the supplied `CloseApproach`.
 
+The built-in filters can also be evaluated a whole column at a time: each
+names the `column` it reads, and its `mask` method compares every value of that
+column to the reference value at once. The `compile_filters` function splits a
+collection of filters into those that can be evaluated this way and the rest,
+which must be called on one close approach at a time.
+
+The `date_bounds` function folds the date filters of a collection into a
+single inclusive range of dates, which a database can answer from an index of
+approach times instead of checking the date of every close approach.
+
 The `limit` function simply limits the maximum number of values produced by an
 iterator.
 
@@ -20,6 +30,8 @@ import operator
 import itertools
 import datetime
 
+from helpers import datetime_to_minutes
+
 
 class UnsupportedCriterionError(NotImplementedError):
     """A filter criterion is unsupported."""
@@ -39,8 +51,20 @@ class AttributeFilter:
 
     Concrete subclasses can override the `get` classmethod to provide custom
     behavior to fetch a desired attribute from the given `CloseApproach`.
+
+    Subclasses whose attribute is stored as a column of a columnar database
+    also name that `column`, so the filter can be evaluated over the whole
+    column with `mask`.
     """
 
+    # The name of the column holding the attribute, or None if the filter
+    # can only be evaluated on one close approach at a time.
+    column = None
+
+    # The rough relative cost of calling the filter on one close approach,
+    # which a query planner weighs against how selective the filter is.
+    cost = 4
+
     def __init__(self, op, value):
         """Construct new `AttributeFilter` from binary predicate and ref value.
 
@@ -72,6 +96,18 @@ class AttributeFilter:
         """
         raise UnsupportedCriterionError
 
+    def mask(self, values):
+        """Evaluate this filter over a whole column of values at once.
+
+        The comparisons are driven by `map`, so they run without executing any
+        Python bytecode per value.
+
+        :param values: An iterable of the attribute of interest, one per row,
+                       in the units of `self.column`.
+        :return: An iterator of whether each value satisfies this filter.
+        """
+        return map(self.op, values, itertools.repeat(self.value))
+
     def __repr__(self):
         """Return name, operator and value."""
         return f"{self.__class__.__name__}\
@@ -81,15 +117,59 @@ class AttributeFilter:
 class DateFilter(AttributeFilter):
     """Get classmethod for approach date, start_date, end_date."""
 
+    column = 'time'
+    cost = 3
+
+    # A date is a whole day of minutes, so comparing a date to the day of an
+    # approach time means comparing minutes to the first minute of that day
+    # (`start`) or of the next day (`end`).
+    _BOUNDS = {
+        operator.ge: ((operator.ge, 'start'),),
+        operator.gt: ((operator.ge, 'end'),),
+        operator.le: ((operator.lt, 'end'),),
+        operator.lt: ((operator.lt, 'start'),),
+        operator.eq: ((operator.ge, 'start'), (operator.lt, 'end')),
+    }
+
     @classmethod
     def get(cls, approach):
         """Return filter for approach date, start_date, end_date."""
         return approach.time.date()
 
+    def mask(self, values):
+        """Evaluate this filter over a column of minutes since the epoch.
+
+        :param values: A sequence of approach times, in minutes since the
+                       epoch.
+        :return: An iterator of whether each time satisfies this filter.
+        """
+        start = datetime.datetime.combine(self.value, datetime.time())
+        bounds = {
+            'start': datetime_to_minutes(start),
+            'end': datetime_to_minutes(start + datetime.timedelta(days=1)),
+        }
+        comparisons = self._BOUNDS.get(self.op)
+        if comparisons is None:
+            # Anything else (e.g. `operator.ne`) compares whole days.
+            days = map(operator.floordiv, values, itertools.repeat(24 * 60))
+            day = bounds['start'] // (24 * 60)
+            return map(self.op, days, itertools.repeat(day))
+        if len(comparisons) == 1:
+            (op, bound), = comparisons
+            return map(op, values, itertools.repeat(bounds[bound]))
+        # Both bounds are needed, so the column is read twice.
+        (low_op, low), (high_op, high) = comparisons
+        return map(operator.and_,
+                   map(low_op, values, itertools.repeat(bounds[low])),
+                   map(high_op, values, itertools.repeat(bounds[high])))
+
 
 class DistanceFilter(AttributeFilter):
     """Get classmethod for approach distance_min and distance_max."""
 
+    column = 'distance'
+    cost = 1
+
     @classmethod
     def get(cls, approach):
         """Return filter for approach distance_min and distance_max."""
@@ -99,6 +179,9 @@ class DistanceFilter(AttributeFilter):
 class VelocityFilter(AttributeFilter):
     """Get classmethod for approach velocity_min and velocity_max."""
 
+    column = 'velocity'
+    cost = 1
+
     @classmethod
     def get(cls, approach):
         """Return filter for approach velocity_min and velocity_max."""
@@ -108,6 +191,9 @@ class VelocityFilter(AttributeFilter):
 class DiameterFilter(AttributeFilter):
     """Get classmethod for approach.neo diameter_min and diameter_max."""
 
+    column = 'diameter'
+    cost = 2
+
     @classmethod
     def get(cls, approach):
         """Return filter for approach.neo diameter_min and diameter_max."""
@@ -117,6 +203,9 @@ class DiameterFilter(AttributeFilter):
 class HazardousFilter(AttributeFilter):
     """Get classmethod for approach.neo hazardous and not hazardous."""
 
+    column = 'hazardous'
+    cost = 2
+
     @classmethod
     def get(cls, approach):
         """Return filter for approach.neo hazardous and not hazardous."""
@@ -214,6 +303,74 @@ def create_filters(
     return filters
 
 
+def is_vectorizable(flt):
+    """Return whether a filter can be evaluated a whole column at a time.
+
+    This is also what makes a filter's meaning known to a database, beyond
+    just being a callable, so that it can plan how to answer a query.
+
+    A subclass that overrides `get` (without naming a new `column`) no longer
+    reads the column that its parent names, so it isn't vectorizable.
+    """
+    if getattr(flt, 'column', None) is None:
+        return False
+    for cls in type(flt).__mro__:
+        if 'column' in vars(cls):
+            return type(flt).get.__func__ is cls.get.__func__
+    return False
+
+
+def compile_filters(filters):
+    """Split a collection of filters by how they can be evaluated.
+
+    :param filters: A collection of filters, such as from `create_filters`.
+    :return: A tuple of the filters that can be evaluated over whole columns
+             (with `mask`) and the filters that must be called on each
+             close approach.
+    """
+    vectorized, residual = [], []
+    for flt in filters:
+        (vectorized if is_vectorizable(flt) else residual).append(flt)
+    return vectorized, residual
+
+
+def date_bounds(filters):
+    """Fold the date filters of a collection into an inclusive date range.
+
+    Only `DateFilter`s comparing with ==, >=, >, <= or < are folded; anything
+    else (including subclasses that override `get`) is left for the caller to
+    evaluate as usual. If the date filters contradict each other, the start
+    date comes after the end date, and the range is empty.
+
+    :param filters: A collection of filters, such as from `create_filters`.
+    :return: A tuple of the first matching date (or None, if unbounded), the
+             last matching date (or None, if unbounded) and a list of the
+             remaining filters.
+    """
+    one_day = datetime.timedelta(days=1)
+    start = end = None
+    residual = []
+    for flt in filters:
+        if not isinstance(flt, DateFilter) or not is_vectorizable(flt) \
+                or flt.op not in DateFilter._BOUNDS:
+            residual.append(flt)
+            continue
+        low = high = None
+        if flt.op in (operator.eq, operator.ge):
+            low = flt.value
+        elif flt.op is operator.gt:
+            low = flt.value + one_day
+        if flt.op in (operator.eq, operator.le):
+            high = flt.value
+        elif flt.op is operator.lt:
+            high = flt.value - one_day
+        if low is not None and (start is None or low > start):
+            start = low
+        if high is not None and (end is None or high < end):
+            end = high
+    return start, end, residual
+
+
 def limit(iterator, n=None):
     """Produce a limited stream of values from an iterator.
 
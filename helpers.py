@@ -3,16 +3,41 @@
 NASA's dataset provides timestamps as naive datetimes (corresponding to UTC).
 
 The `cd_to_datetime` function converts a string, formatted as the `cd` field of
-NASA's close approach data, into a Python `datetime`
+NASA's close approach data, into a Python `datetime`. It's called for every
+close approach, so it parses the fixed layout of those strings directly rather
+than with `strptime`.
 
 The `datetime_to_str` function converts a Python `datetime` into a string.
 Although `datetime`s already have human-readable string representations, those
 representations display seconds, but NASA's data (and our datetimes!) don't
 provide that level of resolution, so the output format also will not.
+
+The `datetime_to_minutes` and `minutes_to_datetime` functions convert a naive
+`datetime` to and from a whole number of minutes since the Unix epoch, which is
+how approach times are stored in compact binary form.
 """
 import datetime
 
 
+# The English abbreviated month names used by NASA, as `%b` parses them.
+_MONTHS = {name: number for number, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+     'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'),
+    start=1)}
+_DIGITS = frozenset('0123456789')
+
+# Memos of the `YYYY-bb-DD ` and `hh:mm` parts of calendar dates that have
+# already been parsed, as `(year, month, day)` and `(hour, minute)`. Close
+# approaches share dates, and there are only 1440 times of day, so these stay
+# small; just in case, each is cleared once it holds `MEMO_SIZE` entries.
+MEMO_SIZE = 1 << 17
+_dates = {}
+_times = {}
+
+# The reference point of `datetime_to_minutes` and `minutes_to_datetime`.
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
 def cd_to_datetime(calendar_date):
     """Convert a NASA-formatted calendar date/time description into a datetime.
 
@@ -24,10 +49,42 @@ def cd_to_datetime(calendar_date):
     This will become the Python object`datetime.datetime(2020,
     12, 31, 12, 0)`.
 
+    Rather than `strptime`, which is slow, this slices the fixed-width fields
+    out of the string and looks up the month in a table, remembering the date
+    and time parts it has seen before. Anything out of the ordinary is left to
+    `strptime`, so the result (or error) is always the same as `strptime`'s.
+
     :param calendar_date: A calendar date in YYYY-bb-DD hh:mm format.
     :return: A naive `datetime` corresponding to the given calendar date
              and time.
     """
+    try:
+        return datetime.datetime(*_dates[calendar_date[:12]],
+                                 *_times[calendar_date[12:]])
+    except KeyError:
+        return _parse_calendar_date(calendar_date)
+
+
+def _parse_calendar_date(calendar_date):
+    """Parse a calendar date whose date or time part isn't memoized yet."""
+    if len(calendar_date) == 17 \
+            and calendar_date[4] == '-' and calendar_date[8] == '-' \
+            and calendar_date[11] == ' ' and calendar_date[14] == ':':
+        year, day = calendar_date[0:4], calendar_date[9:11]
+        hour, minute = calendar_date[12:14], calendar_date[15:17]
+        month = _MONTHS.get(calendar_date[5:8])
+        digits = year + day + hour + minute
+        if month and set(digits) <= _DIGITS:
+            date = (int(year), month, int(day))
+            time = (int(hour), int(minute))
+            # This raises ValueError for an impossible date, as strptime does.
+            result = datetime.datetime(*date, *time)
+            for memo, key, value in ((_dates, calendar_date[:12], date),
+                                     (_times, calendar_date[12:], time)):
+                if len(memo) >= MEMO_SIZE:
+                    memo.clear()
+                memo[key] = value
+            return result
     return datetime.datetime.strptime(calendar_date, "%Y-%b-%d %H:%M")
 
 
@@ -44,3 +101,26 @@ def datetime_to_str(dt):
     :return: That datetime, as a human-readable string without seconds.
     """
     return datetime.datetime.strftime(dt, "%Y-%m-%d %H:%M")
+
+
+def datetime_to_minutes(dt):
+    """Convert a naive Python datetime into whole minutes since the epoch.
+
+    NASA's data has a resolution of one minute, so nothing is lost. Datetimes
+    before 1970 produce negative numbers.
+
+    :param dt: A naive Python datetime.
+    :return: The number of minutes from 1970-01-01 00:00 to `dt`, as an int.
+    """
+    return (dt - EPOCH) // datetime.timedelta(minutes=1)
+
+
+def minutes_to_datetime(minutes):
+    """Convert whole minutes since the epoch into a naive Python datetime.
+
+    This is the inverse of `datetime_to_minutes`.
+
+    :param minutes: The number of minutes since 1970-01-01 00:00.
+    :return: The corresponding naive `datetime`.
+    """
+    return EPOCH + datetime.timedelta(minutes=minutes)
@@ -0,0 +1,167 @@
+"""Keep a database up to date with its data files, reloading in the background.
+
+A `LiveDatabase` holds the current version of a database, and watches the
+files it was built from. When they change, a background thread builds a new
+database from them while the current one keeps answering commands. The new
+version is only swapped in by `refresh`, which the owner of the database (such
+as the interactive shell) calls between commands - so a command never sees a
+half-built database, and sees the same database from start to finish.
+
+A file counts as changed when its size or modification time is different, and
+a new version is only built once the files have stayed the same for a whole
+poll, so that a file that's still being written isn't read. If a build fails,
+the current version stays in place, and the files are tried again when they
+next change.
+"""
+import datetime
+import os
+import threading
+import time
+
+
+# How often, in seconds, to check whether the data files have changed, by
+# default.
+INTERVAL = 2.0
+
+
+class ReloadError(Exception):
+    """A new version of a database couldn't be built from its data files."""
+
+
+def signature(paths):
+    """Return the size and modification time of each of some files.
+
+    :param paths: A sequence of Path-like objects.
+    :return: A tuple with a pair of the size and modification time (in
+             nanoseconds) of each file, or None for a file that's missing.
+    """
+    signatures = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signatures.append(None)
+        else:
+            signatures.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(signatures)
+
+
+class LiveDatabase:
+    """A database that's rebuilt in the background when its data files change.
+
+    `database` is the current version, numbered by `version`. Each entry of
+    `history` is a tuple of a version's number, when it was loaded and how many
+    seconds it took to build (None if it was given rather than built).
+    """
+
+    def __init__(self, load, paths, database=None, interval=INTERVAL):
+        """Create a new `LiveDatabase`.
+
+        The files aren't watched until `start` is called.
+
+        :param load: A function of no arguments that builds a database from
+                     the files.
+        :param paths: The paths of the files to watch.
+        :param database: The current database, if it's already been built from
+                         the files, or None to build it now.
+        :param interval: How often, in seconds, to check whether the files
+                         have changed.
+        """
+        self._load = load
+        self.paths = list(paths)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        # The signature of the files that the newest version (current, pending
+        # or failed) was built from, and what they were at the last poll.
+        self._built = self._polled = signature(self.paths)
+        self._pending = None
+        self._error = None
+        self.building = False
+
+        seconds = None
+        if database is None:
+            start = time.perf_counter()
+            database = load()
+            seconds = time.perf_counter() - start
+        self.database = database
+        self.version = 1
+        self.history = [(1, datetime.datetime.now(), seconds)]
+
+    def poll(self):
+        """Check the files once, and build a new version if they've changed.
+
+        This is what the background thread does every `interval` seconds; it
+        can also be called directly, for instance without starting the thread.
+
+        :return: Whether a new version was built (or failed to be).
+        """
+        current = signature(self.paths)
+        polled, self._polled = self._polled, current
+        if current == self._built or current != polled:
+            # Unchanged, or still changing.
+            return False
+
+        self.building = True
+        start = time.perf_counter()
+        try:
+            database = self._load()
+        except Exception as err:
+            with self._lock:
+                self._error = ReloadError(f"Unable to reload the data: {err}")
+        else:
+            with self._lock:
+                # A newer build replaces one that was never swapped in.
+                self._pending = (database, time.perf_counter() - start)
+        finally:
+            self._built = current
+            self.building = False
+        return True
+
+    def refresh(self):
+        """Swap in the newest version of the database, if one has been built.
+
+        Call this between commands, never during one.
+
+        :return: Whether there's a new version.
+        :raise ReloadError: If the newest build failed. The current version
+                            stays.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, None
+            error, self._error = self._error, None
+        if pending is not None:
+            self.database, seconds = pending
+            self.version += 1
+            self.history.append((self.version, datetime.datetime.now(),
+                                 seconds))
+        if error is not None:
+            raise error
+        return pending is not None
+
+    def start(self):
+        """Start watching the files, in a background thread."""
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._watch, daemon=True)
+            self._thread.start()
+
+    def stop(self, wait=True):
+        """Stop watching the files.
+
+        :param wait: Whether to wait for a build in progress to finish. If not,
+                     it's abandoned (the thread is a daemon, so it doesn't keep
+                     the process alive).
+        """
+        if self._thread is not None:
+            self._stopped.set()
+            if wait:
+                self._thread.join()
+            self._thread = None
+
+    def _watch(self):
+        """Poll the files every `interval` seconds, until stopped."""
+        while not self._stopped.wait(self.interval):
+            self.poll()
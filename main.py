@@ -5,7 +5,7 @@ See `README.md` for a detailed discussion of this project.
 
 This script can be invoked from the command line::
 
-    $ python3 main.py {inspect,query,interactive} [args]
+    $ python3 main.py {inspect,query,batch,interactive,serve,compile,ingest} [args]
 
 The `inspect` subcommand looks up an NEO by name or by primary designation, and
 optionally lists all of that NEO's known close approaches:
@@ -14,6 +14,14 @@ optionally lists all of that NEO's known close approaches:
     $ python3 main.py inspect --name Halley
     $ python3 main.py inspect --verbose --name Halley
 
+When the exact designation or name isn't known, `--prefix` lists the NEOs whose
+designation or name starts with some text, and `--fuzzy` lists the NEOs whose
+designation or name is most like it (ignoring case and extra spaces, either
+way). `--limit` sets how many are listed, 10 by default:
+
+    $ python3 main.py inspect --prefix '2020 AY'
+    $ python3 main.py inspect --fuzzy haley --limit 3
+
 The `query` subcommand searches for close approaches that match given criteria:
 
     $ python3 main.py query --date 1969-07-29
@@ -23,18 +31,115 @@ The `query` subcommand searches for close approaches that match given criteria:
     $ python3 main.py query --start-date 2000-01-01 --max-diameter 0.1 --not-hazardous
     $ python3 main.py query --hazardous --max-distance 0.05 --min-velocity 30
 
-The set of results can be limited in size and/or saved to an output file in CSV
-or JSON format:
+The set of results can be limited in size and/or saved to an output file in CSV,
+JSON or JSON Lines (`.jsonl` or `.ndjson`) format:
 
     $ python3 main.py query --limit 5 --outfile results.csv
     $ python3 main.py query --limit 15 --outfile results.json
+    $ python3 main.py query --hazardous --outfile results.jsonl
+
+Results are written as they're found, so even an unlimited query doesn't hold
+all of its results in memory. Add `--compact` for JSON without indentation.
+
+Results come in order of approach time, unless `--sort-by` sorts them by
+`time`, `distance`, `velocity` or `diameter` instead; add `--desc` for the
+greatest first. With `--limit`, only the top results are kept while sorting:
+
+    $ python3 main.py query --hazardous --sort-by distance --limit 5
+    $ python3 main.py query --start-date 2020-01-01 --sort-by velocity --desc --limit 10
+
+An output file whose name ends in `.gz`, `.bz2` or `.xz` (such as
+`results.csv.gz`) is compressed to match. Add `--background` to compress in a
+background thread, while the query is still finding results.
+
+To see how a query is answered - which index it uses, and in which order it
+applies the filters - along with the estimated and actual number of rows at
+each step, add `--explain`:
+
+    $ python3 main.py query --date 2020-03-14 --hazardous --explain
+
+The `batch` subcommand runs many queries at once, from a file with the options
+of one `query` per line (blank lines and lines starting with `#` are skipped):
+
+    $ cat nightly.txt
+    --start-date 2020-01-01 --end-date 2020-01-31 --outfile january.csv
+    --max-distance 0.025 --min-velocity 30 --outfile close-and-fast.json
+    $ python3 main.py batch nightly.txt
+
+All of the queries are answered in a single pass over the close approaches, so
+a batch of many queries takes about as long as one.
 
 The `interactive` subcommand loads the NEO database and spawns an interactive
 command shell that can repeatedly execute `inspect` and `query` commands without
-having to wait to reload the database each time. However, it doesn't hot-reload.
+having to wait to reload the database each time. While the session runs, the
+data files (or the `.neodb` file) are watched: when they change, a new database
+is built in the background while the old one keeps answering commands, and it
+takes over between two commands. Use `--reload-interval` to set how often, in
+seconds, the files are checked (0 turns it off); the `version` command reports
+which version of the data is in use, and how long each reload took.
+The session caches the results of its queries (see `cache.QueryCache`), so
+running a query again - or narrowing one down with more filters - doesn't scan
+the database again; the `stats` command reports how often the cache is hit. Use
+`--cache-rows` to bound how many rows it holds (0 turns it off).
+
+The `serve` subcommand loads the NEO database once and then answers `inspect`
+and `query` commands from other runs of this script, over a Unix socket:
+
+    $ python3 main.py serve &
+    $ python3 main.py query --date 2020-03-14 --hazardous
+
+While a server for the same data files is running, `inspect` and `query` are
+sent to it automatically instead of loading the database - output files are
+still written relative to the directory the command was run from. The socket
+is `neo.sock` next to the close approach file, unless `--socket` says
+otherwise. Use `--no-server` to always answer a command in its own process.
 
 If needed, the script can load data from data files other than the default with
 `--neofile` or `--cadfile`.
+
+The linked database is saved to a binary snapshot (next to the close approach
+file, unless `--snapshot` says otherwise) and reused by later runs for as long
+as the data files are unchanged. A snapshot is always restored into compact
+columns (as with `--columnar`), so that no close approach is built until it's
+shown. Use `--no-snapshot` to always load the data files from scratch.
+
+The `compile` subcommand builds a `.neodb` file (see `neodb`) from the data
+files: the linked database, with its indexes, in a form that's queried in place
+rather than loaded. Pass it with `--dbfile` instead of the data files:
+
+    $ python3 main.py compile data/neo.neodb
+    $ python3 main.py --dbfile data/neo.neodb query --date 2020-03-14 --hazardous
+
+A `.neodb` file is mapped into memory, so a command only reads the parts of it
+that it needs, and every process using the file shares one copy in memory. It
+isn't updated when the data files change - compile it again.
+
+The `ingest` subcommand merges new or updated NEOs (from a CSV file like
+`neos.csv`) and close approaches (from a JSON file like `cad.json`) into the
+saved database - the snapshot, or the `.neodb` file given with `--dbfile` -
+without rebuilding it:
+
+    $ python3 main.py ingest --approaches cad-delta.json
+    $ python3 main.py --dbfile data/neo.neodb ingest --neos neos-delta.csv --approaches cad-delta.json
+
+A close approach of the same NEO at the same time as one already in the
+database replaces it. The new data are appended to the snapshot, rather than
+saving it all again, until they grow to a quarter of its size. The snapshot is
+still keyed on the original data files, so replacing those rebuilds it from
+them. A running server keeps answering from the database it loaded.
+
+With `--columnar`, close approaches are stored in compact columns and only
+turned into objects when they're displayed or written, which uses far less
+memory. A database restored from a snapshot is always stored this way.
+
+With `--workers N`, the close approaches are converted in N worker processes
+while the NEOs are loaded, which is faster on a machine with several cores.
+
+With `--lazy`, the raw values from the data files are kept and each field is
+only converted when it's first needed, and the indexes used by queries are only
+built by the first query. That makes `inspect` (and an `interactive` session,
+until its first query) start quickly without a snapshot, but no snapshot is
+saved.
 """
 import argparse
 import cmd
@@ -44,10 +149,17 @@ import shlex
 import sys
 import time
 
-from extract import load_neos, load_approaches
-from database import NEODatabase
+from extract import load_neos, stream_approaches
+from database import NEODatabase, ColumnarNEODatabase, SORT_COLUMNS
 from filters import create_filters, limit
-from write import write_to_csv, write_to_json
+from cache import QueryCache, MAX_ROWS
+import live
+import names
+import parallel
+import server
+from neodb import open_database, write_database
+from snapshot import read_snapshot, write_snapshot, append_snapshot
+from write import output_format, write_to_csv, write_to_json, write_to_jsonl
 
 
 # Paths to the root of the project and the `data` subfolder.
@@ -57,6 +169,9 @@ DATA_ROOT = PROJECT_ROOT / 'data'
 # The current time, for use with the kill-on-change feature of the interactive shell.
 _START = time.time()
 
+# The arguments of the `query` subcommand that are dates.
+_DATE_OPTIONS = ('date', 'start_date', 'end_date')
+
 
 def date_fromisoformat(date_string):
     """Return a `datetime.date` corresponding to a string in YYYY-MM-DD format.
@@ -73,6 +188,17 @@ def date_fromisoformat(date_string):
         raise argparse.ArgumentTypeError(f"'{date_string}' is not a valid date. Use YYYY-MM-DD.")
 
 
+def search_text(text):
+    """Return the text of a `--prefix` or `--fuzzy` search, if it isn't blank.
+
+    :param text: The start of, or something like, a designation or name.
+    :return: The same text.
+    """
+    if not text.strip():
+        raise argparse.ArgumentTypeError("The text to search for can't be empty.")
+    return text
+
+
 def make_parser():
     """Create an ArgumentParser for this script.
 
@@ -89,6 +215,34 @@ def make_parser():
     parser.add_argument('--cadfile', default=(DATA_ROOT / 'cad.json'),
                         type=pathlib.Path,
                         help="Path to JSON file of close approach data.")
+    parser.add_argument('--dbfile', type=pathlib.Path,
+                        help="Path to a `.neodb` file made by `compile`, to query instead of "
+                             "the data files.")
+    parser.add_argument('--snapshot', type=pathlib.Path,
+                        help="Path to the binary snapshot of the linked database. "
+                             "Defaults to `neo.snapshot` next to the close approach file.")
+    parser.add_argument('--no-snapshot', dest='use_snapshot', action='store_false',
+                        help="Neither read nor write a snapshot; always load the data files.")
+    parser.add_argument('--workers', type=int, default=1, metavar='N',
+                        help="Convert close approaches in N worker processes, while the NEOs "
+                             "are loaded. Has no effect with --lazy, or when restoring a "
+                             "snapshot.")
+    parser.add_argument('--socket', type=pathlib.Path,
+                        help="Path to the Unix socket of the query server. "
+                             "Defaults to `neo.sock` next to the `.neodb` file or the close "
+                             "approach file.")
+    parser.add_argument('--no-server', dest='use_server', action='store_false',
+                        help="Don't send `inspect` and `query` to a running server; always "
+                             "load the database and answer them in this process.")
+    backends = parser.add_mutually_exclusive_group()
+    backends.add_argument('--columnar', action='store_true',
+                          help="Store close approaches in compact columns, and only build "
+                               "objects for the close approaches that are actually shown. "
+                               "A snapshot is always restored this way.")
+    backends.add_argument('--lazy', action='store_true',
+                          help="Keep the raw values from the data files, and only convert "
+                               "each field when it's first needed. Without a snapshot, this "
+                               "starts up faster, but doesn't save one.")
     subparsers = parser.add_subparsers(dest='cmd')
 
     # Add the `inspect` subcommand parser.
@@ -101,6 +255,14 @@ def make_parser():
                             help="The primary designation of the NEO to inspect (e.g. '433').")
     inspect_id.add_argument('-n', '--name',
                             help="The IAU name of the NEO to inspect (e.g. 'Halley').")
+    inspect_id.add_argument('--prefix', type=search_text,
+                            help="List the NEOs whose designation or name starts with this "
+                                 "(e.g. '2020 AY').")
+    inspect_id.add_argument('--fuzzy', type=search_text,
+                            help="List the NEOs whose designation or name is most like this "
+                                 "(e.g. 'haley').")
+    inspect.add_argument('-l', '--limit', type=int, default=names.LIMIT,
+                         help="With --prefix or --fuzzy, the most NEOs to list.")
 
     # Add the `query` subcommand parser.
     query = subparsers.add_parser('query',
@@ -147,19 +309,65 @@ def make_parser():
     query.add_argument('-l', '--limit', type=int,
                        help="The maximum number of matches to return. "
                             "Defaults to 10 if no --outfile is given.")
+    query.add_argument('--sort-by', choices=SORT_COLUMNS,
+                       help="Sort the matches by this field, instead of by approach time. "
+                            "NEOs of unknown diameter come last.")
+    query.add_argument('--desc', action='store_true',
+                       help="Sort the matches from the greatest to the least.")
     query.add_argument('-o', '--outfile', type=pathlib.Path,
                        help="File in which to save structured results. "
                             "If omitted, results are printed to standard output.")
+    query.add_argument('--compact', action='store_true',
+                       help="Write a JSON output file without indentation or spaces.")
+    query.add_argument('--background', action='store_true',
+                       help="Write (and compress) the output file in a background thread.")
+    query.add_argument('--explain', action='store_true',
+                       help="Instead of the results, print how the query is planned, "
+                            "with the estimated and actual number of rows at each step.")
+
+    batch = subparsers.add_parser('batch',
+                                  description="Run many queries in a single pass over the "
+                                              "close approaches.")
+    batch.add_argument('file', type=pathlib.Path,
+                       help="A file with the options of one `query` per line, such as "
+                            "`--date 2020-01-01 --outfile new-year.csv`.")
 
     repl = subparsers.add_parser('interactive',
                                  description="Start an interactive command session "
                                              "to repeatedly run `interact` and `query` commands.")
     repl.add_argument('-a', '--aggressive', action='store_true',
                       help="If specified, kill the session whenever a project file is modified.")
+    repl.add_argument('--cache-rows', type=int, default=MAX_ROWS, metavar='N',
+                      help="Cache the results of queries, up to N rows in all. "
+                           "Use 0 to turn off the cache.")
+    repl.add_argument('--reload-interval', type=float, default=live.INTERVAL, metavar='SECONDS',
+                      help="Check for changes to the data files every SECONDS, and reload "
+                           "them in the background. Use 0 to turn off reloading.")
+
+    subparsers.add_parser('serve',
+                          description="Load the database once, and answer `inspect` and `query` "
+                                      "commands from other runs of this script over a Unix "
+                                      "socket.")
+
+    compile_ = subparsers.add_parser('compile',
+                                     description="Build a `.neodb` file from the data files, "
+                                                 "to query in place with --dbfile.")
+    compile_.add_argument('output', nargs='?', type=pathlib.Path,
+                          help="Where to write the `.neodb` file. Defaults to --dbfile, or "
+                               "`neo.neodb` next to the close approach file.")
+
+    ingest = subparsers.add_parser('ingest',
+                                   description="Merge new or updated NEOs and close approaches "
+                                               "into the snapshot, or the `.neodb` file.")
+    ingest.add_argument('--neos', type=pathlib.Path,
+                        help="Path to a CSV file of new or updated near-Earth objects.")
+    ingest.add_argument('--approaches', type=pathlib.Path,
+                        help="Path to a JSON file of new or updated close approaches.")
     return parser, inspect, query
 
 
-def inspect(database, pdes=None, name=None, verbose=False):
+def inspect(database, pdes=None, name=None, verbose=False, stdout=None, stderr=None,
+            prefix=None, fuzzy=None, limit=names.LIMIT):
     """Perform the `inspect` subcommand.
 
     This function fetches an NEO by designation or by name. If a matching NEO is
@@ -167,71 +375,188 @@ def inspect(database, pdes=None, name=None, verbose=False):
     all of the NEO's known close approaches is printed if `verbose=True`).
     Otherwise, a message is printed noting that there are no matching NEOs.
 
-    At least one of `pdes` and `name` must be given. If both are given, prefer
-    to look up the NEO by the primary designation.
+    Alternatively, with `prefix` or `fuzzy`, it searches for up to `limit` NEOs
+    whose designation or name starts with (or is most like) some text, and
+    prints each of them in the same way, best match first.
+
+    At least one of `pdes`, `name`, `prefix` and `fuzzy` must be given. If more
+    than one is given, prefer them in that order.
 
     :param database: The `NEODatabase` containing data on NEOs and their close approaches.
     :param pdes: The primary designation of an NEO for which to search.
     :param name: The name of an NEO for which to search.
     :param verbose: Whether to additionally print all of a matching NEO's close approaches.
-    :return: The matching `NearEarthObject`, or None if not found.
+    :param stdout: Where to print the NEO. Defaults to `sys.stdout`.
+    :param stderr: Where to print errors. Defaults to `sys.stderr`.
+    :param prefix: The start of the designation or name of the NEOs for which to search.
+    :param fuzzy: Something like the designation or name of the NEOs for which to search.
+    :param limit: The most NEOs to print, for `prefix` or `fuzzy`.
+    :return: The matching `NearEarthObject` (or for `prefix` or `fuzzy`, a
+             non-empty list of them), or None if not found.
     """
-    # Fetch the NEO of interest.
+    # Fetch the NEO (or NEOs) of interest.
     if pdes:
-        neo = database.get_neo_by_designation(pdes)
+        neos = [database.get_neo_by_designation(pdes)]
+    elif name:
+        neos = [database.get_neo_by_name(name)]
+    elif prefix is not None:
+        neos = database.find_neos_by_prefix(prefix, limit)
+    elif fuzzy is not None:
+        neos = [neo for neo, _ in database.find_neos_like(fuzzy, limit)]
+
     else:
-        neo = database.get_neo_by_name(name)
+        neos = []
 
     # Ensure that we have received an NEO.
-    if not neo:
-        print("No matching NEOs exist in the database.", file=sys.stderr)
+    if not any(neos):
+        print("No matching NEOs exist in the database.", file=stderr or sys.stderr)
         return None
 
-    # Display information about this NEO, and optionally its close approaches if verbose.
-    print(neo)
-    if verbose:
-        for approach in neo.approaches:
-            print(f"- {approach}")
-    return neo
+    # Display information about each NEO, and optionally its close approaches if verbose.
+    for neo in neos:
+        print(neo, file=stdout)
+        if verbose:
+            for approach in neo.approaches:
+                print(f"- {approach}", file=stdout)
+    return neos[0] if pdes or name else neos
 
 
-def query(database, args):
+def query(database, args, stdout=None, stderr=None):
     """Perform the `query` subcommand.
 
     Create a collection of filters with `create_filters` and supply them to the
     database's `query` method to produce a stream of matching results.
 
-    If an output file wasn't given, print these results to stdout, limiting to
-    10 entries if no limit was specified. If an output file was given, use the
+    The results are sorted as `query_order` says. If an output file wasn't
+    given, print these results to stdout, limiting to 10 entries if no limit
+    was specified. If an output file was given, use the
     file's extension to infer whether the file should hold CSV or JSON data, and
     then write the results to the output file in that format.
 
-    :param database: The `NEODatabase` containing data on NEOs and their close approaches.
+    :param database: The `NEODatabase` containing data on NEOs and their close approaches
+                     (or a `QueryCache` of one).
     :param args: All arguments from the command line, as parsed by the top-level parser.
+    :param stdout: Where to print the results. Defaults to `sys.stdout`.
+    :param stderr: Where to print errors. Defaults to `sys.stderr`.
     """
     # Construct a collection of filters from arguments supplied at the command line.
-    filters = create_filters(
+    filters = query_filters(args)
+    if args.explain:
+        # Describe the query plan, rather than the results.
+        print(database.explain(filters), file=stdout)
+        return
+
+    # Query the database with the collection of filters.
+    sort_by, descending, count = query_order(args)
+    results = database.query(filters, sort_by=sort_by, descending=descending, limit=count)
+    write_results(results, args, stdout=stdout, stderr=stderr)
+
+
+def query_filters(args):
+    """Create the collection of filters for the options of a query.
+
+    :param args: The arguments of a query, as parsed by the query parser.
+    :return: A collection of filters, from `create_filters`.
+    """
+    return create_filters(
         date=args.date, start_date=args.start_date, end_date=args.end_date,
         distance_min=args.distance_min, distance_max=args.distance_max,
         velocity_min=args.velocity_min, velocity_max=args.velocity_max,
         diameter_min=args.diameter_min, diameter_max=args.diameter_max,
         hazardous=args.hazardous
     )
-    # Query the database with the collection of filters.
-    results = database.query(filters)
 
+
+def query_order(args):
+    """Return how to order the results of a query, and how many of them are needed.
+
+    :param args: The arguments of a query, as parsed by the query parser.
+    :return: A tuple of the column to sort by (None for no sorting), whether to
+             sort in descending order, and how many results will be written
+             (None for all of them) - so that a sort only keeps that many.
+    """
+    sort_by = args.sort_by or ('time' if args.desc else None)
+    count = args.limit or (None if args.outfile else 10)
+    return sort_by, args.desc, count
+
+
+def write_results(results, args, stdout=None, stderr=None):
+    """Print the results of a query, or write them to its output file.
+
+    :param results: A stream of matching `CloseApproach` objects.
+    :param args: The arguments of the query, as parsed by the query parser.
+    :param stdout: Where to print the results. Defaults to `sys.stdout`.
+    :param stderr: Where to print errors. Defaults to `sys.stderr`.
+    """
     if not args.outfile:
         # Write the results to stdout, limiting to 10 entries if not specified.
         for result in limit(results, args.limit or 10):
-            print(result)
+            print(result, file=stdout)
     else:
         # Write the results to a file.
-        if args.outfile.suffix == '.csv':
-            write_to_csv(limit(results, args.limit), args.outfile)
-        elif args.outfile.suffix == '.json':
-            write_to_json(limit(results, args.limit), args.outfile)
+        fmt = output_format(args.outfile)
+        if fmt == 'csv':
+            write_to_csv(limit(results, args.limit), args.outfile,
+                         background=args.background)
+        elif fmt == 'json':
+            write_to_json(limit(results, args.limit), args.outfile, compact=args.compact,
+                          background=args.background)
+        elif fmt == 'jsonl':
+            write_to_jsonl(limit(results, args.limit), args.outfile,
+                           background=args.background)
         else:
-            print("Please use an output file that ends with `.csv` or `.json`.", file=sys.stderr)
+            print("Please use an output file that ends with `.csv`, `.json`, `.jsonl` or "
+                  "`.ndjson` (optionally followed by `.gz`, `.bz2` or `.xz`).",
+                  file=stderr or sys.stderr)
+
+
+def read_batch(path, query_parser):
+    """Read a file of queries for the `batch` subcommand.
+
+    Each line of the file is parsed as the options of a `query`. The file is
+    read before the database is loaded, so that a mistake on its last line
+    doesn't waste the time to load it (nor the pass over it).
+
+    :param path: The path of the file of queries.
+    :param query_parser: The subparser for the `query` subcommand.
+    :return: A list of the arguments of each query, or None if a line isn't a
+             valid query (after printing why).
+    """
+    queries = []
+    with open(path) as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            args = NEOShell.parse_arg_with(line, query_parser)
+            if args is None:
+                problem = "isn't a valid query"
+            elif args.explain:
+                problem = "can't `--explain` in a batch"
+            elif args.outfile and output_format(args.outfile) is None:
+                problem = "has an output file that doesn't end with a known format"
+            else:
+                queries.append(args)
+                continue
+            print(f"{path}:{number}: This line {problem}.", file=sys.stderr)
+            return None
+    return queries
+
+
+def batch(database, queries):
+    """Perform the `batch` subcommand.
+
+    All of the queries are answered by the database's `batch_query`, in a
+    single pass, and then each one's results are written just as `query`
+    would write them.
+
+    :param database: The `NEODatabase` containing data on NEOs and their close approaches.
+    :param queries: A list of the arguments of each query, from `read_batch`.
+    """
+    streams = database.batch_query([query_filters(args) for args in queries],
+                                   orders=[query_order(args) for args in queries])
+    for args, results in zip(queries, streams):
+        write_results(results, args)
 
 
 class NEOShell(cmd.Cmd):
@@ -251,7 +576,8 @@ class NEOShell(cmd.Cmd):
              "Type `help` or `?` to list commands and `exit` to exit.\n")
     prompt = '(neo) '
 
-    def __init__(self, database, inspect_parser, query_parser, aggressive=False, **kwargs):
+    def __init__(self, database, inspect_parser, query_parser, aggressive=False,
+                 cache_rows=MAX_ROWS, live=None, **kwargs):
         """Create a new `NEOShell`.
 
         Creating this object doesn't start the session - for that, use `.cmdloop()`.
@@ -260,6 +586,9 @@ class NEOShell(cmd.Cmd):
         :param inspect_parser: The subparser for the `inspect` subcommand.
         :param query_parser: The subparser for the `query` subcommand.
         :param aggressive: Whether to kill the session whenever a project file is changed.
+        :param cache_rows: At most how many rows of query results to cache, or 0 for none.
+        :param live: A `live.LiveDatabase` to swap in new versions of the database
+                     from, between commands, or None to keep the same one.
         :param kwargs: A dictionary of excess keyword arguments passed to the superclass.
         """
         super().__init__(**kwargs)
@@ -267,6 +596,9 @@ class NEOShell(cmd.Cmd):
         self.inspect = inspect_parser
         self.query = query_parser
         self.aggressive = aggressive
+        self.cache_rows = cache_rows
+        self.cache = QueryCache(database, max_rows=cache_rows) if cache_rows > 0 else None
+        self.live = live
 
     @classmethod
     def parse_arg_with(cls, arg, parser):
@@ -307,6 +639,11 @@ class NEOShell(cmd.Cmd):
             (neo) inspect --pdes 1P
             (neo) inspect --name Halley
 
+        Or list the NEOs whose designation or name starts with, or is like, some text:
+
+            (neo) inspect --prefix '2020 AY'
+            (neo) inspect --fuzzy haley --limit 3
+
         Additionally, list all known close approaches:
 
             (neo) inspect --verbose --name Eros
@@ -318,7 +655,8 @@ class NEOShell(cmd.Cmd):
         # Run the `inspect` subcommand.
         inspect(self.db,
                 pdes=args.pdes, name=args.name,
-                verbose=args.verbose)
+                verbose=args.verbose,
+                prefix=args.prefix, fuzzy=args.fuzzy, limit=args.limit)
 
     def do_q(self, arg):
         """Shorthand for `query`."""
@@ -340,18 +678,58 @@ class NEOShell(cmd.Cmd):
 
             (neo) query --limit 2
 
+        The results can be sorted by another field with `--sort-by`, greatest
+        first with `--desc`:
+
+            (neo) query --hazardous --sort-by distance --limit 5
+
         The results can be saved to a file (instead of displayed to stdout) with
         `--outfile`:
 
             (neo) query --limit 5 --outfile results.csv
             (neo) query --limit 5 --outfile results.json
+
+        The results are cached, so running the same query again (say, with a
+        larger `--limit`) or with extra filters is quick.
         """
         args = self.parse_arg_with(arg, self.query)
         if not args:
             return
 
-        # Run the `inspect` subcommand.
-        query(self.db, args)
+        # Run the `query` subcommand, through the cache if there is one.
+        query(self.cache or self.db, args)
+
+    def do_stats(self, _arg):
+        """Report how often the results of queries were found in the cache.
+
+            (neo) stats
+        """
+        if self.cache is None:
+            print("The query cache is turned off.")
+            return
+        statistics = self.cache.statistics()
+        answered = statistics['hits'] + statistics['superset hits'] + statistics['misses']
+        for name, count in statistics.items():
+            print(f"{name + ':':<15}{count:>10,}")
+        if answered:
+            rate = (statistics['hits'] + statistics['superset hits']) / answered
+            print(f"{'hit rate:':<15}{rate:>10.1%}")
+
+    def do_version(self, _arg):
+        """Report which version of the data is in use, and how long each reload took.
+
+            (neo) version
+        """
+        if self.live is None:
+            print("The data aren't reloaded in this session.")
+            return
+        number, loaded, _ = self.live.history[-1]
+        print(f"Version {number} of the data, loaded at {loaded:%Y-%m-%d %H:%M:%S}.")
+        for number, loaded, seconds in self.live.history[1:]:
+            print(f"Version {number} was reloaded at {loaded:%Y-%m-%d %H:%M:%S}, "
+                  f"in {seconds:.2f}s.")
+        if self.live.building:
+            print("A new version is being built.")
 
     def do_EOF(self, _arg):
         """Exit the interactive session."""
@@ -362,7 +740,20 @@ class NEOShell(cmd.Cmd):
     do_quit = do_EOF
 
     def precmd(self, line):
-        """Watch for changes to the files in this project."""
+        """Watch for changes to the files in this project, and swap in reloaded data."""
+        if self.live is not None:
+            try:
+                self.live.refresh()
+            except live.ReloadError as err:
+                print(f"{err}. Still using version {self.live.version}.", file=sys.stderr)
+            if self.live.database is not self.db:
+                self.db = self.live.database
+                if self.cache is not None:
+                    self.cache = QueryCache(self.db, max_rows=self.cache_rows)
+                _, _, seconds = self.live.history[-1]
+                print(f"Reloaded the data: now using version {self.live.version} "
+                      f"(built in {seconds:.2f}s).", file=sys.stderr)
+
         changed = [f for f in PROJECT_ROOT.glob('*.py') if f.stat().st_mtime > _START]
         if changed:
             print("The following file(s) have been modified since this interactive session began: "
@@ -377,21 +768,257 @@ class NEOShell(cmd.Cmd):
         return line
 
 
+def load_database(args):
+    """Load the `NEODatabase`, from a fresh snapshot if there is one.
+
+    If there's no usable snapshot, the database is built from the data files
+    and then saved as a snapshot for next time. Failing to save the snapshot
+    isn't fatal - the database is still returned.
+
+    :param args: All arguments from the command line, as parsed by the top-level parser.
+    :return: The linked `NEODatabase`.
+    """
+    sources = (args.neofile, args.cadfile)
+    snapshot = args.snapshot or args.cadfile.with_name('neo.snapshot')
+
+    if args.use_snapshot:
+        # Restoring into columns skips building a `CloseApproach` for every
+        # row, which is most of the cost of restoring into objects.
+        database = read_snapshot(snapshot, sources, columnar=True)
+        if database is not None:
+            return database
+
+    # Extract data from the data files into structured Python objects. The close
+    # approaches are streamed, so they are linked into the database as they're parsed.
+    if args.lazy:
+        # Saving a snapshot would convert every field, which is what --lazy avoids.
+        return NEODatabase(load_neos(args.neofile, lazy=True),
+                           stream_approaches(args.cadfile, lazy=True), lazy=True)
+    if args.workers > 1:
+        database = parallel.load_database(args.neofile, args.cadfile, args.workers,
+                                          columnar=args.columnar)
+    else:
+        backend = ColumnarNEODatabase if args.columnar else NEODatabase
+        database = backend(load_neos(args.neofile), stream_approaches(args.cadfile))
+
+    if args.use_snapshot:
+        try:
+            write_snapshot(database, snapshot, sources)
+        except OSError as err:
+            print(f"Unable to save a snapshot to {snapshot}: {err}", file=sys.stderr)
+    return database
+
+
+def ingest(database, args):
+    """Perform the `ingest` subcommand.
+
+    The NEOs and close approaches are merged into the database with
+    `NEODatabase.ingest`. The database is then saved over the `.neodb` file it
+    was opened from; or else they're appended to its snapshot, as a delta,
+    unless the snapshot's deltas have grown too large, when the database is
+    saved over it afresh.
+
+    :param database: The `NEODatabase` to merge the new data into.
+    :param args: All arguments from the command line, as parsed by the top-level parser.
+    :return: The counts from `NEODatabase.ingest`.
+    :raise ValueError: If a close approach is of an unknown NEO.
+    :raise OSError: If a file can't be read or written.
+    """
+    neos = load_neos(args.neos) if args.neos else []
+    approaches = list(stream_approaches(args.approaches)) if args.approaches else []
+    counts = database.ingest(neos, approaches)
+
+    if args.dbfile:
+        write_database(database, args.dbfile, (args.neofile, args.cadfile))
+        saved = args.dbfile
+    else:
+        saved = args.snapshot or args.cadfile.with_name('neo.snapshot')
+        try:
+            appended = append_snapshot(saved, neos, approaches)
+        except (OSError, ValueError):
+            # There's no snapshot to append to, such as if it couldn't be saved.
+            appended = False
+        if not appended:
+            write_snapshot(database, saved, (args.neofile, args.cadfile))
+    print(', '.join(f"{count:,} {what}" for what, count in counts.items()) + f"; saved to {saved}.")
+    return counts
+
+
+def _loader(args):
+    """Return a function that loads the database again, for a `live.LiveDatabase`."""
+    def load():
+        database = open_database(args.dbfile) if args.dbfile else load_database(args)
+        # Build the indexes now, in the background, rather than on the first query.
+        database._ensure_indexed()
+        return database
+    return load
+
+
+def _sources(args):
+    """Return the resolved paths of the data files (or `.neodb` file), as strings."""
+    if args.dbfile:
+        return [str(args.dbfile.resolve())]
+    return [str(args.neofile.resolve()), str(args.cadfile.resolve())]
+
+
+def _socket(args):
+    """Return the path of the query server's Unix socket."""
+    return args.socket or (args.dbfile or args.cadfile).with_name('neo.sock')
+
+
+def compile_database(args):
+    """Perform the `compile` subcommand: build a `.neodb` file from the data files.
+
+    :param args: All arguments from the command line, as parsed by the top-level parser.
+    :return: The path of the `.neodb` file.
+    """
+    path = args.output or args.dbfile or args.cadfile.with_name('neo.neodb')
+    database = load_database(args)
+    write_database(database, path, (args.neofile, args.cadfile))
+    print(f"Compiled {len(database._neos):,} NEOs and {len(database._approaches):,} "
+          f"close approaches into {path}.")
+    return path
+
+
+def encode_args(args):
+    """Encode the arguments of a command, to send them to a query server.
+
+    Dates become ISO strings, and paths are resolved, so that an output file
+    is written where it would have been if the command had run locally.
+
+    :param args: All arguments from the command line, as parsed by the top-level parser.
+    :return: A JSON-serializable dict of the arguments.
+    """
+    params = {}
+    for key, value in vars(args).items():
+        if isinstance(value, datetime.date):
+            value = value.isoformat()
+        elif isinstance(value, pathlib.Path):
+            value = str(value.resolve())
+        params[key] = value
+    return params
+
+
+def decode_args(params):
+    """Decode the arguments of a command, as encoded by `encode_args`.
+
+    :param params: A dict of the encoded arguments.
+    :return: A `Namespace` of the arguments.
+    """
+    args = argparse.Namespace(**params)
+    for key in _DATE_OPTIONS:
+        if getattr(args, key, None) is not None:
+            setattr(args, key, date_fromisoformat(getattr(args, key)))
+    if getattr(args, 'outfile', None) is not None:
+        args.outfile = pathlib.Path(args.outfile)
+    return args
+
+
+def make_handler(database):
+    """Create a handler that runs the commands sent to a query server.
+
+    :param database: The `NEODatabase` to answer the commands from.
+    :return: A callable, as described by `server.NEOServer`.
+    """
+    def handle(command, params, stdout, stderr):
+        args = decode_args(params)
+        if command == 'inspect':
+            inspect(database, pdes=args.pdes, name=args.name, verbose=args.verbose,
+                    stdout=stdout, stderr=stderr,
+                    prefix=args.prefix, fuzzy=args.fuzzy, limit=args.limit)
+        elif command == 'query':
+            query(database, args, stdout=stdout, stderr=stderr)
+        else:
+            raise ValueError(f"Unknown command: {command}")
+    return handle
+
+
 def main():
     """Run the main script."""
     parser, inspect_parser, query_parser = make_parser()
     args = parser.parse_args()
 
-    # Extract data from the data files into structured Python objects.
-    database = NEODatabase(load_neos(args.neofile), load_approaches(args.cadfile))
+    # Send the command to a running server, if there is one.
+    if args.cmd in ('inspect', 'query') and args.use_server:
+        try:
+            status = server.request(_socket(args), args.cmd, encode_args(args), _sources(args))
+        except ConnectionError as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
+        if status is not None:
+            sys.exit(status)
+
+    if args.cmd == 'batch':
+        queries = read_batch(args.file, query_parser)
+        if queries is None:
+            sys.exit(1)
+
+    if args.cmd == 'ingest' and not (args.neos or args.approaches):
+        print("Nothing to ingest: give --neos, --approaches or both.", file=sys.stderr)
+        sys.exit(1)
+    if args.cmd == 'ingest' and not (args.dbfile or args.use_snapshot):
+        print("There's nowhere to save ingested data without a snapshot: "
+              "drop --no-snapshot, or use --dbfile.", file=sys.stderr)
+        sys.exit(1)
+
+    if args.cmd == 'serve' and server.listening(_socket(args)):
+        # Don't spend the time to load the database, only to fail to serve it.
+        print(f"A server is already listening on {_socket(args)}.", file=sys.stderr)
+        sys.exit(1)
+
+    if args.cmd == 'compile':
+        # The `.neodb` file is what's being compiled, not where the data come from.
+        try:
+            compile_database(args)
+        except OSError as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
+        return
+
+    if args.dbfile:
+        try:
+            database = open_database(args.dbfile)
+        except (OSError, ValueError) as err:
+            print(f"Unable to open {args.dbfile}: {err}", file=sys.stderr)
+            sys.exit(1)
+    else:
+        database = load_database(args)
 
     # Run the chosen subcommand.
     if args.cmd == 'inspect':
-        inspect(database, pdes=args.pdes, name=args.name, verbose=args.verbose)
+        inspect(database, pdes=args.pdes, name=args.name, verbose=args.verbose,
+                prefix=args.prefix, fuzzy=args.fuzzy, limit=args.limit)
     elif args.cmd == 'query':
         query(database, args)
+    elif args.cmd == 'batch':
+        batch(database, queries)
     elif args.cmd == 'interactive':
-        NEOShell(database, inspect_parser, query_parser, aggressive=args.aggressive).cmdloop()
+        reloader = None
+        if args.reload_interval > 0:
+            reloader = live.LiveDatabase(_loader(args), _sources(args), database,
+                                         interval=args.reload_interval)
+            reloader.start()
+        try:
+            NEOShell(database, inspect_parser, query_parser, aggressive=args.aggressive,
+                     cache_rows=args.cache_rows, live=reloader).cmdloop()
+        finally:
+            if reloader is not None:
+                reloader.stop(wait=False)
+    elif args.cmd == 'ingest':
+        try:
+            ingest(database, args)
+        except (ValueError, OSError) as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
+    elif args.cmd == 'serve':
+        # Build the indexes up front, rather than on the first request.
+        database._ensure_indexed()
+        database._names()
+        try:
+            server.serve(_socket(args), make_handler(database), _sources(args))
+        except (RuntimeError, OSError) as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
 
 
 if __name__ == '__main__':
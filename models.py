@@ -11,6 +11,14 @@ velocity.
 A `NearEarthObject` maintains a collection of its close approaches, and a
 `CloseApproach` maintains a reference to its NEO.
 
+There are a great many of these objects, so both classes use `__slots__`
+rather than a per-instance `__dict__`.
+
+The `LazyNearEarthObject` and `LazyCloseApproach` subclasses behave the same,
+but keep the raw values from the data files and only convert each field when
+it's first read (and then remember the converted value). Loading data this way
+is faster, at the cost of converting fields later, if at all.
+
 The functions that construct these objects use information extracted from the
 data files from NASA, so these objects should be able to handle all of the
 quirks of the data set, such as missing names and unknown diameters.
@@ -20,6 +28,56 @@ You'll edit this file in Task 1.
 from helpers import cd_to_datetime, datetime_to_str
 
 
+def _to_float(value):
+    """Convert a raw number into a float, with NaN if it's missing."""
+    if value is None or value == '':
+        return float("nan")
+    return float(value)
+
+
+def _to_hazardous(value):
+    """Convert a raw potentially-hazardous flag into a bool."""
+    return value == 'Y' or value is True
+
+
+def _to_time(value):
+    """Convert a raw calendar date into a datetime, if it's a string."""
+    if value and isinstance(value, str):
+        return cd_to_datetime(value)
+    return value
+
+
+class _LazyField:
+    """A field that's converted from its raw value when it's first read.
+
+    The value is kept in the instance attribute (slot) `_<name>`: at first the
+    raw value from the data file (a string, or None if it's missing), and
+    after the first read, the converted value.
+    """
+
+    def __init__(self, convert):
+        """Create a new `_LazyField` that converts values with a function."""
+        self.convert = convert
+
+    def __set_name__(self, owner, name):
+        """Remember where the field's value is kept."""
+        self.attribute = f'_{name}'
+
+    def __get__(self, instance, owner=None):
+        """Return the field's value, converting (and keeping) it if raw."""
+        if instance is None:
+            return self
+        value = getattr(instance, self.attribute)
+        if value is None or isinstance(value, str):
+            value = self.convert(value)
+            setattr(instance, self.attribute, value)
+        return value
+
+    def __set__(self, instance, value):
+        """Set the field's (raw or converted) value."""
+        setattr(instance, self.attribute, value)
+
+
 class NearEarthObject:
     """A near-Earth object (NEO).
 
@@ -33,6 +91,9 @@ class NearEarthObject:
     `NEODatabase` constructor.
     """
 
+    __slots__ = ('designation', 'name', 'diameter', 'hazardous', 'approaches',
+                 'extra', '__weakref__')
+
     def __init__(self, **info):
         """Create a new `NearEarthObject`.
 
@@ -45,24 +106,22 @@ class NearEarthObject:
                           hazardous.
         :param approaches: A collection of this NearEarthObjects close
                            approaches to Earth.
+        :param extra: A dictionary of any other attributes from the data file,
+                      or None.
         """
         self.designation = info.get("designation")
         self.name = info.get("name")
         self.diameter = info.get("diameter")
         self.hazardous = info.get("hazardous")
+        self.extra = info.get("extra")
 
         # Create an empty initial collection of linked approaches.
         self.approaches = []
 
-        if not self.diameter:
-            self.diameter = float("nan")
-        else:
-            self.diameter = float(self.diameter)
-
-        if self.hazardous == 'Y':
-            self.hazardous = True
-        else:
-            self.hazardous = False
+        # Values may arrive as raw strings from the CSV file, or already
+        # converted (e.g. when restored from a snapshot).
+        self.diameter = _to_float(self.diameter)
+        self.hazardous = _to_hazardous(self.hazardous)
 
         if not self.name:
             self.name = None
@@ -103,6 +162,9 @@ class CloseApproach:
     `NEODatabase` constructor.
     """
 
+    __slots__ = ('_designation', 'time', 'distance', 'velocity', 'neo',
+                 '__weakref__')
+
     def __init__(self, **info):
         """Create a new `CloseApproach`.
 
@@ -123,19 +185,12 @@ class CloseApproach:
         self.neo = info.get('neo')
 
         # Function for time and data type for distance, velocity
-        # and cd_to_datetime function for this attribute.
-        if self.time:
-            self.time = cd_to_datetime(self.time)
-        # dist - if distance else float('nan')
-        if not self.distance:
-            self.distance = float("nan")
-        else:
-            self.distance = float(self.distance)
-        # v_rel - if velocity else float('nan')
-        if not self.velocity:
-            self.velocity = float("nan")
-        else:
-            self.velocity = float(self.velocity)
+        # and cd_to_datetime function for this attribute. A time that is
+        # already a `datetime` is kept as it is.
+        self.time = _to_time(self.time)
+        # dist, v_rel - if missing, float('nan')
+        self.distance = _to_float(self.distance)
+        self.velocity = _to_float(self.velocity)
 
     @property
     def designation(self):
@@ -171,3 +226,53 @@ class CloseApproach:
         return f"CloseApproach(time={self.time_str!r}, "\
                f"distance={self.distance:.2f}, "\
                f"velocity={self.velocity:.2f}, neo={self.neo!r})"
+
+
+class LazyNearEarthObject(NearEarthObject):
+    """A `NearEarthObject` whose diameter and hazard flag are converted lazily.
+
+    The raw values from the CSV file are kept, and each is converted the
+    first time it's read.
+    """
+
+    __slots__ = ('_diameter', '_hazardous')
+
+    diameter = _LazyField(_to_float)
+    hazardous = _LazyField(_to_hazardous)
+
+    def __init__(self, **info):
+        """Create a new `LazyNearEarthObject`.
+
+        This takes the same arguments as `NearEarthObject`.
+        """
+        self.designation = info.get("designation")
+        self.name = info.get("name") or None
+        self.diameter = info.get("diameter")
+        self.hazardous = info.get("hazardous")
+        self.extra = info.get("extra")
+        self.approaches = []
+
+
+class LazyCloseApproach(CloseApproach):
+    """A `CloseApproach` whose time, distance and velocity are lazy.
+
+    The raw values from the JSON file are kept, and each is converted the
+    first time it's read.
+    """
+
+    __slots__ = ('_time', '_distance', '_velocity')
+
+    time = _LazyField(_to_time)
+    distance = _LazyField(_to_float)
+    velocity = _LazyField(_to_float)
+
+    def __init__(self, **info):
+        """Create a new `LazyCloseApproach`.
+
+        This takes the same arguments as `CloseApproach`.
+        """
+        self._designation = info.get('designation')
+        self.time = info.get('time')
+        self.distance = info.get('distance')
+        self.velocity = info.get('velocity')
+        self.neo = info.get('neo')
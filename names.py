@@ -0,0 +1,164 @@
+"""Look up NEOs by the start of, or something like, a designation or name.
+
+A `NameIndex` holds a key for each NEO's primary designation and for its name
+(if it has one), normalized by `normalize` so that case and runs of spaces
+don't matter: `halley` finds "Halley", and `2020  ay` finds "2020 AY1".
+
+- For a prefix search, the keys are kept sorted, so the keys that start with a
+  prefix are a contiguous range, found by bisection.
+- For a fuzzy search, each key is split into trigrams - overlapping runs of
+  three characters, padded so that the start and end of the key count too -
+  and an inverted index maps each trigram to the keys that contain it. A
+  query's candidates are the keys that share a trigram with it, ranked by the
+  Jaccard similarity of their trigrams and the query's.
+
+A search returns the positions of the matching NEOs in the collection the
+index was built from, best first, and each NEO at most once.
+"""
+import array
+import bisect
+import collections
+import heapq
+import itertools
+
+
+# How many candidates a search returns, by default.
+LIMIT = 10
+
+# How similar (as the Jaccard similarity of their trigrams, from 0 to 1) a key
+# must be to a query to be a fuzzy match, by default.
+MIN_SIMILARITY = 0.2
+
+
+def normalize(text):
+    """Normalize a designation or name for searching.
+
+    This casefolds it and collapses its spaces.
+    """
+    return ' '.join(text.split()).casefold()
+
+
+def trigrams(key):
+    """Return the set of trigrams of a normalized key."""
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """An index of NEO designations and names for prefix and fuzzy searches."""
+
+    # A fuzzy search only considers stopping early before it counts a
+    # posting longer than this (or than the number of keys counted so far).
+    SKIP_CHECK = 256
+
+    def __init__(self, neos):
+        """Create a new `NameIndex` over a collection of NEOs.
+
+        :param neos: A sequence of `NearEarthObject`s.
+        """
+        keys = []
+        for position, neo in enumerate(neos):
+            keys.append((normalize(neo.designation), position))
+            if neo.name:
+                keys.append((normalize(neo.name), position))
+        keys.sort()
+        self._keys = [key for key, _ in keys]
+        self._positions = array.array('i', (position for _, position in keys))
+
+        postings = collections.defaultdict(lambda: array.array('i'))
+        self._sizes = array.array('i')
+        for k, key in enumerate(self._keys):
+            grams = trigrams(key)
+            self._sizes.append(len(grams))
+            for gram in grams:
+                postings[gram].append(k)
+        self._postings = dict(postings)
+
+    def _unique(self, keys, limit):
+        """Return the positions of the NEOs of some keys, each at most once."""
+        positions = []
+        seen = set()
+        for k in keys:
+            position = self._positions[k]
+            if position not in seen:
+                seen.add(position)
+                positions.append(position)
+                if len(positions) == limit:
+                    break
+        return positions
+
+    def prefix(self, prefix, limit=LIMIT):
+        """Find the NEOs with a designation or name that starts with a prefix.
+
+        :param prefix: The start of a designation or name.
+        :param limit: At most how many NEOs to find.
+        :return: A list of the positions of the matching NEOs, in order of
+                 their matching keys - so an exact match comes first.
+        """
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+        start = bisect.bisect_left(self._keys, prefix)
+        matching = itertools.takewhile(
+            lambda k: self._keys[k].startswith(prefix),
+            range(start, len(self._keys)))
+        return self._unique(matching, limit)
+
+    def fuzzy(self, text, limit=LIMIT, min_similarity=MIN_SIMILARITY):
+        """Find the NEOs with a designation or name most like some text.
+
+        :param text: Something like a designation or name.
+        :param limit: At most how many NEOs to find.
+        :param min_similarity: How similar a key must be to the text to match.
+        :return: A list of pairs of the position of a matching NEO and its
+                 similarity, from most to least similar.
+        """
+        key = normalize(text)
+        if not key or limit <= 0:
+            return []
+        grams = trigrams(key)
+        postings = self._postings
+        keys, sizes = self._keys, self._sizes
+
+        # Count the trigrams each key shares with the query, rarest trigrams
+        # first. A key that shares none of the first `j` is at most
+        # `(n - j) / n` similar, so once enough keys are known to be at least
+        # that similar, the rest of the (long) postings are skipped, and only
+        # the keys that could still make the cut are checked for the rest.
+        ordered = sorted(grams, key=lambda gram: len(postings.get(gram, ())))
+        n = len(ordered)
+        cut = min_similarity
+        shared = collections.Counter()
+        for j, gram in enumerate(ordered):
+            posting = postings.get(gram, ())
+            if j and len(posting) > max(self.SKIP_CHECK, len(shared)):
+                known = heapq.nlargest(2 * limit, (c / (n + sizes[k] - c)
+                                                   for k, c in shared.items()))
+                if len(known) == 2 * limit:
+                    cut = max(cut, known[-1])
+                if (n - j) / n < cut:
+                    break
+            shared.update(posting)
+        else:
+            j = n
+
+        rest, r = ordered[j:], n - j
+        if rest:
+            for k, c in shared.items():
+                if (c + r) / (n + sizes[k] - c - r) >= cut:
+                    padded = f"  {keys[k]} "
+                    shared[k] = c + sum(gram in padded for gram in rest)
+
+        # Each NEO has at most two keys, so the best `2 * limit` keys are
+        # enough for `limit` NEOs. Ties go to the key that sorts first.
+        ranked = heapq.nlargest(2 * limit, ((c / (n + sizes[k] - c), -k)
+                                            for k, c in shared.items()))
+        results, seen = [], set()
+        for similarity, k in ranked:
+            position = self._positions[-k]
+            if similarity < min_similarity or len(results) == limit:
+                break
+            if position not in seen:
+                seen.add(position)
+                results.append((position, similarity))
+        return results
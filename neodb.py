@@ -0,0 +1,212 @@
+"""Store a linked database in a file that's queried in place, with `mmap`.
+
+Restoring a snapshot (see `snapshot`) still reads every column into memory
+before the first query can run. A `.neodb` file instead holds everything a
+`ColumnarNEODatabase` needs - its columns and also its indexes - so that
+`open_database` only has to map the file into memory. The columns and indexes
+are `memoryview`s of the mapping, so a query only reads the pages of the rows
+it touches, and processes that open the same file share its pages through the
+operating system's page cache.
+
+A `.neodb` file has the same layout as a snapshot (see
+`snapshot.write_segments`), with these segments besides the snapshot's columns:
+
+- `time_order`, `time_keys` and `time_rank`: the index of rows in order of
+  approach time (int32, int64 and int32), unless the rows are already in
+  chronological order.
+- `neo_rows` and `neo_row_offsets`: each NEO's rows in order of approach time,
+  one NEO after another (int32), and where each NEO's rows start (int64).
+- `sample_distance` and `sample_velocity`: the sampled values that the query
+  planner's statistics are gathered from (float64).
+
+The header notes which data files the database was built from, but unlike a
+snapshot, the file isn't checked against them: it stands alone, so that it can
+be copied without the data files, and is compiled again when they change.
+The segments are in the byte order of the machine that wrote the file, and
+can only be opened on a machine with the same byte order.
+"""
+import array
+import mmap
+import struct
+import sys
+
+from database import ColumnarNEODatabase, _ApproachRows
+from models import NearEarthObject
+from snapshot import (read_segments, write_segments, source_key, _columns,
+                      _unpack_strings)
+
+
+MAGIC = b'NEODB\0\0\0'
+VERSION = 1
+
+
+def write_database(database, path, sources=()):
+    """Save a linked `NEODatabase` (of any kind) to a `.neodb` file.
+
+    :param database: The `NEODatabase` to save.
+    :param path: Where to save the file.
+    :param sources: The paths of the data files the database was built from,
+                    recorded for reference.
+    """
+    database._ensure_indexed()
+    columns = _columns(database)
+    time = columns['time']
+
+    order = database._time_order
+    if not isinstance(order, range):
+        order = array.array('i', order)
+        rank = array.array('i', bytes(4 * len(order)))
+        for position, row in enumerate(order):
+            rank[row] = position
+        columns['time_order'] = order
+        columns['time_keys'] = array.array('q', map(time.__getitem__, order))
+        columns['time_rank'] = rank
+
+    neo_rows = array.array('i')
+    neo_row_offsets = array.array('q', [0])
+    for rows in database._rows_by_neo:
+        neo_rows.extend(rows)
+        neo_row_offsets.append(len(neo_rows))
+    columns['neo_rows'] = neo_rows
+    columns['neo_row_offsets'] = neo_row_offsets
+
+    # The same rows as `NEODatabase._analyze` samples.
+    count = len(time)
+    sample = range(0, count, max(1, count // database.STATISTICS_SAMPLE))
+    for column in ('distance', 'velocity'):
+        values = map(columns[column].__getitem__, sample)
+        columns[f'sample_{column}'] = array.array('d', values)
+
+    header = {
+        'version': VERSION,
+        'sources': source_key(*sources),
+        'neos': len(database._neos),
+        'approaches': count,
+    }
+    write_segments(path, MAGIC, header, columns)
+
+
+class MappedNEODatabase(ColumnarNEODatabase):
+    """A `ColumnarNEODatabase` queried in place from a `.neodb` file.
+
+    The NEOs are ordinary `NearEarthObject`s, built when the file is opened,
+    but every per-approach column and index stays in the file's mapping. The
+    mapping is read-only, and lasts as long as the database (or anything from
+    it, such as an NEO's `.approaches`) is referenced.
+
+    The mapping can't be changed, so `ingest` first copies the columns and
+    indexes into memory; the file itself is left as it is (save the result
+    with `write_database`).
+    """
+
+    def __init__(self, path):
+        """Open a `.neodb` file as a `MappedNEODatabase`.
+
+        :param path: The path of the `.neodb` file.
+        :raise ValueError: If the file isn't a `.neodb` file that this version
+                           (and this machine's byte order) can read.
+        """
+        with open(path, 'rb') as f:
+            mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            header, segments = read_segments(mapping, MAGIC)
+            version, byteorder = header.get('version'), header['byteorder']
+            typecodes = {name: typecode for name, (_, _, typecode)
+                         in header['segments'].items()}
+        except (KeyError, TypeError, ValueError, struct.error):
+            raise ValueError(f"{path} is not a .neodb file.") from None
+        if version != VERSION:
+            raise ValueError(f"{path} was compiled by another version; "
+                             f"compile it again.")
+        if byteorder != sys.byteorder:
+            raise ValueError(f"{path} was compiled with another byte order; "
+                             f"compile it again.")
+
+        self._segments = columns = {
+            name: segment if name.endswith('_heap')
+            else segment.cast(typecodes[name])
+            for name, segment in segments.items()
+        }
+
+        designations = _unpack_strings(columns['neo_designation_offsets'],
+                                       bytes(columns['neo_designation_heap']))
+        names = _unpack_strings(columns['neo_name_offsets'],
+                                bytes(columns['neo_name_heap']))
+        neos = [
+            NearEarthObject(designation=designation, name=name,
+                            diameter=diameter, hazardous=bool(hazardous))
+            for designation, name, diameter, hazardous in zip(
+                designations, names, columns['neo_diameter'],
+                columns['neo_hazardous'])
+        ]
+        self._attach(neos, columns['time'], columns['distance'],
+                     columns['velocity'], columns['neo_index'])
+
+    def ingest(self, neos=(), approaches=()):
+        """Merge new or updated NEOs and close approaches into the database.
+
+        See `NEODatabase.ingest`. The columns and indexes are copied out of the
+        file into memory first.
+        """
+        if self._segments is not None:
+            self._detach()
+        return super().ingest(neos, approaches)
+
+    def _detach(self):
+        """Copy the columns and indexes out of the file, into `array`s."""
+        def copy(view):
+            if isinstance(view, memoryview):
+                return array.array(view.format, view.tobytes())
+            return view
+
+        for name in ('_time', '_distance', '_velocity', '_neo_index',
+                     '_time_order', '_time_keys', '_time_rank'):
+            setattr(self, name, copy(getattr(self, name)))
+        if isinstance(self._time_order, range):
+            # Rows in chronological order are indexed by the time column
+            # itself.
+            self._time_keys = self._time
+        self._rows_by_neo = [copy(rows) for rows in self._rows_by_neo]
+        self._approaches = _ApproachRows(self, range(len(self._time)))
+        for neo, rows in zip(self._neos, self._rows_by_neo):
+            neo.approaches = _ApproachRows(self, rows)
+        self._segments = None
+
+    def _index_times(self, keys):
+        """Use the index of rows in order of approach time from the file."""
+        if self._segments is None:
+            super()._index_times(keys)
+        elif 'time_order' in self._segments:
+            self._time_order = self._segments['time_order']
+            self._time_keys = self._segments['time_keys']
+            self._time_rank = self._segments['time_rank']
+        else:
+            self._time_order = range(len(keys))
+            self._time_keys = keys
+            self._time_rank = None
+
+    def _group_rows_by_neo(self, neo_index):
+        """Use each NEO's rows from the file."""
+        if self._segments is None:
+            return super()._group_rows_by_neo(neo_index)
+        rows = self._segments['neo_rows']
+        offsets = self._segments['neo_row_offsets']
+        return [rows[offsets[position]:offsets[position + 1]]
+                for position in range(len(self._neos))]
+
+    def _sample(self, column, rows):
+        """Use the sampled values of a column from the file."""
+        if self._segments is None:
+            return super()._sample(column, rows)
+        return self._segments[f'sample_{column}']
+
+
+def open_database(path):
+    """Open a `.neodb` file, to query it in place.
+
+    :param path: The path of the `.neodb` file.
+    :return: A `MappedNEODatabase`.
+    :raise OSError: If the file can't be opened.
+    :raise ValueError: If the file isn't a `.neodb` file that can be read here.
+    """
+    return MappedNEODatabase(path)
@@ -0,0 +1,178 @@
+"""Load the data files into an `NEODatabase` using several processes.
+
+The `load_database` function splits the "data" array of `cad.json` into byte
+ranges that each hold whole rows, and converts each range into columns of
+approach times, distances, velocities and designations in a pool of worker
+processes. Meanwhile, the main process parses `neos.csv`. Each worker sends
+back its columns as packed bytes - much cheaper to pass between processes than
+pickled `CloseApproach` objects - and the main process then links them to the
+NEOs in a single pass, as `NEODatabase.from_columns` or
+`ColumnarNEODatabase.from_columns`.
+
+A range boundary is found by searching near an evenly spaced offset for the end
+of one row and the start of the next (`], [`). The rows of the "data" array are
+arrays of plain strings (and nulls), so that only ever appears between rows.
+If the "fields" header doesn't come before the "data" array, the rows can't be
+converted without reading the whole file first, so the close approaches are
+streamed as usual instead.
+"""
+import array
+import concurrent.futures
+import json
+import re
+
+from database import NEODatabase, ColumnarNEODatabase
+from extract import (load_neos, stream_approaches, _cad_positions, _JSONStream,
+                     _resolve_data_file)
+from helpers import datetime_to_minutes
+from models import _to_float, _to_time
+
+
+# How many ranges to split the rows into for each worker, so that a worker
+# that finishes early can pick up another range.
+CHUNKS_PER_WORKER = 4
+
+# How far past an evenly spaced offset to search for a row boundary.
+BOUNDARY_WINDOW = 1 << 16
+
+_ROW_BOUNDARY = re.compile(rb'\]\s*,\s*(?=\[)')
+_DECODER = json.JSONDecoder()
+
+
+def _locate_rows(cad_json_path):
+    """Find where the rows of the "data" array start, and their fields.
+
+    :param cad_json_path: The path of a JSON file of close approach data.
+    :return: A tuple of the byte offset of the "data" array's opening bracket
+             and the positions of des, cd, dist and v_rel in a row - or None,
+             if there's no "data" array or it precedes the "fields" header.
+    """
+    with open(cad_json_path, 'r') as json_data:
+        stream = _JSONStream(json_data)
+        positions = None
+
+        stream.expect('{')
+        if stream.peek() == '}':
+            return None
+        while True:
+            key = stream.value()
+            stream.expect(':')
+            if key == 'data':
+                if positions is None or stream.peek() != '[':
+                    return None
+                offset = stream.offset
+                break
+            value = stream.value()
+            if key == 'fields':
+                positions = _cad_positions(value)
+            if stream.peek() != ',':
+                return None
+            stream.expect(',')
+
+        # Convert the character offset into a byte offset.
+        json_data.seek(0)
+        return len(json_data.read(offset).encode('utf-8')), positions
+
+
+def _chunk_bounds(cad_json_path, start, end, chunks):
+    """Split the rows between two byte offsets into ranges of whole rows.
+
+    :param cad_json_path: The path of a JSON file of close approach data.
+    :param start: The byte offset of the "data" array's opening bracket.
+    :param end: The size of the file, in bytes.
+    :param chunks: How many ranges to aim for.
+    :return: A list of the byte offsets at which each range starts.
+    """
+    bounds = [start + 1]
+    with open(cad_json_path, 'rb') as f:
+        for k in range(1, chunks):
+            offset = start + (end - start) * k // chunks
+            if offset <= bounds[-1]:
+                continue
+            f.seek(offset)
+            match = _ROW_BOUNDARY.search(f.read(BOUNDARY_WINDOW))
+            if match and offset + match.end() > bounds[-1]:
+                bounds.append(offset + match.end())
+    return bounds
+
+
+def _load_chunk(cad_json_path, start, stop, positions):
+    """Convert a range of rows of the "data" array into packed columns.
+
+    This runs in a worker process.
+
+    :param cad_json_path: The path of a JSON file of close approach data.
+    :param start: The byte offset of the range's first row.
+    :param stop: The byte offset of the next range's first row, or None if
+                 this range runs to the end of the "data" array.
+    :param positions: The positions of des, cd, dist and v_rel in a row.
+    :return: A tuple of the designations (UTF-8, newline-separated), and the
+             bytes of `array`s of times (in minutes since the epoch),
+             distances and velocities.
+    """
+    with open(cad_json_path, 'rb') as f:
+        f.seek(start)
+        data = f.read() if stop is None else f.read(stop - start)
+    text = data.decode('utf-8')
+    if stop is not None:
+        # Drop the comma between this range's last row and the next range.
+        text = text.rstrip().rstrip(',') + ']'
+    rows, _ = _DECODER.raw_decode('[' + text)
+
+    des, cd, dist, v_rel = positions
+    time = array.array('q', (datetime_to_minutes(_to_time(row[cd]))
+                             for row in rows))
+    distance = array.array('d', (_to_float(row[dist]) for row in rows))
+    velocity = array.array('d', (_to_float(row[v_rel]) for row in rows))
+    designations = '\n'.join(row[des] for row in rows).encode('utf-8')
+    return designations, time.tobytes(), distance.tobytes(), velocity.tobytes()
+
+
+def load_database(neo_csv_filename, cad_json_filename, workers,
+                  columnar=False):
+    """Load and link the data files, converting close approaches in parallel.
+
+    :param neo_csv_filename: A path to a CSV file containing data about
+                             near-Earth objects.
+    :param cad_json_filename: A path to a JSON file containing data about
+                              close approaches.
+    :param workers: How many worker processes to convert close approaches in.
+    :param columnar: Whether to build a `ColumnarNEODatabase` instead.
+    :return: The linked `NEODatabase`.
+    """
+    backend = ColumnarNEODatabase if columnar else NEODatabase
+    cad_json_path = _resolve_data_file(cad_json_filename)
+    located = _locate_rows(cad_json_path)
+    if located is None:
+        return backend(load_neos(neo_csv_filename),
+                       stream_approaches(cad_json_path))
+    start, positions = located
+
+    end = cad_json_path.stat().st_size
+    bounds = _chunk_bounds(cad_json_path, start, end,
+                           workers * CHUNKS_PER_WORKER)
+    time = array.array('q')
+    distance = array.array('d')
+    velocity = array.array('d')
+    neo_index = array.array('i')
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_load_chunk, str(cad_json_path), lo, hi,
+                               positions)
+                   for lo, hi in zip(bounds, bounds[1:] + [None])]
+
+        # Parse the NEOs while the workers convert the close approaches.
+        neos = load_neos(neo_csv_filename)
+        index = {neo.designation: position
+                 for position, neo in enumerate(neos)}
+
+        for future in futures:
+            designations, times, distances, velocities = future.result()
+            time.frombytes(times)
+            distance.frombytes(distances)
+            velocity.frombytes(velocities)
+            if designations:
+                neo_index.extend(map(index.__getitem__,
+                                     designations.decode('utf-8').split('\n')))
+
+    return backend.from_columns(neos, time, distance, velocity, neo_index)
@@ -0,0 +1,228 @@
+"""Answer `inspect` and `query` commands from a database that stays loaded.
+
+Every run of `main.py` pays to load and link the database before it can answer
+a single command. The `serve` function instead loads it once and then answers
+commands from other runs over a local Unix socket, and the `request` function
+sends a command to such a server - the main module tries that first, and only
+loads the database itself if no server answers.
+
+The protocol is newline-delimited JSON. A client sends one request:
+
+    {"command": "query", "params": {...}, "sources": [neos.csv, cad.json]}
+
+where `params` are the command's (encoded) arguments and `sources` are the
+resolved paths of the data files the client wants answers from. The server
+replies with a stream of frames, each a two-element list:
+
+    ["out", text]         Text written to standard output.
+    ["err", text]         Text written to standard error.
+    ["exit", status]      The command is finished, with an exit status.
+    ["unavailable", why]  The server can't answer (e.g. it has other data).
+
+Output is sent a line at a time as the command produces it. Each connection
+is handled in its own thread, so a long query doesn't hold up other commands.
+"""
+import json
+import os
+import pathlib
+import socket
+import socketserver
+import sys
+
+
+# Whether this platform has Unix sockets.
+AVAILABLE = hasattr(socketserver, 'UnixStreamServer')
+
+
+class _Stream:
+    """A text file that sends what's written to it to a client, as frames."""
+
+    def __init__(self, handler, kind):
+        """Create a new `_Stream` of frames of a kind ('out' or 'err')."""
+        self._handler = handler
+        self._kind = kind
+        self._pending = []
+
+    def write(self, text):
+        """Write some text, sending it on at the end of each line."""
+        self._pending.append(text)
+        if text.endswith('\n'):
+            self.flush()
+        return len(text)
+
+    def flush(self):
+        """Send any text that hasn't been sent yet."""
+        if self._pending:
+            text = ''.join(self._pending)
+            self._pending = []
+            self._handler.send(self._kind, text)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answer one request, on one connection."""
+
+    def send(self, kind, value):
+        """Send one frame to the client."""
+        self.wfile.write((json.dumps([kind, value]) + '\n').encode('utf-8'))
+
+    def handle(self):
+        """Read a request, run its command and stream back the output."""
+        try:
+            request = json.loads(self.rfile.readline().decode('utf-8'))
+            command, params = request['command'], request['params']
+            sources = request['sources']
+        except (ValueError, KeyError, TypeError):
+            return
+
+        try:
+            if sources != self.server.sources:
+                self.send('unavailable',
+                          "The server was loaded from different data files.")
+                return
+
+            stdout, stderr = _Stream(self, 'out'), _Stream(self, 'err')
+            status = 0
+            try:
+                self.server.handler(command, params, stdout, stderr)
+            except (BrokenPipeError, ConnectionResetError):
+                raise
+            except Exception as err:
+                stdout.flush()
+                stderr.write(f"{type(err).__name__}: {err}\n")
+                status = 1
+            stdout.flush()
+            stderr.flush()
+            self.send('exit', status)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client went away - there's no one left to answer.
+            pass
+
+
+class NEOServer(socketserver.ThreadingMixIn,
+                socketserver.UnixStreamServer if AVAILABLE
+                else socketserver.BaseServer):
+    """A threaded Unix socket server that answers commands with a handler.
+
+    The handler is called as `handler(command, params, stdout, stderr)` from
+    each connection's thread, and writes the command's output to the given
+    file-like objects. It must be safe to call from several threads at once.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, handler, sources):
+        """Create a new `NEOServer`, listening on a Unix socket.
+
+        :param path: The path of the Unix socket.
+        :param handler: A callable that runs a command.
+        :param sources: The resolved paths of the data files, as strings.
+        """
+        self.handler = handler
+        self.sources = list(sources)
+        super().__init__(str(path), _RequestHandler)
+
+    def server_bind(self):
+        """Bind the socket so that only the user who started it may connect.
+
+        The server writes output files on behalf of its clients. The socket
+        file is created with restrictive permissions, rather than narrowed
+        afterwards, so there's no window in which another user can connect.
+        """
+        umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(umask)
+
+
+def _connect(path):
+    """Connect to the Unix socket of a server, or return None if none."""
+    if not AVAILABLE:
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(str(path))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def listening(path):
+    """Return whether a server is listening on a Unix socket."""
+    sock = _connect(path)
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def serve(path, handler, sources):
+    """Answer commands on a Unix socket, until interrupted.
+
+    A socket file left behind by a server that's no longer running is
+    replaced, but a live server is left alone.
+
+    :param path: The path of the Unix socket.
+    :param handler: A callable that runs a command (see `NEOServer`).
+    :param sources: The resolved paths of the data files, as strings.
+    :raise RuntimeError: If Unix sockets aren't available, or if another server
+                         is already listening on the socket.
+    """
+    if not AVAILABLE:
+        raise RuntimeError("Unix sockets aren't available on this platform.")
+    path = pathlib.Path(path)
+    if listening(path):
+        raise RuntimeError(f"A server is already listening on {path}.")
+    if path.is_socket():
+        path.unlink()
+
+    with NEOServer(path, handler, sources) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            path.unlink()
+
+
+def request(path, command, params, sources, stdout=None, stderr=None):
+    """Send a command to a server, and relay its output.
+
+    :param path: The path of the server's Unix socket.
+    :param command: The name of the command, such as 'query'.
+    :param params: The command's arguments, as a JSON-serializable dict.
+    :param sources: The resolved paths of the data files, as strings.
+    :param stdout: Where to write the command's output. Defaults to
+                   `sys.stdout`.
+    :param stderr: Where to write the command's errors. Defaults to
+                   `sys.stderr`.
+    :return: The command's exit status, or None if no server answered it.
+    :raise ConnectionError: If the server goes away while answering.
+    """
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    sock = _connect(path)
+    if sock is None:
+        return None
+
+    with sock, sock.makefile('rb') as frames:
+        message = {'command': command, 'params': params,
+                   'sources': list(sources)}
+        try:
+            sock.sendall((json.dumps(message) + '\n').encode('utf-8'))
+        except OSError:
+            return None
+        answered = False
+        for line in frames:
+            kind, value = json.loads(line.decode('utf-8'))
+            if kind == 'unavailable':
+                return None
+            if kind == 'exit':
+                return value
+            answered = True
+            (stdout if kind == 'out' else stderr).write(value)
+    if not answered:
+        return None
+    raise ConnectionError("The server closed the connection before it "
+                          "finished answering.")
@@ -0,0 +1,465 @@
+"""Save and restore a linked `NEODatabase` as a compact binary snapshot.
+
+Building an `NEODatabase` from `neos.csv` and `cad.json` means parsing every
+row, converting every calendar date, and linking every close approach to its
+NEO. A snapshot stores the result of all of that work, so that later runs can
+skip it while the data files are unchanged.
+
+The `write_snapshot` function saves a database, and the `read_snapshot`
+function restores one - or returns `None` when the snapshot is missing, is
+unreadable, or was built from different data files. The columns of a snapshot
+are exactly those of a `ColumnarNEODatabase` (alongside its k-d tree), which
+can be restored without building a single `CloseApproach`.
+
+A snapshot file is laid out as:
+
+    MAGIC | header length (uint32) | header (JSON) | segment | segment | ...
+
+The header records the format version, the byte order, the identity of the
+source files (see `source_key`) and, for each segment, its offset, length and
+`array` typecode. Each segment is a fixed-width column:
+
+- NEOs: diameter (float64), hazardous (uint8), and the designation and name
+  strings, as UTF-8 heaps with uint32 offsets.
+- Close approaches: time (int64 minutes since the epoch), distance and
+  velocity (float64), and the index of the approach's NEO (int32).
+- The k-d tree of the close approaches' distances and velocities, flattened
+  by `_KDTree.columns` into segments prefixed with `kd_`. The tree only pays
+  for itself over several queries, which a one-shot command never makes, so
+  it's built once when the snapshot is saved and restored with it.
+
+Segments start on 8-byte boundaries. The `neodb` module stores a database in
+the same layout (see `write_segments` and `read_segments`).
+
+After `NEODatabase.ingest`, `append_snapshot` appends what was ingested to the
+end of the file, as a delta, rather than saving the whole database again:
+
+    ... | DELTA_MAGIC | length | header | segment | ... | DELTA_MAGIC | ...
+
+Each delta has the same NEO columns as the snapshot, and the time, distance
+and velocity of each ingested close approach, alongside its NEO's
+designation (as a UTF-8 heap, since the NEO may be new).
+"""
+import array
+import hashlib
+import json
+import mmap
+import os
+import pathlib
+import struct
+import sys
+
+from helpers import datetime_to_minutes, minutes_to_datetime
+from models import NearEarthObject, CloseApproach
+from database import NEODatabase, ColumnarNEODatabase, _KDTree
+
+
+MAGIC = b'NEOSNAP\0'
+DELTA_MAGIC = b'NEODELT\0'
+VERSION = 2
+
+# At most how many NEOs and close approaches the deltas appended to a snapshot
+# hold, as a fraction of those in the snapshot itself.
+MAX_DELTA_FRACTION = 0.25
+
+# How much of the start and end of each source file goes into its digest.
+SAMPLE_SIZE = 1 << 16
+
+_LENGTH = struct.Struct('<I')
+
+
+def source_key(*paths):
+    """Identify the current contents of some source files.
+
+    Each file is identified by its path, size, modification time and a digest
+    of its first and last `SAMPLE_SIZE` bytes. Hashing the whole of `cad.json`
+    would take longer than restoring the snapshot, so only these samples are
+    hashed - alongside the size and mtime, they catch any realistic change.
+
+    :param paths: Paths to the source files.
+    :return: A JSON-serializable description of the files.
+    """
+    key = []
+    for path in paths:
+        path = pathlib.Path(path).resolve()
+        stat = path.stat()
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            digest.update(f.read(SAMPLE_SIZE))
+            if stat.st_size > SAMPLE_SIZE:
+                f.seek(max(SAMPLE_SIZE, stat.st_size - SAMPLE_SIZE))
+                digest.update(f.read())
+        key.append({
+            'path': str(path),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'digest': digest.hexdigest(),
+        })
+    return key
+
+
+def _pack_strings(strings):
+    """Pack strings into a UTF-8 heap and an array of offsets into it."""
+    offsets = array.array('I', [0])
+    heap = bytearray()
+    for string in strings:
+        heap += string.encode('utf-8')
+        offsets.append(len(heap))
+    return offsets, bytes(heap)
+
+
+def _unpack_strings(offsets, heap):
+    """Unpack the strings packed by `_pack_strings`."""
+    text = heap.decode('utf-8')
+    if len(text) == len(heap):
+        # Pure ASCII, so byte offsets are also character offsets.
+        return [text[offsets[i]:offsets[i + 1]]
+                for i in range(len(offsets) - 1)]
+    return [heap[offsets[i]:offsets[i + 1]].decode('utf-8')
+            for i in range(len(offsets) - 1)]
+
+
+def _neo_columns(neos):
+    """Flatten NEOs into columns."""
+    designation_offsets, designation_heap = _pack_strings(
+        neo.designation for neo in neos)
+    name_offsets, name_heap = _pack_strings(neo.name or '' for neo in neos)
+    return {
+        'neo_diameter': array.array('d', (neo.diameter for neo in neos)),
+        'neo_hazardous': array.array('B', (neo.hazardous for neo in neos)),
+        'neo_designation_offsets': designation_offsets,
+        'neo_designation_heap': designation_heap,
+        'neo_name_offsets': name_offsets,
+        'neo_name_heap': name_heap,
+    }
+
+
+def _neos(columns):
+    """Build the NEOs from the columns of `_neo_columns`."""
+    designations = _unpack_strings(columns['neo_designation_offsets'],
+                                   columns['neo_designation_heap'])
+    names = _unpack_strings(columns['neo_name_offsets'],
+                            columns['neo_name_heap'])
+    return [
+        NearEarthObject(designation=designation, name=name,
+                        diameter=diameter, hazardous=bool(hazardous))
+        for designation, name, diameter, hazardous in zip(
+            designations, names, columns['neo_diameter'],
+            columns['neo_hazardous'])
+    ]
+
+
+def _columns(database):
+    """Flatten the NEOs and close approaches of a database into columns."""
+    neos = database._neos
+    index = {neo.designation: i for i, neo in enumerate(neos)}
+
+    if isinstance(database, ColumnarNEODatabase):
+        time, distance, velocity, neo_index = (
+            database._time, database._distance, database._velocity,
+            database._neo_index)
+    else:
+        approaches = database._approaches
+        time = array.array('q', (datetime_to_minutes(approach.time)
+                                 for approach in approaches))
+        distance = array.array('d', (approach.distance
+                                     for approach in approaches))
+        velocity = array.array('d', (approach.velocity
+                                     for approach in approaches))
+        neo_index = array.array('i', (index[approach.designation]
+                                      for approach in approaches))
+
+    return dict(_neo_columns(neos), time=time, distance=distance,
+                velocity=velocity, neo_index=neo_index)
+
+
+def _delta_columns(neos, approaches):
+    """Flatten ingested NEOs and close approaches into columns.
+
+    The close approaches may be of NEOs that aren't in the snapshot yet, so
+    each is stored with its NEO's designation rather than its position.
+    """
+    designation_offsets, designation_heap = _pack_strings(
+        approach._designation for approach in approaches)
+    return dict(
+        _neo_columns(neos),
+        time=array.array('q', (datetime_to_minutes(approach.time)
+                               for approach in approaches)),
+        distance=array.array('d', (approach.distance
+                                   for approach in approaches)),
+        velocity=array.array('d', (approach.velocity
+                                   for approach in approaches)),
+        designation_offsets=designation_offsets,
+        designation_heap=designation_heap,
+    )
+
+
+def _approaches(columns):
+    """Build the close approaches from the columns of `_delta_columns`."""
+    designations = _unpack_strings(columns['designation_offsets'],
+                                   columns['designation_heap'])
+    return [
+        CloseApproach(designation=designation,
+                      time=minutes_to_datetime(minutes),
+                      distance=distance, velocity=velocity)
+        for designation, minutes, distance, velocity in zip(
+            designations, columns['time'], columns['distance'],
+            columns['velocity'])
+    ]
+
+
+def write_segments(path, magic, header, columns):
+    """Write a file of segments, after a magic number and a JSON header.
+
+    The file is written to a temporary sibling and then moved into place, so
+    a concurrent reader never sees a half-written file.
+
+    :param path: Where to write the file.
+    :param magic: The bytes that the file starts with, identifying its format.
+    :param header: A JSON-serializable dict, to which the byte order and the
+                   table of segments are added.
+    :param columns: A mapping of segment names to `array`s (or `bytes`).
+    """
+    path = pathlib.Path(path)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp, 'wb') as f:
+            _write_block(f, magic, header, columns)
+        os.replace(tmp, path)
+    finally:
+        if tmp.exists():
+            tmp.unlink()
+
+
+def _write_block(f, magic, header, columns):
+    """Write a magic number, a JSON header and segments to an open file.
+
+    See `write_segments`, which writes a file of a single block.
+    """
+    segments = {}
+    blobs = []
+    offset = 0
+    for name, column in columns.items():
+        if isinstance(column, array.array):
+            typecode, blob = column.typecode, column.tobytes()
+        elif isinstance(column, memoryview):
+            typecode, blob = column.format, column.tobytes()
+        else:
+            typecode, blob = 'B', column
+        segments[name] = [offset, len(blob), typecode]
+        blobs.append(blob)
+        offset += len(blob) + -len(blob) % 8
+
+    header = dict(header, byteorder=sys.byteorder, segments=segments)
+    header = json.dumps(header).encode('utf-8')
+    # Pad the header so the first segment is 8-byte aligned.
+    prefix = len(magic) + _LENGTH.size
+    header += b' ' * (-(prefix + len(header)) % 8)
+
+    f.write(magic)
+    f.write(_LENGTH.pack(len(header)))
+    f.write(header)
+    for blob in blobs:
+        f.write(blob)
+        f.write(b'\0' * (-len(blob) % 8))
+
+
+def write_snapshot(database, path, sources):
+    """Save a linked `NEODatabase` to a snapshot file.
+
+    The database's k-d tree is built, if it hasn't been already (or if it's
+    out of date for any rows), to be saved with it. Any deltas appended to an
+    earlier snapshot at the same path are folded into this one.
+
+    :param database: The `NEODatabase` to save.
+    :param path: Where to save the snapshot.
+    :param sources: The paths of the data files the database was built from.
+    """
+    header = {
+        'version': VERSION,
+        'sources': source_key(*sources),
+        'neos': len(database._neos),
+        'approaches': len(database._approaches),
+    }
+    columns = _columns(database)
+    database._ensure_indexed()
+    if database._kd_tree_stale:
+        database._kd_tree = None
+    for name, column in database._kd_tree_index().columns().items():
+        columns[f'kd_{name}'] = column
+    write_segments(path, MAGIC, header, columns)
+
+
+def append_snapshot(path, neos=(), approaches=()):
+    """Append ingested NEOs and close approaches to a snapshot, as a delta.
+
+    Saving a database again after `NEODatabase.ingest` takes time in
+    proportion to the whole database. Instead, this appends just what was
+    ingested, and `read_snapshot` ingests it again after restoring the rest.
+    Once the deltas would hold more than `MAX_DELTA_FRACTION` as many rows as
+    the snapshot itself, nothing is appended, and the database should be
+    saved afresh with `write_snapshot`.
+
+    A delta that was only partly appended (say, by a process that was killed)
+    is ignored, and overwritten by the next one.
+
+    :param path: The path of a snapshot that's up to date with its sources.
+    :param neos: A collection of the ingested `NearEarthObject`s.
+    :param approaches: A collection of the ingested `CloseApproach`es.
+    :return: Whether the delta was appended.
+    :raise OSError: If the snapshot can't be read or written.
+    :raise ValueError: If the file isn't a snapshot of this version.
+    """
+    neos, approaches = list(neos), list(approaches)
+    with open(path, 'r+b') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                header, _, end = _read_header(data, MAGIC)
+            except (KeyError, TypeError, struct.error):
+                raise ValueError("The file isn't a snapshot.") from None
+            if header.get('version') != VERSION:
+                raise ValueError("The snapshot is of another version.")
+            deltas, end = _deltas(data, end)
+
+        rows = len(neos) + len(approaches) + sum(
+            delta['neos'] + delta['approaches'] for delta, _ in deltas)
+        if rows > MAX_DELTA_FRACTION * (header['neos'] + header['approaches']):
+            return False
+
+        f.truncate(end)
+        f.seek(end)
+        header = {'neos': len(neos), 'approaches': len(approaches)}
+        _write_block(f, DELTA_MAGIC, header, _delta_columns(neos, approaches))
+    return True
+
+
+def _read_header(data, magic, position=0):
+    """Read the header of a block of segments, at a position in a buffer.
+
+    :return: The header, where the block's segments start, and where the
+             block ends.
+    :raise ValueError: If the block doesn't start with the magic number.
+    """
+    if data[position:position + len(magic)] != magic:
+        raise ValueError("The file isn't in the expected format.")
+    start = position + len(magic) + _LENGTH.size
+    (length,) = _LENGTH.unpack_from(data, position + len(magic))
+    header = json.loads(bytes(data[start:start + length]).decode('utf-8'))
+    base = start + length
+    # Each segment is padded to a multiple of 8 bytes.
+    size = sum(size + -size % 8 for _, size, _
+               in header['segments'].values())
+    return header, base, base + size
+
+
+def read_segments(data, magic):
+    """Read the header of a file of segments, and find its segments.
+
+    :param data: The contents of the file, as a buffer (such as an `mmap`).
+    :param magic: The bytes that the file should start with.
+    :return: The header, and a mapping of segment names to `memoryview`s of
+             the bytes of each segment.
+    :raise ValueError: If the file doesn't start with the magic number.
+    """
+    header, base, _ = _read_header(data, magic)
+    return header, _segments(data, header, base)
+
+
+def _segments(data, header, base):
+    """Map the names of a block's segments to `memoryview`s of their bytes."""
+    view = memoryview(data)
+    return {name: view[base + offset:base + offset + size]
+            for name, (offset, size, _) in header['segments'].items()}
+
+
+def _deltas(data, position):
+    """Find the complete deltas appended to a snapshot, from a position.
+
+    :return: A list of the header of each delta and where its segments
+             start, and where the last complete delta ends.
+    """
+    deltas = []
+    while position < len(data):
+        try:
+            header, base, end = _read_header(data, DELTA_MAGIC, position)
+        except (ValueError, KeyError, TypeError, struct.error):
+            break
+        if end > len(data):
+            break
+        deltas.append((header, base))
+        position = end
+    return deltas, position
+
+
+def _arrays(header, segments):
+    """Copy the segments of a block into `array`s (or `bytes`, for heaps)."""
+    columns = {}
+    for name, (_, _, typecode) in header['segments'].items():
+        segment = segments[name]
+        if name.endswith('_heap'):
+            columns[name] = bytes(segment)
+            continue
+        column = array.array(typecode)
+        column.frombytes(segment)
+        if header['byteorder'] != sys.byteorder:
+            column.byteswap()
+        columns[name] = column
+    return columns
+
+
+def _read_columns(path, sources):
+    """Read the header and the raw segments of a snapshot file.
+
+    :return: The header, a mapping of segment names to `array`s (or `bytes`,
+             for the string heaps), and a list of such a mapping for each
+             delta - or None if the snapshot is stale.
+    :raise ValueError: If the file isn't a well-formed snapshot.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    header, base, end = _read_header(data, MAGIC)
+    if header.get('version') != VERSION:
+        return None
+    if header['sources'] != source_key(*sources):
+        return None
+
+    columns = _arrays(header, _segments(data, header, base))
+    deltas, _ = _deltas(data, end)
+    deltas = [_arrays(delta, _segments(data, delta, base))
+              for delta, base in deltas]
+    return header, columns, deltas
+
+
+def read_snapshot(path, sources, columnar=False):
+    """Restore a linked `NEODatabase` from a snapshot file.
+
+    The deltas appended to the snapshot (see `append_snapshot`) are ingested,
+    all at once, into the restored database.
+
+    :param path: The path of the snapshot.
+    :param sources: The paths of the data files the database should reflect.
+    :param columnar: Whether to restore a `ColumnarNEODatabase` instead.
+    :return: The restored `NEODatabase`, or None if the snapshot is missing,
+             unreadable or stale.
+    """
+    try:
+        result = _read_columns(path, sources)
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        return None
+    if result is None:
+        return None
+    _, columns, deltas = result
+
+    backend = ColumnarNEODatabase if columnar else NEODatabase
+    database = backend.from_columns(_neos(columns), columns['time'],
+                                    columns['distance'], columns['velocity'],
+                                    columns['neo_index'])
+    database._kd_tree = _KDTree.from_columns({
+        name[len('kd_'):]: column for name, column in columns.items()
+        if name.startswith('kd_')})
+    if deltas:
+        database.ingest([neo for delta in deltas for neo in _neos(delta)],
+                        [approach for delta in deltas
+                         for approach in _approaches(delta)])
+    return database
@@ -0,0 +1,181 @@
+"""Check that a batch of queries gets the same results as each query alone.
+
+`NEODatabase.batch_query` answers many filter sets in a single pass, grouping
+their filters by column, so it's checked against `query` for a random mix of
+filter sets, including the awkward ones: no filters, contradictory dates,
+custom filters and unknown diameters.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_batch
+"""
+import contextlib
+import datetime
+import io
+import operator
+import pathlib
+import random
+import tempfile
+import unittest
+import unittest.mock
+
+import main
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters, AttributeFilter, DistanceFilter
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class EvenMinuteFilter(AttributeFilter):
+    """A custom filter, which the database can only call on each approach."""
+
+    def __init__(self):
+        super().__init__(operator.eq, 0)
+
+    @classmethod
+    def get(cls, approach):
+        return approach.time.minute % 2
+
+
+def random_criteria(rng):
+    criteria = {}
+    if rng.random() < 0.5:
+        start = datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randrange(400))
+        criteria['start_date'] = start
+        if rng.random() < 0.7:
+            criteria['end_date'] = start + datetime.timedelta(days=rng.randrange(-3, 60))
+    if rng.random() < 0.2:
+        criteria['date'] = datetime.date(2020, 1, 1) + datetime.timedelta(days=rng.randrange(400))
+    for key, low, high in (('distance_min', 0, 0.3), ('distance_max', 0, 0.5),
+                           ('velocity_min', 0, 30), ('velocity_max', 5, 40),
+                           ('diameter_min', 0, 2), ('diameter_max', 0, 3)):
+        if rng.random() < 0.3:
+            criteria[key] = rng.uniform(low, high)
+    if rng.random() < 0.3:
+        criteria['hazardous'] = rng.random() < 0.5
+    return criteria
+
+
+def summarize(approaches):
+    return [(approach.designation, approach.time) for approach in approaches]
+
+
+class TestBatchQuery(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.databases = (
+            NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)),
+            ColumnarNEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)),
+        )
+        rng = random.Random(2020)
+        cls.filter_sets = [create_filters(**random_criteria(rng)) for _ in range(100)]
+        cls.filter_sets += [
+            [],
+            create_filters(start_date=datetime.date(2020, 3, 2), end_date=datetime.date(2020, 3, 1)),
+            create_filters(diameter_min=0),
+            [EvenMinuteFilter()],
+            create_filters(velocity_min=10) + [EvenMinuteFilter()],
+            [DistanceFilter(operator.eq, 0.0211660525256395)],
+        ]
+
+    def test_batch_query_matches_query(self):
+        for db in self.databases:
+            with self.subTest(db=type(db).__name__):
+                streams = db.batch_query(self.filter_sets)
+                self.assertEqual(len(streams), len(self.filter_sets))
+                for filters, stream in zip(self.filter_sets, streams):
+                    self.assertEqual(summarize(stream), summarize(db.query(filters)))
+
+    def test_batch_query_sorts_with_orders(self):
+        orders = [('distance', False, 5), (None, False, None), ('time', True, None),
+                  ('diameter', True, 10)]
+        filter_sets = [create_filters(velocity_min=15)] * len(orders)
+        for db in self.databases:
+            with self.subTest(db=type(db).__name__):
+                streams = db.batch_query(filter_sets, orders=orders)
+                for filters, order, stream in zip(filter_sets, orders, streams):
+                    sort_by, descending, limit = order
+                    self.assertEqual(summarize(stream),
+                                     summarize(db.query(filters, sort_by=sort_by,
+                                                        descending=descending, limit=limit)))
+
+    def test_batch_query_of_nothing(self):
+        for db in self.databases:
+            with self.subTest(db=type(db).__name__):
+                self.assertEqual(db.batch_query([]), [])
+
+    def test_batch_query_passes_over_the_approaches_once(self):
+        db = self.databases[0]
+        calls = []
+        values = db._values
+
+        def counting_values(column, rows):
+            calls.append((column, len(rows)))
+            return values(column, rows)
+
+        filter_sets = [create_filters(distance_max=d / 100) for d in range(1, 51)]
+        with unittest.mock.patch.object(db, '_values', counting_values):
+            db.batch_query(filter_sets)
+        self.assertEqual(calls, [('distance', len(db._approaches))])
+
+
+class TestBatchCommand(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        _, _, cls.query_parser = main.make_parser()
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = pathlib.Path(tmp.name)
+
+    def read(self, *lines):
+        path = self.tmp / 'queries.txt'
+        path.write_text('\n'.join(lines) + '\n')
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            return main.read_batch(path, self.query_parser), stderr.getvalue()
+
+    def test_batch_writes_each_output_file(self):
+        january, fast = self.tmp / 'january.csv', self.tmp / 'fast.jsonl'
+        queries, _ = self.read(
+            '# Nightly queries',
+            f'--start-date 2020-01-01 --end-date 2020-01-31 --outfile {january}',
+            '',
+            f'--min-velocity 30 --limit 5 --outfile {fast}',
+        )
+        self.assertEqual(len(queries), 2)
+        main.batch(self.db, queries)
+
+        expected = self.db.query(create_filters(start_date=datetime.date(2020, 1, 1),
+                                                end_date=datetime.date(2020, 1, 31)))
+        self.assertEqual(len(january.read_text().splitlines()), 1 + len(list(expected)))
+        self.assertEqual(len(fast.read_text().splitlines()), 5)
+
+    def test_batch_sorts_each_query(self):
+        closest = self.tmp / 'closest.csv'
+        queries, _ = self.read(f'--sort-by distance --limit 3 --outfile {closest}')
+        main.batch(self.db, queries)
+
+        lines = closest.read_text().splitlines()
+        distances = [float(line.split(',')[1]) for line in lines[1:]]
+        self.assertEqual(distances, sorted(approach.distance for approach in self.db.query())[:3])
+
+    def test_invalid_line_is_reported(self):
+        queries, stderr = self.read('--date 2020-01-01 --outfile a.csv', '--not-an-option')
+        self.assertIsNone(queries)
+        self.assertIn('queries.txt:2:', stderr)
+
+    def test_unknown_output_format_is_reported(self):
+        queries, stderr = self.read('--date 2020-01-01 --outfile a.txt')
+        self.assertIsNone(queries)
+        self.assertIn('queries.txt:1:', stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+"""Check that queries answered through a `QueryCache` get the same results.
+
+A cached query, a query narrowed down from the cached results of a broader one,
+and a query the cache can't key on must all match the database's own answer,
+on both backends. The cache must also evict its least recently used queries
+when it's full.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_cache
+"""
+import contextlib
+import datetime
+import io
+import pathlib
+import unittest
+
+import main
+from cache import QueryCache
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+def summarize(approaches):
+    return [(approach.designation, approach.time) for approach in approaches]
+
+
+class TestQueryCache(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.databases = (
+            NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)),
+            ColumnarNEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)),
+        )
+
+    def assertCachedQueryMatches(self, cache, filters):
+        self.assertEqual(summarize(cache.query(filters)),
+                         summarize(cache.database.query(filters)))
+
+    def test_repeated_query_is_a_hit(self):
+        for db in self.databases:
+            with self.subTest(db=type(db).__name__):
+                cache = QueryCache(db)
+                filters = create_filters(velocity_min=20, hazardous=False)
+                self.assertCachedQueryMatches(cache, filters)
+                self.assertCachedQueryMatches(cache, create_filters(hazardous=False, velocity_min=20))
+                self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_sorted_query_sorts_the_cached_rows(self):
+        filters = create_filters(hazardous=True)
+        for db in self.databases:
+            with self.subTest(db=type(db).__name__):
+                cache = QueryCache(db)
+                for sort_by, descending, limit in ((None, False, 3), ('velocity', True, 5),
+                                                   ('diameter', False, None), (None, True, 4)):
+                    self.assertEqual(
+                        summarize(cache.query(filters, sort_by, descending, limit)),
+                        summarize(db.query(filters, sort_by, descending, limit)))
+                self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_narrowing_a_superset_does_not_build_the_k_d_tree(self):
+        db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        cache = QueryCache(db)
+        cache.query(create_filters(hazardous=False))
+        for velocity in range(10, 10 + 2 * db.KD_TREE_BUILD_COST):
+            cache.query(create_filters(hazardous=False, distance_max=0.01,
+                                       velocity_min=velocity))
+        self.assertEqual(cache.superset_hits, 2 * db.KD_TREE_BUILD_COST)
+        self.assertIsNone(db._kd_tree)
+        self.assertEqual(db._kd_tree_rent, 0)
+
+    def test_narrower_query_is_answered_from_a_superset(self):
+        broad = create_filters(start_date=datetime.date(2020, 1, 1),
+                               end_date=datetime.date(2020, 6, 30), distance_max=0.2)
+        narrower = (
+            create_filters(start_date=datetime.date(2020, 1, 1),
+                           end_date=datetime.date(2020, 6, 30), distance_max=0.2, velocity_min=15),
+            create_filters(start_date=datetime.date(2020, 3, 1),
+                           end_date=datetime.date(2020, 3, 31), distance_max=0.2),
+            create_filters(date=datetime.date(2020, 2, 14), distance_max=0.2, hazardous=True),
+        )
+        for db in self.databases:
+            with self.subTest(db=type(db).__name__):
+                cache = QueryCache(db)
+                self.assertCachedQueryMatches(cache, broad)
+                for filters in narrower:
+                    self.assertCachedQueryMatches(cache, filters)
+                self.assertEqual((cache.superset_hits, cache.misses), (len(narrower), 1))
+
+    def test_broader_query_is_a_miss(self):
+        cache = QueryCache(self.databases[0])
+        self.assertCachedQueryMatches(cache, create_filters(date=datetime.date(2020, 1, 1)))
+        self.assertCachedQueryMatches(cache, create_filters(start_date=datetime.date(2020, 1, 1)))
+        self.assertCachedQueryMatches(cache, create_filters(distance_max=0.1))
+        self.assertEqual((cache.hits, cache.superset_hits, cache.misses), (0, 0, 3))
+
+    def test_date_is_the_same_as_a_one_day_range(self):
+        cache = QueryCache(self.databases[0])
+        day = datetime.date(2020, 1, 1)
+        self.assertCachedQueryMatches(cache, create_filters(date=day))
+        self.assertCachedQueryMatches(cache, create_filters(start_date=day, end_date=day))
+        self.assertEqual(cache.hits, 1)
+
+    def test_plain_function_filters_are_not_cached(self):
+        cache = QueryCache(self.databases[0])
+        filters = [lambda approach: approach.velocity > 20]
+        self.assertCachedQueryMatches(cache, filters)
+        self.assertEqual((cache.uncacheable, cache.statistics()['entries']), (1, 0))
+
+    def test_least_recently_used_query_is_evicted(self):
+        db = self.databases[0]
+        first, second, third = (create_filters(velocity_min=v) for v in (10, 20, 30))
+
+        cache = QueryCache(db, max_entries=2)
+        for filters in (first, second, first, third):
+            cache.query(filters)
+        self.assertEqual(cache.evictions, 1)
+        cache.query(first)
+        self.assertEqual(cache.hits, 2)
+        cache.query(second)
+        self.assertEqual(cache.misses, 4)
+
+        rows = len(cache.rows(first))
+        cache = QueryCache(db, max_rows=rows)
+        cache.query(first)
+        cache.query(third)
+        self.assertEqual((cache.evictions, cache.statistics()['entries']), (1, 1))
+        self.assertLessEqual(cache.statistics()['rows'], rows)
+
+
+class TestShellCache(unittest.TestCase):
+    def setUp(self):
+        db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        _, inspect_parser, query_parser = main.make_parser()
+        self.shell = main.NEOShell(db, inspect_parser, query_parser)
+
+    def run_commands(self, *commands):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            for command in commands:
+                self.shell.onecmd(command)
+        return stdout.getvalue()
+
+    def test_shell_queries_go_through_the_cache(self):
+        output = self.run_commands('query --min-velocity 20 --limit 3',
+                                   'query --min-velocity 20 --limit 5',
+                                   'stats')
+        self.assertEqual(self.shell.cache.hits, 1)
+        self.assertIn('hit rate:', output)
+
+    def test_shell_cache_can_be_turned_off(self):
+        _, inspect_parser, query_parser = main.make_parser()
+        self.shell = main.NEOShell(self.shell.db, inspect_parser, query_parser, cache_rows=0)
+        self.assertIsNone(self.shell.cache)
+        self.assertIn('turned off', self.run_commands('stats'))
+
+
+if __name__ == '__main__':
+    unittest.main()
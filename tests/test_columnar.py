@@ -0,0 +1,126 @@
+"""Check that a `ColumnarNEODatabase` behaves like an `NEODatabase`.
+
+The columnar database stores close approaches as columns of numbers, so its
+results are compared to those of the ordinary database by value rather than
+by identity.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_columnar
+"""
+import datetime
+import operator
+import pathlib
+import unittest
+
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, load_approaches, stream_approaches
+from filters import create_filters, compile_filters, AttributeFilter, DateFilter, DistanceFilter
+from models import CloseApproach
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+def summarize(approaches):
+    return sorted((approach.designation, approach.time, approach.distance, approach.velocity,
+                   approach.neo.designation) for approach in approaches)
+
+
+class TestColumnarDatabase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        cls.columnar = ColumnarNEODatabase(load_neos(TEST_NEO_FILE),
+                                           stream_approaches(TEST_CAD_FILE))
+
+    def assertSameResults(self, **criteria):
+        filters = create_filters(**criteria)
+        expected = summarize(self.db.query(filters))
+        received = summarize(self.columnar.query(filters))
+        self.assertEqual(expected, received)
+        return received
+
+    def test_query_all(self):
+        self.assertEqual(len(self.assertSameResults()), 4700)
+
+    def test_query_with_date_bounds(self):
+        self.assertTrue(self.assertSameResults(date=datetime.date(2020, 3, 2)))
+        self.assertTrue(self.assertSameResults(start_date=datetime.date(2020, 3, 1),
+                                               end_date=datetime.date(2020, 3, 31)))
+
+    def test_query_with_distance_and_velocity_bounds(self):
+        self.assertTrue(self.assertSameResults(distance_min=0.1, distance_max=0.4,
+                                               velocity_min=10, velocity_max=20))
+
+    def test_query_with_neo_attributes(self):
+        self.assertTrue(self.assertSameResults(diameter_min=0.5, hazardous=True))
+        self.assertTrue(self.assertSameResults(diameter_max=1, hazardous=False))
+
+    def test_query_materializes_close_approaches(self):
+        approach = next(self.columnar.query())
+        self.assertIsInstance(approach, CloseApproach)
+        self.assertIsInstance(approach.time, datetime.datetime)
+        self.assertIs(approach.neo, self.columnar.get_neo_by_designation(approach.designation))
+        # While it's referenced, the same row produces the same object.
+        self.assertIs(next(self.columnar.query()), approach)
+
+    def test_neos_list_their_approaches(self):
+        expected = self.db.get_neo_by_designation('2101')
+        received = self.columnar.get_neo_by_designation('2101')
+        self.assertEqual(len(received.approaches), len(expected.approaches))
+        self.assertEqual(summarize(received.approaches), summarize(expected.approaches))
+
+    def test_neos_collectively_exhaust_approaches(self):
+        total = sum(len(neo.approaches) for neo in self.columnar._neos)
+        self.assertEqual(total, 4700)
+
+
+class NameFilter(AttributeFilter):
+    @classmethod
+    def get(cls, approach):
+        return approach.neo.name
+
+
+class NearDistanceFilter(DistanceFilter):
+    @classmethod
+    def get(cls, approach):
+        return round(approach.distance, 1)
+
+
+class TestVectorizedFilters(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        cls.columnar = ColumnarNEODatabase(load_neos(TEST_NEO_FILE),
+                                           stream_approaches(TEST_CAD_FILE))
+
+    def assertSameResults(self, filters):
+        expected = summarize(self.db.query(filters))
+        received = summarize(self.columnar.query(filters))
+        self.assertEqual(expected, received)
+        return received
+
+    def test_compile_filters_splits_custom_filters(self):
+        filters = create_filters(date=datetime.date(2020, 3, 2), hazardous=True)
+        custom = [NameFilter(operator.eq, 'Adonis'), NearDistanceFilter(operator.le, 0.1)]
+        vectorized, residual = compile_filters(filters + custom)
+        self.assertEqual(vectorized, filters)
+        self.assertEqual(residual, custom)
+
+    def test_date_filter_mask_handles_every_comparison(self):
+        date = datetime.date(2020, 3, 2)
+        for op in (operator.eq, operator.ne, operator.lt, operator.le, operator.gt, operator.ge):
+            with self.subTest(op=op.__name__):
+                self.assertTrue(self.assertSameResults([DateFilter(op, date)]))
+
+    def test_custom_filters_fall_back_to_rows(self):
+        self.assertTrue(self.assertSameResults([NameFilter(operator.eq, 'Adonis')]))
+        self.assertTrue(self.assertSameResults(
+            create_filters(hazardous=False) + [NearDistanceFilter(operator.le, 0.1)]))
+
+
+if __name__ == '__main__':
+    unittest.main()
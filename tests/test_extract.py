@@ -2,7 +2,8 @@
 
 The `load_neos` function should load a collection of `NearEarthObject`s from a
 CSV file, and the `load_approaches` function should load a collection of
-`CloseApproach` objects from a JSON file.
+`CloseApproach` objects from a JSON file. The `stream_approaches` function
+should generate the same close approaches, one at a time.
 
 To run these tests from the project root, run:
 
@@ -12,11 +13,14 @@ These tests should pass when Task 2 is complete.
 """
 import collections.abc
 import datetime
+import io
+import json
 import pathlib
 import math
+import tempfile
 import unittest
 
-from extract import load_neos, load_approaches
+from extract import load_neos, load_approaches, stream_approaches, _JSONStream
 from models import NearEarthObject, CloseApproach
 
 
@@ -77,6 +81,33 @@ class TestLoadNEOs(unittest.TestCase):
         self.assertEqual(neo.diameter, 0.6)
         self.assertEqual(neo.hazardous, True)
 
+    def test_neos_have_no_extra_columns_by_default(self):
+        self.assertIsNone(self.neos_by_designation['2101'].extra)
+
+    def test_extra_columns_are_projected(self):
+        neos = load_neos(TEST_NEO_FILE, extra_columns=('H', 'class'))
+        neos = {neo.designation: neo for neo in neos}
+        self.assertEqual(neos['1685'].extra, {'H': '14.3', 'class': 'APO'})
+        self.assertEqual(neos['1685'].name, 'Toro')
+        self.assertEqual(neos['1685'].diameter, 3.4)
+
+    def test_missing_columns_are_reported(self):
+        with self.assertRaises(ValueError):
+            load_neos(TEST_NEO_FILE, extra_columns=('no such column',))
+
+    def test_blank_and_short_lines_are_tolerated(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'neos.csv'
+            lines = TEST_NEO_FILE.read_text().splitlines()
+            header = lines[0].split(',')
+            short = ['2099 ZZ'] * (header.index('pdes') + 1)
+            lines += [','.join(short), '', '']
+            path.write_text('\n'.join(lines) + '\n')
+            neos = load_neos(path)
+        self.assertEqual(len(neos), 4227)
+        self.assertEqual(neos[-1].designation, '2099 ZZ')
+        self.assertTrue(math.isnan(neos[-1].diameter))
+
 
 class TestLoadApproaches(unittest.TestCase):
     @classmethod
@@ -118,5 +149,78 @@ class TestLoadApproaches(unittest.TestCase):
         self.assertIsInstance(approach.velocity, float)
 
 
+class TestStreamApproaches(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+
+    @staticmethod
+    def summarize(approaches):
+        return [(approach.designation, approach.time, approach.distance,
+                 approach.velocity) for approach in approaches]
+
+    def test_stream_is_a_generator(self):
+        stream = stream_approaches(TEST_CAD_FILE)
+        self.assertIsInstance(stream, collections.abc.Generator)
+        self.assertIsInstance(next(stream), CloseApproach)
+        stream.close()
+
+    def test_stream_matches_load_approaches(self):
+        self.assertEqual(self.summarize(stream_approaches(TEST_CAD_FILE)),
+                         self.summarize(self.approaches))
+
+    def test_stream_honors_fields_header(self):
+        with open(TEST_CAD_FILE) as f:
+            original = json.load(f)
+        # Reverse every row and the header, and put the header first.
+        reordered = {
+            'fields': original['fields'][::-1],
+            'data': [row[::-1] for row in original['data']],
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'cad.json'
+            path.write_text(json.dumps(reordered))
+            streamed = self.summarize(stream_approaches(path))
+            loaded = self.summarize(load_approaches(path))
+
+        expected = self.summarize(self.approaches)
+        self.assertEqual(streamed, expected)
+        self.assertEqual(loaded, expected)
+
+    def test_malformed_json_reports_file_offset(self):
+        # Far enough into the file that the stream's window has moved on.
+        text = '{"data": [' + ', '.join(['1'] * 50000) + '}'
+        stream = _JSONStream(io.StringIO(text), chunk_size=1024)
+        stream.expect('{')
+        self.assertEqual(stream.value(), 'data')
+        stream.expect(':')
+        with self.assertRaisesRegex(ValueError, f"at offset {len(text) - 1},"):
+            list(stream.array())
+
+
+class TestCompactModels(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+
+    def test_models_have_no_instance_dict(self):
+        self.assertFalse(hasattr(self.neos[0], '__dict__'))
+        self.assertFalse(hasattr(self.approaches[0], '__dict__'))
+
+    def test_approaches_share_designations_with_neos(self):
+        designations = {neo.designation: neo.designation for neo in self.neos}
+        for approach in self.approaches:
+            self.assertIs(approach.designation,
+                          designations[approach.designation])
+
+    def test_approaches_share_designations_with_each_other(self):
+        streamed = {}
+        for approach in stream_approaches(TEST_CAD_FILE):
+            designation = approach.designation
+            self.assertIs(streamed.setdefault(designation, designation),
+                          designation)
+
+
 if __name__ == '__main__':
     unittest.main()
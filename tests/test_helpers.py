@@ -0,0 +1,85 @@
+"""Check that the date and time helpers agree with the standard library.
+
+The `cd_to_datetime` function parses NASA's calendar dates without `strptime`,
+so it's checked against `strptime` over every close approach in the data set,
+as well as a few unusual and malformed dates.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_helpers
+"""
+import datetime
+import json
+import pathlib
+import unittest
+
+from helpers import cd_to_datetime, datetime_to_minutes, minutes_to_datetime
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+DATA_ROOT = TESTS_ROOT.parent / 'data'
+FORMAT = "%Y-%b-%d %H:%M"
+
+
+def calendar_dates(path):
+    """Return the `cd` field of every close approach in a JSON file."""
+    with open(path) as f:
+        contents = json.load(f)
+    index = contents['fields'].index('cd')
+    return [row[index] for row in contents['data']]
+
+
+class TestCalendarDates(unittest.TestCase):
+    def assertParsesLikeStrptime(self, calendar_date):
+        try:
+            expected = datetime.datetime.strptime(calendar_date, FORMAT)
+        except ValueError:
+            with self.assertRaises(ValueError):
+                cd_to_datetime(calendar_date)
+        else:
+            self.assertEqual(cd_to_datetime(calendar_date), expected)
+
+    def test_parses_test_data_like_strptime(self):
+        dates = calendar_dates(TESTS_ROOT / 'test-cad-2020.json')
+        self.assertGreater(len(dates), 0)
+        for calendar_date in dates:
+            self.assertParsesLikeStrptime(calendar_date)
+
+    @unittest.skipUnless((DATA_ROOT / 'cad.json').exists(), "The full data set isn't available.")
+    def test_parses_full_data_like_strptime(self):
+        for calendar_date in calendar_dates(DATA_ROOT / 'cad.json'):
+            self.assertEqual(cd_to_datetime(calendar_date),
+                             datetime.datetime.strptime(calendar_date, FORMAT))
+
+    def test_parses_unusual_dates_like_strptime(self):
+        for calendar_date in ('2020-Dec-31 12:00', '1900-Jan-01 00:00', '2200-Feb-29 23:59',
+                              '2020-dec-31 12:00', '2020-DEC-31 12:00', '2020-Dec-1 12:00',
+                              '2020-Dec-31 1:05', '999-Jan-01 00:00'):
+            with self.subTest(calendar_date=calendar_date):
+                self.assertParsesLikeStrptime(calendar_date)
+
+    def test_rejects_malformed_dates_like_strptime(self):
+        for calendar_date in ('2021-Feb-29 12:00', '2020-Dec-32 12:00', '2020-Dec-31 24:00',
+                              '2020-Dec-31 12:60', '2020-Dex-31 12:00', '2020-Dec-31 12:00:00',
+                              '2020-12-31 12:00', '2020-Dec-31T12:00', '+020-Dec-31 12:00', ''):
+            with self.subTest(calendar_date=calendar_date):
+                self.assertParsesLikeStrptime(calendar_date)
+
+    def test_repeated_dates_parse_the_same(self):
+        first = cd_to_datetime('2020-Mar-02 04:05')
+        self.assertEqual(cd_to_datetime('2020-Mar-02 04:05'), first)
+        self.assertEqual(cd_to_datetime('2020-Mar-02 06:07'), datetime.datetime(2020, 3, 2, 6, 7))
+        with self.assertRaises(ValueError):
+            cd_to_datetime('2020-Mar-02 04:05 ')
+
+
+class TestMinutes(unittest.TestCase):
+    def test_minutes_round_trip(self):
+        for dt in (datetime.datetime(1970, 1, 1), datetime.datetime(1900, 1, 1, 0, 1),
+                   datetime.datetime(2200, 12, 31, 23, 59)):
+            with self.subTest(dt=dt):
+                self.assertEqual(minutes_to_datetime(datetime_to_minutes(dt)), dt)
+
+
+if __name__ == '__main__':
+    unittest.main()
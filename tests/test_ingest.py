@@ -0,0 +1,177 @@
+"""Check that ingesting a delta gives the same database as building it whole.
+
+Some close approaches are held back from a database and then ingested - either
+the latest ones, which keep the rows in chronological order, or a random
+sample, which has to be spliced into the index of approach times - and the
+result is compared with a database built from every close approach.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_ingest
+"""
+import contextlib
+import datetime
+import io
+import pathlib
+import random
+import tempfile
+import unittest
+
+import main
+from cache import QueryCache
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from models import NearEarthObject, CloseApproach
+from neodb import open_database, write_database
+from snapshot import read_snapshot
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+CRITERIA = (
+    {},
+    {'start_date': datetime.date(2020, 12, 1), 'end_date': datetime.date(2020, 12, 31)},
+    {'distance_max': 0.05, 'velocity_min': 10},
+    {'hazardous': True},
+    {'diameter_min': 1},
+)
+
+
+def summarize(approaches):
+    return [(approach.designation, approach.time, approach.distance, approach.velocity)
+            for approach in approaches]
+
+
+def split(held):
+    """Split the test close approaches into those at the held positions, and the rest."""
+    approaches = load_approaches(TEST_CAD_FILE)
+    held = set(held)
+    return ([approach for i, approach in enumerate(approaches) if i not in held],
+            [approach for i, approach in enumerate(approaches) if i in held])
+
+
+class TestIngest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.count = len(load_approaches(TEST_CAD_FILE))
+        cls.reference = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+
+    def assertSameAnswers(self, db, reference):
+        for criteria in CRITERIA:
+            with self.subTest(criteria=criteria):
+                filters = create_filters(**criteria)
+                got = summarize(db.query(filters))
+                self.assertEqual(sorted(got), sorted(summarize(reference.query(filters))))
+                self.assertEqual([row[1] for row in got], sorted(row[1] for row in got))
+        for neo in reference._neos:
+            self.assertEqual(
+                sorted(summarize(db.get_neo_by_designation(neo.designation).approaches)),
+                sorted(summarize(neo.approaches)))
+
+    def backends(self, base):
+        yield NEODatabase(load_neos(TEST_NEO_FILE), base)
+        yield ColumnarNEODatabase(load_neos(TEST_NEO_FILE), base)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = pathlib.Path(tmp) / 'neo.neodb'
+            write_database(ColumnarNEODatabase(load_neos(TEST_NEO_FILE), base), path)
+            yield open_database(path)
+
+    def test_ingest_latest_approaches(self):
+        base, delta = split(range(self.count - 100, self.count))
+        for db in self.backends(base):
+            with self.subTest(db=type(db).__name__):
+                counts = db.ingest(approaches=delta)
+                self.assertEqual(counts['new approaches'], 100)
+                # The rows are still in chronological order.
+                self.assertIsInstance(db._time_order, range)
+                self.assertSameAnswers(db, self.reference)
+
+    def test_ingest_approaches_throughout(self):
+        base, delta = split(random.Random(2020).sample(range(self.count), 200))
+        for db in self.backends(base):
+            with self.subTest(db=type(db).__name__):
+                db.ingest(approaches=delta)
+                self.assertSameAnswers(db, self.reference)
+                # Another delta, into an index that's no longer a range.
+                db.ingest(approaches=[CloseApproach(designation='1685', time='2020-Jan-01 00:01',
+                                                    distance='0.3', velocity='5')])
+                self.assertEqual(len(db._time_order), self.count + 1)
+
+    def test_duplicates_update_existing_approaches(self):
+        updates = load_approaches(TEST_CAD_FILE)[:10]
+        for approach in updates:
+            approach.distance = 1.5
+        for db in self.backends(load_approaches(TEST_CAD_FILE)):
+            with self.subTest(db=type(db).__name__):
+                counts = db.ingest(approaches=updates + updates[:3])
+                self.assertEqual((counts['new approaches'], counts['updated approaches']), (0, 10))
+                self.assertEqual(len(list(db.query(create_filters(distance_min=1.5)))), 10)
+                self.assertEqual(len(db._time_order), self.count)
+
+    def test_ingest_new_and_updated_neos(self):
+        new = NearEarthObject(designation='2099 ZZ', name='Newcomer', diameter='5.5',
+                              hazardous='Y')
+        updated = NearEarthObject(designation='1685', name='Toro', diameter='5.0', hazardous='Y')
+        approach = CloseApproach(designation='2099 ZZ', time='2020-Jul-04 12:00',
+                                 distance='0.01', velocity='30')
+        for db in self.backends(load_approaches(TEST_CAD_FILE)):
+            with self.subTest(db=type(db).__name__):
+                counts = db.ingest([new, updated], [approach])
+                self.assertEqual((counts['new NEOs'], counts['updated NEOs']), (1, 1))
+                neo = db.get_neo_by_name('Newcomer')
+                self.assertEqual([a.time for a in neo.approaches], [approach.time])
+                self.assertTrue(db.get_neo_by_designation('1685').hazardous)
+                matches = {a.designation for a in db.query(create_filters(diameter_min=4.5,
+                                                                          hazardous=True))}
+                self.assertEqual(matches, {'2099 ZZ', '1685'})
+                self.assertEqual(db.find_neos_by_prefix('newc'), [neo])
+
+    def test_unknown_neo_changes_nothing(self):
+        db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        delta = [CloseApproach(designation='1685', time='2020-Jan-01 00:01', distance='0.3',
+                               velocity='5'),
+                 CloseApproach(designation='nope', time='2020-Jan-01 00:02', distance='0.3',
+                               velocity='5')]
+        with self.assertRaises(ValueError):
+            db.ingest(approaches=delta)
+        self.assertEqual(len(db._approaches), self.count)
+
+    def test_ingest_invalidates_query_cache(self):
+        db = ColumnarNEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        cache = QueryCache(db)
+        filters = create_filters(date=datetime.date(2020, 1, 1))
+        before = len(list(cache.query(filters)))
+        db.ingest(approaches=[CloseApproach(designation='1685', time='2020-Jan-01 00:01',
+                                            distance='0.3', velocity='5')])
+        self.assertEqual(len(list(cache.query(filters))), before + 1)
+        self.assertEqual(cache.hits, 0)
+
+
+class TestIngestCommand(unittest.TestCase):
+    def test_ingest_saves_snapshot(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = pathlib.Path(tmp)
+            delta = tmp / 'delta.json'
+            delta.write_text(
+                '{"fields": ["des", "orbit_id", "jd", "cd", "dist", "dist_min", "dist_max", '
+                '"v_rel", "v_inf", "t_sigma_f", "h"], "data": [["1685", "1", "2459000.5", '
+                '"2020-Jan-01 00:01", "0.3", "0.3", "0.3", "5", "5", "00:01", "10"]]}')
+            parser, _, _ = main.make_parser()
+            args = parser.parse_args(['--neofile', str(TEST_NEO_FILE), '--cadfile',
+                                      str(TEST_CAD_FILE), '--snapshot', str(tmp / 'neo.snapshot'),
+                                      'ingest', '--approaches', str(delta)])
+            with contextlib.redirect_stdout(io.StringIO()):
+                database = main.load_database(args)
+                saved = (tmp / 'neo.snapshot').read_bytes()
+                main.ingest(database, args)
+            # The delta is appended to the snapshot, rather than saving it all again.
+            self.assertTrue((tmp / 'neo.snapshot').read_bytes().startswith(saved))
+            restored = read_snapshot(tmp / 'neo.snapshot', (TEST_NEO_FILE, TEST_CAD_FILE))
+            self.assertEqual(len(restored._approaches), len(load_approaches(TEST_CAD_FILE)) + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
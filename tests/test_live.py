@@ -0,0 +1,116 @@
+"""Check that a database is reloaded, and swapped in, when its data files change.
+
+The test data files are copied to a temporary directory, and the copy of the
+close approach file is then rewritten with fewer close approaches.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_live
+"""
+import contextlib
+import io
+import json
+import pathlib
+import shutil
+import tempfile
+import time
+import unittest
+
+import live
+import main
+from database import NEODatabase
+from extract import load_neos, load_approaches
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class TestLiveDatabase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = pathlib.Path(tmp.name)
+        self.neo_file = shutil.copy(TEST_NEO_FILE, self.tmp / 'neos.csv')
+        self.cad_file = shutil.copy(TEST_CAD_FILE, self.tmp / 'cad.json')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.live = live.LiveDatabase(self.load, [self.neo_file, self.cad_file])
+
+    def load(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return NEODatabase(load_neos(self.neo_file), load_approaches(self.cad_file))
+
+    def truncate(self, count):
+        """Rewrite the close approach file with only its first `count` close approaches."""
+        data = json.loads(TEST_CAD_FILE.read_text())
+        data['data'] = data['data'][:count]
+        data['count'] = str(count)
+        pathlib.Path(self.cad_file).write_text(json.dumps(data))
+
+    def test_unchanged_files_are_not_reloaded(self):
+        self.assertFalse(self.live.poll())
+        self.assertFalse(self.live.refresh())
+        self.assertEqual(self.live.version, 1)
+
+    def test_changed_files_are_reloaded_once_settled(self):
+        old = self.live.database
+        self.truncate(100)
+        # The first poll sees the change, but waits for the file to settle.
+        self.assertFalse(self.live.poll())
+        self.assertTrue(self.live.poll())
+        # Nothing is swapped in until `refresh`.
+        self.assertIs(self.live.database, old)
+        self.assertTrue(self.live.refresh())
+        self.assertEqual(self.live.version, 2)
+        self.assertEqual(len(self.live.database._approaches), 100)
+        self.assertEqual(len(old._approaches), len(load_approaches(TEST_CAD_FILE)))
+        self.assertEqual([number for number, _, _ in self.live.history], [1, 2])
+        self.assertFalse(self.live.poll())
+
+    def test_failed_reload_keeps_the_current_version(self):
+        pathlib.Path(self.cad_file).write_text('{"fields": [], "data": [[')
+        self.live.poll()
+        self.assertTrue(self.live.poll())
+        with self.assertRaises(live.ReloadError):
+            self.live.refresh()
+        self.assertEqual(self.live.version, 1)
+        # The same broken file isn't tried again, but a fixed one is.
+        self.assertFalse(self.live.poll())
+        self.truncate(10)
+        self.live.poll()
+        self.live.poll()
+        self.assertTrue(self.live.refresh())
+        self.assertEqual(len(self.live.database._approaches), 10)
+
+    def test_background_reload(self):
+        self.live.interval = 0.01
+        self.live.start()
+        self.addCleanup(self.live.stop)
+        self.truncate(100)
+        deadline = time.monotonic() + 30
+        while not self.live.refresh():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+        self.assertEqual(len(self.live.database._approaches), 100)
+
+    def test_shell_swaps_in_reloaded_data(self):
+        _, inspect_parser, query_parser = main.make_parser()
+        shell = main.NEOShell(self.live.database, inspect_parser, query_parser, live=self.live)
+        old_cache = shell.cache
+        self.truncate(100)
+        self.live.poll()
+        self.live.poll()
+
+        stdout, stderr = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+            shell.onecmd(shell.precmd('version'))
+        self.assertIs(shell.db, self.live.database)
+        self.assertIsNot(shell.cache, old_cache)
+        self.assertIs(shell.cache.database, shell.db)
+        self.assertIn('now using version 2', stderr.getvalue())
+        self.assertIn('Version 2 of the data', stdout.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
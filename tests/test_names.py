@@ -0,0 +1,135 @@
+"""Check that NEOs can be found by the start of, or something like, a name.
+
+The prefix and fuzzy searches of `NEODatabase` are checked on the test data
+set, and the fuzzy search of a `NameIndex` - which skips the longest postings
+when it can - is checked against one that always counts every posting.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_names
+"""
+import contextlib
+import io
+import pathlib
+import random
+import unittest
+
+import main
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, load_approaches
+from names import NameIndex, normalize
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class TestNameSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.databases = (
+            NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)),
+            ColumnarNEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)),
+        )
+        cls.db = cls.databases[0]
+
+    def test_prefix_of_designation(self):
+        for db in self.databases:
+            with self.subTest(db=type(db).__name__):
+                neos = db.find_neos_by_prefix('2020 ay')
+                self.assertEqual([neo.designation for neo in neos], ['2020 AY1', '2020 AY2'])
+
+    def test_prefix_of_name(self):
+        neos = self.db.find_neos_by_prefix('  CERB')
+        self.assertEqual([neo.name for neo in neos], ['Cerberus'])
+
+    def test_prefix_search_is_in_order_and_limited(self):
+        neos = self.db.find_neos_by_prefix('2020', limit=25)
+        self.assertEqual(len(neos), 25)
+        designations = [normalize(neo.designation) for neo in neos]
+        self.assertEqual(designations, sorted(designations))
+        self.assertTrue(all(designation.startswith('2020') for designation in designations))
+        self.assertEqual(self.db.find_neos_by_prefix('2020', limit=0), [])
+
+    def test_prefix_without_matches(self):
+        self.assertEqual(self.db.find_neos_by_prefix('no such neo'), [])
+        self.assertEqual(self.db.find_neos_by_prefix(''), [])
+
+    def test_fuzzy_finds_a_misspelled_name(self):
+        for db in self.databases:
+            with self.subTest(db=type(db).__name__):
+                (neo, similarity), *_ = db.find_neos_like('cerberos')
+                self.assertEqual(neo.name, 'Cerberus')
+                self.assertLess(similarity, 1)
+
+    def test_fuzzy_exact_match_comes_first(self):
+        (neo, similarity), *_ = self.db.find_neos_like('toro')
+        self.assertEqual((neo.designation, similarity), ('1685', 1.0))
+
+    def test_fuzzy_lists_each_neo_once(self):
+        results = self.db.find_neos_like('1685 toro', limit=20)
+        neos = [neo for neo, _ in results]
+        self.assertEqual(len(neos), len(set(map(id, neos))))
+        similarities = [similarity for _, similarity in results]
+        self.assertEqual(similarities, sorted(similarities, reverse=True))
+
+    def test_fuzzy_search_matches_counting_every_posting(self):
+        index = NameIndex(self.db._neos)
+        exhaustive = NameIndex(self.db._neos)
+        exhaustive.SKIP_CHECK = len(self.db._neos) * 2
+        keys = [normalize(neo.designation) for neo in self.db._neos]
+        rng = random.Random(2020)
+        for _ in range(200):
+            key = list(rng.choice(keys))
+            for _ in range(rng.randrange(3)):
+                key[rng.randrange(len(key))] = rng.choice('0123456789abcdefghjk ')
+            text = ''.join(key)[:rng.randrange(1, len(key) + 1)]
+            with self.subTest(text=text):
+                self.assertEqual(index.fuzzy(text, limit=5), exhaustive.fuzzy(text, limit=5))
+
+
+class TestInspectSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+
+    def inspect(self, **kwargs):
+        stdout, stderr = io.StringIO(), io.StringIO()
+        result = main.inspect(self.db, stdout=stdout, stderr=stderr, **kwargs)
+        return result, stdout.getvalue(), stderr.getvalue()
+
+    def test_inspect_prefix_lists_candidates(self):
+        neos, stdout, _ = self.inspect(prefix='2020 AY', verbose=True)
+        self.assertEqual(len(neos), 2)
+        self.assertEqual(stdout.count('NearEarthObject'), 2)
+        self.assertIn('- A CloseApproach', stdout)
+
+    def test_inspect_fuzzy_respects_limit(self):
+        neos, stdout, _ = self.inspect(fuzzy='2020 a', limit=3)
+        self.assertEqual(len(neos), 3)
+        self.assertEqual(len(stdout.splitlines()), 3)
+
+    def test_inspect_search_without_matches(self):
+        neos, stdout, stderr = self.inspect(fuzzy='zzzz')
+        self.assertIsNone(neos)
+        self.assertEqual(stdout, '')
+        self.assertIn('No matching NEOs', stderr)
+
+    def test_inspect_empty_prefix_finds_nothing(self):
+        neos, stdout, stderr = self.inspect(prefix='')
+        self.assertIsNone(neos)
+        self.assertIn('No matching NEOs', stderr)
+
+    def test_empty_search_text_is_rejected(self):
+        parser, inspect_parser, _ = main.make_parser()
+        for option in ('--prefix', '--fuzzy'):
+            with self.subTest(option=option), \
+                    contextlib.redirect_stderr(io.StringIO()) as stderr, \
+                    self.assertRaises(SystemExit):
+                inspect_parser.parse_args([option, ' '])
+            self.assertIn("can't be empty", stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
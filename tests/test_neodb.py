@@ -0,0 +1,142 @@
+"""Check that a database queried in place from a `.neodb` file gets the same answers.
+
+A `.neodb` file is written from each kind of database - including one whose
+close approaches aren't in chronological order, so that the time index is
+stored too - and opened as a `MappedNEODatabase`, which should then answer
+every lookup and query just as the original does.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_neodb
+"""
+import contextlib
+import datetime
+import io
+import math
+import pathlib
+import random
+import tempfile
+import unittest
+
+import main
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from neodb import open_database, write_database
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+CRITERIA = (
+    {},
+    {'date': datetime.date(2020, 1, 1)},
+    {'start_date': datetime.date(2020, 6, 1), 'end_date': datetime.date(2020, 6, 30),
+     'distance_max': 0.2},
+    {'velocity_min': 20, 'hazardous': True},
+    {'diameter_min': 1},
+    {'diameter_max': 0.5, 'distance_min': 0.1, 'velocity_max': 10},
+)
+
+
+def summarize_neo(neo):
+    diameter = None if math.isnan(neo.diameter) else neo.diameter
+    return (neo.designation, neo.name, diameter, neo.hazardous,
+            sorted(approach.time for approach in neo.approaches))
+
+
+def summarize(approaches):
+    return [(approach.designation, approach.time, approach.distance, approach.velocity)
+            for approach in approaches]
+
+
+class TestNEODatabaseFile(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        shuffled = load_approaches(TEST_CAD_FILE)
+        random.Random(2020).shuffle(shuffled)
+        cls.databases = {
+            'objects': NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)),
+            'columnar': ColumnarNEODatabase(load_neos(TEST_NEO_FILE),
+                                            load_approaches(TEST_CAD_FILE)),
+            'shuffled': NEODatabase(load_neos(TEST_NEO_FILE), shuffled),
+        }
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = pathlib.Path(tmp.name)
+
+    def reopen(self, db):
+        path = self.tmp / 'neo.neodb'
+        write_database(db, path, (TEST_NEO_FILE, TEST_CAD_FILE))
+        return open_database(path)
+
+    def test_columns_are_read_in_place(self):
+        mapped = self.reopen(self.databases['objects'])
+        self.assertIsInstance(mapped._time, memoryview)
+        self.assertIsInstance(mapped._neo_index, memoryview)
+        self.assertIsInstance(mapped._time_order, range)
+
+        mapped = self.reopen(self.databases['shuffled'])
+        self.assertIsInstance(mapped._time_order, memoryview)
+
+    def test_neos_and_their_approaches_survive(self):
+        for kind, db in self.databases.items():
+            with self.subTest(kind=kind):
+                mapped = self.reopen(db)
+                self.assertEqual([summarize_neo(neo) for neo in mapped._neos],
+                                 [summarize_neo(neo) for neo in db._neos])
+                neo = mapped.get_neo_by_name('Toro')
+                self.assertIs(neo.approaches[0].neo, neo)
+
+    def test_queries_match(self):
+        for kind, db in self.databases.items():
+            mapped = self.reopen(db)
+            for criteria in CRITERIA:
+                with self.subTest(kind=kind, criteria=criteria):
+                    filters = create_filters(**criteria)
+                    self.assertEqual(summarize(mapped.query(filters)), summarize(db.query(filters)))
+                    self.assertEqual(mapped.explain(filters), db.explain(filters))
+
+    def test_batch_query_matches(self):
+        db = self.databases['shuffled']
+        mapped = self.reopen(db)
+        filter_sets = [create_filters(**criteria) for criteria in CRITERIA]
+        for filters, stream in zip(filter_sets, mapped.batch_query(filter_sets)):
+            self.assertEqual(summarize(stream), summarize(db.query(filters)))
+
+    def test_other_files_are_rejected(self):
+        for contents in (b'', b'not a database', TEST_NEO_FILE.read_bytes()):
+            path = self.tmp / 'other.neodb'
+            path.write_bytes(contents)
+            with self.subTest(contents=contents[:16]), self.assertRaises(ValueError):
+                open_database(path)
+
+
+class TestCompileCommand(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = pathlib.Path(tmp.name)
+        self.parser, _, _ = main.make_parser()
+
+    def test_compile_then_query_with_dbfile(self):
+        common = ['--no-snapshot', '--neofile', str(TEST_NEO_FILE), '--cadfile', str(TEST_CAD_FILE)]
+        dbfile = self.tmp / 'neo.neodb'
+        with contextlib.redirect_stdout(io.StringIO()):
+            path = main.compile_database(self.parser.parse_args(common + ['compile', str(dbfile)]))
+        self.assertEqual(path, dbfile)
+
+        args = self.parser.parse_args(['--dbfile', str(dbfile), 'query', '--min-velocity', '30'])
+        self.assertEqual(main._sources(args), [str(dbfile.resolve())])
+        local, mapped = io.StringIO(), io.StringIO()
+        main.query(open_database(dbfile), args, stdout=mapped)
+        main.query(NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)),
+                   args, stdout=local)
+        self.assertEqual(mapped.getvalue(), local.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+"""Check that loading the data files in parallel builds the same database.
+
+The close approach file is split into ranges of rows that are converted in
+worker processes, so the result should match a serial load no matter how many
+workers (and so ranges) there are.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_parallel
+"""
+import contextlib
+import io
+import json
+import math
+import pathlib
+import tempfile
+import unittest
+
+from database import NEODatabase, ColumnarNEODatabase
+from extract import load_neos, load_approaches
+from parallel import load_database, _chunk_bounds, _locate_rows
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+def summarize_approach(approach):
+    distance = None if math.isnan(approach.distance) else approach.distance
+    return (approach.designation, approach.time, distance, approach.velocity,
+            approach.neo.designation)
+
+
+def write_cad(path, fields_first=True, rows=None):
+    """Write a copy of the test close approach file, with the header first or last."""
+    with open(TEST_CAD_FILE) as f:
+        contents = json.load(f)
+    data = contents['data'] if rows is None else rows
+    if fields_first:
+        ordered = {'signature': contents.get('signature'), 'count': str(len(data)),
+                   'fields': contents['fields'], 'data': data}
+    else:
+        ordered = {'count': str(len(data)), 'data': data, 'fields': contents['fields']}
+    with open(path, 'w') as f:
+        json.dump(ordered, f, indent=2)
+    return path
+
+
+class TestParallelLoad(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.expected = [summarize_approach(approach) for approach in NEODatabase(
+                load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))._approaches]
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = pathlib.Path(tmp.name)
+
+    def load(self, cad_file, workers, columnar=False):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return load_database(TEST_NEO_FILE, cad_file, workers, columnar=columnar)
+
+    def test_chunks_start_at_rows(self):
+        cad_file = write_cad(self.tmp / 'cad.json')
+        start, positions = _locate_rows(cad_file)
+        self.assertEqual(positions, (0, 3, 4, 7))
+        bounds = _chunk_bounds(cad_file, start, cad_file.stat().st_size, 8)
+        self.assertEqual(len(bounds), 8)
+        with open(cad_file, 'rb') as f:
+            contents = f.read()
+        self.assertEqual(contents[start:start + 1], b'[')
+        for bound in bounds[1:]:
+            self.assertEqual(contents[bound:bound + 1], b'[')
+
+    def test_parallel_load_matches_serial_load(self):
+        cad_file = write_cad(self.tmp / 'cad.json')
+        for workers in (1, 2, 3):
+            for columnar in (False, True):
+                with self.subTest(workers=workers, columnar=columnar):
+                    db = self.load(cad_file, workers, columnar=columnar)
+                    self.assertIsInstance(db, ColumnarNEODatabase if columnar else NEODatabase)
+                    self.assertEqual([summarize_approach(approach)
+                                      for approach in db._approaches], self.expected)
+
+    def test_fields_after_data_falls_back_to_streaming(self):
+        cad_file = write_cad(self.tmp / 'cad.json', fields_first=False)
+        self.assertIsNone(_locate_rows(cad_file))
+        db = self.load(cad_file, 2)
+        self.assertEqual([summarize_approach(approach) for approach in db._approaches],
+                         self.expected)
+
+    def test_missing_numbers_match_serial_load(self):
+        with open(TEST_CAD_FILE) as f:
+            rows = json.load(f)['data'][:20]
+        for i, row in enumerate(rows):
+            row[4 if i % 2 else 7] = None if i % 3 else ''
+        cad_file = write_cad(self.tmp / 'cad.json', rows=rows)
+        with contextlib.redirect_stdout(io.StringIO()):
+            serial = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(cad_file))
+        for columnar in (False, True):
+            with self.subTest(columnar=columnar):
+                db = self.load(cad_file, 2, columnar=columnar)
+                self.assertEqual([repr(approach) for approach in db._approaches],
+                                 [repr(approach) for approach in serial._approaches])
+
+    def test_empty_data(self):
+        cad_file = write_cad(self.tmp / 'cad.json', rows=[])
+        db = self.load(cad_file, 2)
+        self.assertEqual(len(db._approaches), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -12,13 +12,20 @@ To run these tests from the project root, run::
 
 These tests should pass when Tasks 3a and 3b are complete.
 """
+import array
+import asyncio
 import datetime
+import math
+import operator
 import pathlib
+import random
 import unittest
+import unittest.mock
 
-from database import NEODatabase
+from database import NEODatabase, ColumnarNEODatabase, ColumnStatistics, QueryPlan, _KDTree
 from extract import load_neos, load_approaches
-from filters import create_filters
+from filters import create_filters, date_bounds, DateFilter, DistanceFilter, VelocityFilter
+from models import CloseApproach
 
 
 TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
@@ -529,5 +536,448 @@ class TestQuery(unittest.TestCase):
         self.assertEqual(expected, received, msg="Computed results do not match expected results.")
 
 
+class CountingFilter:
+    """A filter that accepts everything and counts the approaches it sees."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, approach):
+        self.calls += 1
+        return True
+
+
+class TestTimeIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        # Shuffle the close approaches, so the index can't rely on file order.
+        shuffled = list(cls.approaches)
+        random.Random(2020).shuffle(shuffled)
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), shuffled)
+        cls.columnar = ColumnarNEODatabase(load_neos(TEST_NEO_FILE), shuffled)
+
+    def test_date_bounds_folds_date_filters(self):
+        march = [DateFilter(operator.ge, datetime.date(2020, 3, 1)),
+                 DateFilter(operator.lt, datetime.date(2020, 4, 1)),
+                 DateFilter(operator.gt, datetime.date(2020, 2, 1))]
+        velocity = VelocityFilter(operator.ge, 10)
+        self.assertEqual(date_bounds(march + [velocity]),
+                         (datetime.date(2020, 3, 1), datetime.date(2020, 3, 31), [velocity]))
+        self.assertEqual(date_bounds(create_filters(date=datetime.date(2020, 3, 2))),
+                         (datetime.date(2020, 3, 2), datetime.date(2020, 3, 2), []))
+
+    def test_query_only_visits_approaches_on_the_date(self):
+        date = datetime.date(2020, 3, 2)
+        expected = [approach for approach in self.approaches if approach.time.date() == date]
+        self.assertGreater(len(expected), 0)
+
+        for db in (self.db, self.columnar):
+            with self.subTest(database=type(db).__name__):
+                counter = CountingFilter()
+                received = list(db.query(create_filters(date=date) + [counter]))
+                self.assertEqual(counter.calls, len(expected))
+                self.assertEqual([approach.time for approach in received],
+                                 sorted(approach.time for approach in expected))
+
+    def test_query_generates_approaches_in_time_order(self):
+        for db in (self.db, self.columnar):
+            with self.subTest(database=type(db).__name__):
+                times = [approach.time for approach in db.query(
+                    create_filters(start_date=datetime.date(2020, 6, 1), distance_max=0.1))]
+                self.assertGreater(len(times), 0)
+                self.assertEqual(times, sorted(times))
+
+    def test_query_with_conflicting_dates_is_empty(self):
+        filters = create_filters(start_date=datetime.date(2020, 3, 2),
+                                 end_date=datetime.date(2020, 3, 1))
+        self.assertEqual(list(self.db.query(filters)), [])
+        self.assertEqual(list(self.columnar.query(filters)), [])
+
+
+class TestQueryPlanner(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        shuffled = list(cls.approaches)
+        random.Random(2021).shuffle(shuffled)
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), shuffled)
+        cls.columnar = ColumnarNEODatabase(load_neos(TEST_NEO_FILE), shuffled)
+
+    def assertMatchesScan(self, db, filters):
+        expected = sorted((approach for approach in self.approaches
+                           if all(flt(approach) for flt in filters)),
+                          key=lambda approach: approach.time)
+        received = list(db.query(filters))
+        self.assertEqual([(approach.designation, approach.time) for approach in received],
+                         [(approach.designation, approach.time) for approach in expected])
+
+    def test_column_statistics_estimate_fractions(self):
+        statistics = ColumnStatistics([float(i) for i in range(1000)] + [float('nan')] * 1000)
+        self.assertAlmostEqual(statistics.fraction(operator.le, 99.5), 0.05, places=2)
+        self.assertAlmostEqual(statistics.fraction(operator.ge, 500), 0.25, places=2)
+        self.assertEqual(statistics.fraction(operator.ge, 2000), 0)
+
+        flags = ColumnStatistics([True, False], weights=[1, 3])
+        self.assertEqual(flags.fraction(operator.eq, True), 0.25)
+
+    def test_plan_uses_time_index_for_a_single_date(self):
+        filters = create_filters(date=datetime.date(2020, 3, 2), hazardous=False)
+        for db in (self.db, self.columnar):
+            with self.subTest(database=type(db).__name__):
+                self.assertEqual(db.plan(filters).access, QueryPlan.TIME_INDEX)
+                self.assertMatchesScan(db, filters)
+
+    def test_plan_scans_matching_neos_for_hazardous(self):
+        filters = create_filters(hazardous=True, distance_max=0.2)
+        for db in (self.db, self.columnar):
+            with self.subTest(database=type(db).__name__):
+                plan = db.plan(filters)
+                self.assertEqual(plan.access, QueryPlan.NEO_SCAN)
+                self.assertEqual([flt.column for flt in plan.access_filters], ['hazardous'])
+                self.assertMatchesScan(db, filters)
+
+    def test_neo_indexes_select_only_matching_neos(self):
+        filters = create_filters(hazardous=True, diameter_min=1)
+        expected = {neo.designation for neo in self.db._neos
+                    if neo.hazardous and neo.diameter >= 1}
+        self.assertGreater(len(expected), 0)
+        for db in (self.db, self.columnar):
+            with self.subTest(database=type(db).__name__):
+                positions, remaining = db._indexed_neos(filters)
+                self.assertLessEqual(len(positions), len(db._neos_by_hazardous[True]))
+                self.assertEqual({db._neos[position].designation
+                                  for position in db._matching_neos(filters)}, expected)
+
+    def test_neo_scan_only_visits_approaches_of_matching_neos(self):
+        filters = create_filters(hazardous=True, diameter_min=1)
+        expected = [approach for approach in self.approaches
+                    if all(flt(approach) for flt in filters)]
+        for db in (self.db, self.columnar):
+            with self.subTest(database=type(db).__name__):
+                counter = CountingFilter()
+                received = list(db.query(filters + [counter]))
+                self.assertEqual(counter.calls, len(expected))
+                self.assertEqual(received, sorted(received, key=lambda approach: approach.time))
+                self.assertEqual(len(received), len(expected))
+
+    def test_plan_orders_selective_filters_first(self):
+        filters = create_filters(velocity_max=1000, distance_max=0.001)
+        plan = self.db.plan(filters)
+        self.assertEqual(plan.access, QueryPlan.FULL_SCAN)
+        self.assertEqual([flt.column for flt in plan.filters], ['distance', 'velocity'])
+        self.assertMatchesScan(self.db, filters)
+
+    def test_plan_keeps_custom_filters(self):
+        counter = CountingFilter()
+        filters = create_filters(diameter_min=1) + [counter]
+        for db in (self.db, self.columnar):
+            with self.subTest(database=type(db).__name__):
+                self.assertMatchesScan(db, filters)
+
+    def test_explain_reports_actual_rows(self):
+        filters = create_filters(start_date=datetime.date(2020, 6, 1), velocity_min=20)
+        expected = sum(1 for approach in self.approaches
+                       if all(flt(approach) for flt in filters))
+        for db in (self.db, self.columnar):
+            with self.subTest(database=type(db).__name__):
+                explanation = db.explain(filters)
+                self.assertIn('estimated rows', explanation)
+                self.assertTrue(explanation.splitlines()[-1].endswith(
+                    f"actual rows: {expected:,})"))
+
+
+class TestKDTree(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        shuffled = list(cls.approaches)
+        random.Random(2022).shuffle(shuffled)
+        cls.databases = (NEODatabase(load_neos(TEST_NEO_FILE), shuffled),
+                         ColumnarNEODatabase(load_neos(TEST_NEO_FILE), cls.approaches))
+
+    def test_search_matches_brute_force(self):
+        rng = random.Random(2024)
+        distance = array.array('d', (rng.random() ** 3 for _ in range(5000)))
+        velocity = array.array('d', (rng.choice((rng.gauss(15, 5), 20.0)) for _ in range(5000)))
+        distance[7] = velocity[11] = float('nan')
+        tree = _KDTree([distance, velocity])
+        restored = _KDTree.from_columns(tree.columns())
+        for _ in range(200):
+            filters = []
+            for dimension, flt_class, values in ((0, DistanceFilter, distance),
+                                                 (1, VelocityFilter, velocity)):
+                if rng.random() < 0.7:
+                    op = rng.choice((operator.le, operator.lt, operator.ge, operator.gt,
+                                     operator.eq))
+                    filters.append((dimension, flt_class(op, values[rng.randrange(5000)])))
+            expected = [row for row in range(5000)
+                        if all(flt.op((distance, velocity)[dimension][row], flt.value)
+                               for dimension, flt in filters)]
+            with self.subTest(filters=filters):
+                self.assertEqual(sorted(tree.search(filters)), expected)
+                self.assertEqual(sorted(restored.search(filters)), expected)
+
+    def test_plan_uses_kd_tree_for_selective_boxes(self):
+        filters = create_filters(distance_max=0.01, velocity_min=15, hazardous=False)
+        expected = [approach for approach in self.approaches
+                    if all(flt(approach) for flt in filters)]
+        self.assertGreater(len(expected), 0)
+        for db in self.databases:
+            with self.subTest(database=type(db).__name__), \
+                    unittest.mock.patch.object(db, 'KD_TREE_BUILD_COST', 0):
+                plan = db.plan(filters)
+                self.assertEqual(plan.access, QueryPlan.KD_TREE)
+                self.assertEqual({flt.column for flt in plan.access_filters},
+                                 {'distance', 'velocity'})
+                received = list(db.query(filters))
+                self.assertEqual(sorted((a.designation, a.time) for a in received),
+                                 sorted((a.designation, a.time) for a in expected))
+                self.assertEqual(received, sorted(received, key=lambda approach: approach.time))
+                self.assertIn('k-d tree for', db.explain(filters))
+
+    def test_kd_tree_is_built_once_it_would_have_paid_off(self):
+        db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        filters = create_filters(distance_max=0.01, velocity_min=15)
+        accesses = [db.plan(filters).access for _ in range(db.KD_TREE_BUILD_COST + 1)]
+        self.assertEqual(accesses[0], QueryPlan.FULL_SCAN)
+        self.assertEqual(accesses[-1], QueryPlan.KD_TREE)
+
+        # A few new rows are checked alongside the tree.
+        db.ingest(approaches=[CloseApproach(designation='1685', time='2020-Jan-01 00:01',
+                                            distance='0.001', velocity='20')])
+        self.assertEqual(db.plan(filters).access, QueryPlan.KD_TREE)
+        self.assertIn(('1685', datetime.datetime(2020, 1, 1, 0, 1)),
+                      [(approach.designation, approach.time) for approach in db.query(filters)])
+
+        # Once too many rows aren't in the tree, it has to be built again.
+        count = int(2 * db.KD_TREE_MAX_STALE * len(db._approaches))
+        db.ingest(approaches=[CloseApproach(designation='1685',
+                                            time=f'2030-Jan-01 {i // 60:02}:{i % 60:02}',
+                                            distance='0.5', velocity='5')
+                              for i in range(count)])
+        self.assertEqual(db.plan(filters).access, QueryPlan.FULL_SCAN)
+
+    def test_kd_tree_sees_updated_rows(self):
+        filters = create_filters(distance_max=0.01, velocity_min=15)
+        for backend in (NEODatabase, ColumnarNEODatabase):
+            db = backend(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+            with self.subTest(database=backend.__name__), \
+                    unittest.mock.patch.object(db, 'KD_TREE_BUILD_COST', 0):
+                before = list(db.query(filters))
+                # Move an approach that doesn't match into the box, in place.
+                outside = next(approach for approach in db._approaches
+                               if approach.distance > 0.1)
+                counts = db.ingest(approaches=[CloseApproach(
+                    designation=outside.designation, time=outside.time.strftime('%Y-%b-%d %H:%M'),
+                    distance='0.001', velocity='20')])
+                self.assertEqual(counts['updated approaches'], 1)
+                self.assertEqual(db.plan(filters).access, QueryPlan.KD_TREE)
+                after = [(approach.designation, approach.time) for approach in db.query(filters)]
+                self.assertEqual(len(after), len(before) + 1)
+                self.assertIn((outside.designation, outside.time), after)
+
+
+class TestSortedQuery(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.databases = (NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)),
+                         ColumnarNEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)))
+
+    @staticmethod
+    def value(approach, column):
+        return approach.neo.diameter if column == 'diameter' else getattr(approach, column)
+
+    def expected(self, db, filters, column, descending, limit):
+        # Sort the results in time order, with unknown values last.
+        results = list(db.query(filters))
+        if column == 'time':
+            if descending:
+                results.reverse()
+        else:
+            known = [a for a in results if not math.isnan(self.value(a, column))]
+            unknown = [a for a in results if math.isnan(self.value(a, column))]
+            results = sorted(known, key=lambda a: self.value(a, column), reverse=descending)
+            results += unknown
+        return results[:limit] if limit else results
+
+    def test_sorted_query_matches_sorted(self):
+        for filters in (create_filters(),
+                        create_filters(start_date=datetime.date(2020, 6, 1), velocity_min=10),
+                        create_filters(hazardous=True),
+                        create_filters(diameter_min=0.5),
+                        # Most of these close approaches have an unknown diameter.
+                        create_filters(date=datetime.date(2020, 7, 29))):
+            for db in self.databases:
+                for column in ('time', 'distance', 'velocity', 'diameter'):
+                    for descending in (False, True):
+                        for limit in (None, 1, 5, 25):
+                            with self.subTest(database=type(db).__name__, filters=filters,
+                                              column=column, descending=descending, limit=limit):
+                                received = list(db.query(filters, sort_by=column,
+                                                         descending=descending, limit=limit))
+                                self.assertEqual(received,
+                                                 self.expected(db, filters, column, descending, limit))
+
+    def test_unknown_diameters_come_last(self):
+        for db in self.databases:
+            for descending in (False, True):
+                with self.subTest(database=type(db).__name__, descending=descending):
+                    received = list(db.query(sort_by='diameter', descending=descending))
+                    known = [not math.isnan(a.neo.diameter) for a in received]
+                    self.assertIn(True, known)
+                    self.assertIn(False, known)
+                    self.assertEqual(known, sorted(known, reverse=True))
+
+    def test_limit_without_sorting_keeps_time_order(self):
+        for db in self.databases:
+            self.assertEqual(list(db.query(limit=5)), list(db.query())[:5])
+            self.assertEqual(list(db.query(descending=True, limit=5)), list(db.query())[:-6:-1])
+
+    def test_sort_by_unknown_column_raises(self):
+        with self.assertRaises(ValueError):
+            self.databases[0].query(sort_by='name')
+
+
+class TestLazyModels(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+
+    def setUp(self):
+        self.lazy = NEODatabase(load_neos(TEST_NEO_FILE, lazy=True),
+                                load_approaches(TEST_CAD_FILE, lazy=True), lazy=True)
+
+    def test_fields_are_converted_on_first_access(self):
+        neo = self.lazy.get_neo_by_designation('1865')
+        approach = neo.approaches[0]
+        self.assertIsInstance(approach._time, str)
+        self.assertIsInstance(approach.time, datetime.datetime)
+        self.assertIsInstance(approach._time, datetime.datetime)
+        self.assertIsInstance(approach.distance, float)
+        self.assertIsInstance(neo.hazardous, bool)
+        # Other close approaches haven't been converted.
+        self.assertTrue(all(isinstance(other._time, str) for other in self.lazy._approaches
+                            if other.neo is not neo))
+
+    def test_lazy_fields_match_eager_fields(self):
+        for eager, lazy in zip(self.db._approaches, self.lazy._approaches):
+            self.assertEqual((eager.designation, eager.time, repr(eager.distance),
+                              repr(eager.velocity)),
+                             (lazy.designation, lazy.time, repr(lazy.distance),
+                              repr(lazy.velocity)))
+        for eager, lazy in zip(self.db._neos, self.lazy._neos):
+            self.assertEqual(repr(eager), repr(lazy))
+
+    def test_query_lazy_database(self):
+        filters = create_filters(start_date=datetime.date(2020, 3, 1), hazardous=True,
+                                 velocity_min=10)
+        expected = [(approach.designation, approach.time) for approach in self.db.query(filters)]
+        self.assertGreater(len(expected), 0)
+        self.assertEqual([(approach.designation, approach.time)
+                          for approach in self.lazy.query(filters)], expected)
+
+
+class TestAsyncQuery(unittest.TestCase):
+    CRITERIA = (
+        dict(),
+        dict(distance_max=0.1),
+        dict(velocity_min=15, distance_min=0.2),
+        dict(hazardous=True),
+        dict(start_date=datetime.date(2020, 3, 1), velocity_min=10),
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        cls.databases = (
+            NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)),
+            ColumnarNEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)),
+        )
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(self.loop.close)
+        self.addCleanup(asyncio.set_event_loop, None)
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    @staticmethod
+    async def collect(db, filters):
+        return [(approach.designation, approach.time) async for approach in db.aquery(filters)]
+
+    def test_concurrent_aqueries_match_query(self):
+        for db in self.databases:
+            with self.subTest(db=type(db).__name__):
+                filters = [create_filters(**criteria) for criteria in self.CRITERIA]
+                received = self.run_async(asyncio.gather(
+                    *[self.collect(db, flts) for flts in filters]))
+                expected = [[(approach.designation, approach.time)
+                             for approach in db.query(flts)] for flts in filters]
+                self.assertEqual(received, expected)
+
+    def test_concurrent_full_scans_share_a_pass(self):
+        for db in self.databases:
+            # Without the k-d tree, these queries are answered by full scans.
+            with self.subTest(db=type(db).__name__), \
+                    unittest.mock.patch.object(db, '_kd_tree', None), \
+                    unittest.mock.patch.object(db, 'KD_TREE_BUILD_COST', math.inf), \
+                    unittest.mock.patch.object(db, 'ASYNC_CHUNK_SIZE', 1000), \
+                    unittest.mock.patch.object(db, '_execute_shared',
+                                               wraps=db._execute_shared) as shared:
+                filters = [create_filters(distance_max=d) for d in (0.05, 0.1, 0.2)]
+                results = self.run_async(asyncio.gather(
+                    *[self.collect(db, flts) for flts in filters]))
+                chunks = -(-len(db._approaches) // 1000)
+                self.assertEqual(shared.call_count, chunks)
+                self.assertTrue(all(len(call[0][0]) == 3 for call in shared.call_args_list))
+                self.assertEqual([len(result) for result in results],
+                                 [len(list(db.query(flts))) for flts in filters])
+
+    def test_slow_consumer_holds_back_the_scan(self):
+        db = self.databases[0]
+
+        async def consume_one():
+            results = db.aquery()
+            first = await results.__anext__()
+            # Let the scan run as far ahead as it can.
+            for _ in range(50):
+                await asyncio.sleep(0.001)
+            await results.aclose()
+            return first
+
+        with unittest.mock.patch.object(db, 'ASYNC_CHUNK_SIZE', 100), \
+                unittest.mock.patch.object(db, '_execute_shared',
+                                           wraps=db._execute_shared) as shared:
+            first = self.run_async(consume_one())
+            self.assertIs(first, next(db.query()))
+            # At most the queued chunks, plus one in hand and one waiting to be put.
+            self.assertLessEqual(shared.call_count, db.ASYNC_QUEUE_DEPTH + 2)
+            self.assertLess(shared.call_count, len(db._approaches) // 100)
+
+    def test_cancelled_query_leaves_the_scan(self):
+        db = self.databases[0]
+
+        async def run():
+            slow = asyncio.ensure_future(self.collect(db, create_filters()))
+            fast = asyncio.ensure_future(self.collect(db, create_filters(distance_max=0.1)))
+            await asyncio.sleep(0)
+            slow.cancel()
+            return await fast
+
+        with unittest.mock.patch.object(db, 'ASYNC_CHUNK_SIZE', 100):
+            received = self.run_async(run())
+        self.assertEqual(received, [(approach.designation, approach.time) for approach
+                                    in db.query(create_filters(distance_max=0.1))])
+
+    def test_aget_neo(self):
+        db = self.databases[0]
+        self.assertIs(self.run_async(db.aget_neo_by_designation('433')),
+                      db.get_neo_by_designation('433'))
+        self.assertIs(self.run_async(db.aget_neo_by_name('Eros')), db.get_neo_by_name('Eros'))
+        self.assertIsNone(self.run_async(db.aget_neo_by_name('nope')))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,139 @@
+"""Check that a query server answers commands as they'd be answered locally.
+
+A server is started in a background thread, on a socket in a temporary
+directory, and sent commands with `server.request` - the same way the main
+module routes commands to it.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_server
+"""
+import io
+import os
+import pathlib
+import stat
+import tempfile
+import threading
+import unittest
+
+import main
+import server
+from database import NEODatabase
+from extract import load_neos, load_approaches
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+COMMON = ['--neofile', str(TEST_NEO_FILE), '--cadfile', str(TEST_CAD_FILE)]
+
+
+@unittest.skipUnless(server.AVAILABLE, "Unix sockets aren't available.")
+class TestServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        cls.parser, _, _ = main.make_parser()
+        cls.sources = [str(TEST_NEO_FILE), str(TEST_CAD_FILE)]
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = pathlib.Path(tmp.name)
+        self.path = self.tmp / 'neo.sock'
+
+        self.server = server.NEOServer(self.path, main.make_handler(self.db), self.sources)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def parse(self, *argv):
+        return self.parser.parse_args(COMMON + list(argv))
+
+    def remote(self, *argv, sources=None):
+        args = self.parse(*argv)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        status = server.request(self.path, args.cmd, main.encode_args(args),
+                                sources or self.sources, stdout=stdout, stderr=stderr)
+        return status, stdout.getvalue(), stderr.getvalue()
+
+    def local(self, *argv):
+        args = self.parse(*argv)
+        stdout, stderr = io.StringIO(), io.StringIO()
+        if args.cmd == 'inspect':
+            main.inspect(self.db, pdes=args.pdes, name=args.name, verbose=args.verbose,
+                         stdout=stdout, stderr=stderr,
+                         prefix=args.prefix, fuzzy=args.fuzzy, limit=args.limit)
+        else:
+            main.query(self.db, args, stdout=stdout, stderr=stderr)
+        return 0, stdout.getvalue(), stderr.getvalue()
+
+    def test_query_matches_local_query(self):
+        commands = (
+            ('query',),
+            ('query', '--date', '2020-01-01', '--limit', '0'),
+            ('query', '--start-date', '2020-03-01', '--max-distance', '0.1', '--hazardous'),
+            ('query', '--min-velocity', '20', '--explain'),
+            ('query', '--hazardous', '--sort-by', 'distance', '--desc', '--limit', '3'),
+        )
+        for argv in commands:
+            with self.subTest(argv=argv):
+                self.assertEqual(self.remote(*argv), self.local(*argv))
+
+    def test_inspect_matches_local_inspect(self):
+        for argv in (('inspect', '--pdes', '433', '--verbose'), ('inspect', '--name', 'nope'),
+                     ('inspect', '--prefix', '2020 a', '--limit', '3'), ('inspect', '--fuzzy', 'toro')):
+            with self.subTest(argv=argv):
+                self.assertEqual(self.remote(*argv), self.local(*argv))
+
+    def test_query_writes_output_file(self):
+        outfile = self.tmp / 'results.csv'
+        status, stdout, _ = self.remote('query', '--limit', '5', '--outfile', str(outfile))
+        self.assertEqual((status, stdout), (0, ''))
+        self.assertEqual(len(outfile.read_text().splitlines()), 6)
+
+    def test_server_with_other_data_is_unavailable(self):
+        status, _, _ = self.remote('query', sources=[str(TEST_NEO_FILE), '/elsewhere/cad.json'])
+        self.assertIsNone(status)
+
+    def test_no_server_is_unavailable(self):
+        args = self.parse('query')
+        self.assertIsNone(server.request(self.tmp / 'missing.sock', 'query',
+                                         main.encode_args(args), self.sources))
+        self.assertFalse(server.listening(self.tmp / 'missing.sock'))
+        self.assertTrue(server.listening(self.path))
+
+    def test_only_the_owner_may_connect(self):
+        self.assertEqual(stat.S_IMODE(self.path.stat().st_mode), 0o600)
+        # The process's umask is restored after the bind.
+        umask = os.umask(0o022)
+        os.umask(umask)
+        self.assertNotEqual(umask, 0o177)
+
+    def test_errors_are_reported(self):
+        args = self.parse('query')
+        stderr = io.StringIO()
+        status = server.request(self.path, 'frobnicate', main.encode_args(args),
+                                self.sources, stdout=io.StringIO(), stderr=stderr)
+        self.assertEqual(status, 1)
+        self.assertIn('Unknown command', stderr.getvalue())
+
+    def test_concurrent_requests(self):
+        expected = self.local('query', '--limit', '50')
+        results = [None] * 8
+
+        def run(i):
+            results[i] = self.remote('query', '--limit', '50')
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(results))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [expected] * len(results))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,177 @@
+"""Check that a linked `NEODatabase` survives a round trip through a snapshot.
+
+A snapshot should restore the same NEOs and close approaches, linked the same
+way, and should be ignored once the data files it was built from change.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_snapshot
+"""
+import contextlib
+import io
+import math
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+import main
+import snapshot
+from database import NEODatabase, ColumnarNEODatabase, QueryPlan
+from extract import load_neos, load_approaches
+from filters import create_filters
+from models import NearEarthObject, CloseApproach
+from snapshot import read_snapshot, write_snapshot, append_snapshot
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+def summarize_neo(neo):
+    diameter = None if math.isnan(neo.diameter) else neo.diameter
+    return (neo.designation, neo.name, diameter, neo.hazardous, len(neo.approaches))
+
+
+def summarize_approach(approach):
+    return (approach.designation, approach.time, approach.distance, approach.velocity,
+            approach.neo.designation)
+
+
+class TestSnapshot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = pathlib.Path(tmp.name)
+        self.sources = (self.tmp / 'neos.csv', self.tmp / 'cad.json')
+        shutil.copy(TEST_NEO_FILE, self.sources[0])
+        shutil.copy(TEST_CAD_FILE, self.sources[1])
+        self.path = self.tmp / 'neo.snapshot'
+        write_snapshot(self.db, self.path, self.sources)
+
+    def test_snapshot_restores_neos(self):
+        restored = read_snapshot(self.path, self.sources)
+        self.assertIsNotNone(restored)
+        self.assertEqual([summarize_neo(neo) for neo in restored._neos],
+                         [summarize_neo(neo) for neo in self.db._neos])
+
+    def test_snapshot_restores_linked_approaches(self):
+        restored = read_snapshot(self.path, self.sources)
+        self.assertIsNotNone(restored)
+        self.assertEqual([summarize_approach(approach) for approach in restored._approaches],
+                         [summarize_approach(approach) for approach in self.db._approaches])
+
+    def test_snapshot_restores_lookups(self):
+        restored = read_snapshot(self.path, self.sources)
+        adonis = restored.get_neo_by_designation('2101')
+        self.assertEqual(adonis.name, 'Adonis')
+        self.assertIs(restored.get_neo_by_name('Adonis'), adonis)
+
+    def test_snapshot_restores_kd_tree(self):
+        filters = create_filters(distance_max=0.05, velocity_min=20)
+        expected = [summarize_approach(approach) for approach in self.db.query(filters)]
+        for columnar in (False, True):
+            with self.subTest(columnar=columnar):
+                restored = read_snapshot(self.path, self.sources, columnar=columnar)
+                # The first query uses the tree, without renting it first.
+                self.assertEqual(restored.plan(filters, rent=False).access, QueryPlan.KD_TREE)
+                self.assertEqual([summarize_approach(approach)
+                                  for approach in restored.query(filters)], expected)
+
+    def delta(self):
+        neos = [NearEarthObject(designation='2101', name='Adonis', diameter='0.6',
+                                hazardous='N'),
+                NearEarthObject(designation='9999999', name='', diameter='', hazardous='Y')]
+        existing = self.db._approaches[10]
+        approaches = [
+            # A new NEO's close approach, inside the box of the filters below.
+            CloseApproach(designation='9999999', time='2020-Jun-01 12:00', distance='0.001',
+                          velocity='25'),
+            # An update of an existing close approach.
+            CloseApproach(designation=existing.designation,
+                          time=existing.time.strftime('%Y-%b-%d %H:%M'),
+                          distance='0.002', velocity='30'),
+        ]
+        return neos, approaches
+
+    def test_deltas_are_ingested_on_restore(self):
+        filters = create_filters(distance_max=0.05, velocity_min=20)
+        expected = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        size = self.path.stat().st_size
+        for neos, approaches in (self.delta(), ([], self.delta()[1][:1])):
+            expected.ingest(neos, approaches)
+            self.assertTrue(append_snapshot(self.path, neos, approaches))
+        # The snapshot itself is left as it is.
+        self.assertGreater(self.path.stat().st_size, size)
+        for columnar in (False, True):
+            with self.subTest(columnar=columnar):
+                restored = read_snapshot(self.path, self.sources, columnar=columnar)
+                self.assertEqual([summarize_neo(neo) for neo in restored._neos],
+                                 [summarize_neo(neo) for neo in expected._neos])
+                self.assertEqual(sorted(map(summarize_approach, restored._approaches)),
+                                 sorted(map(summarize_approach, expected._approaches)))
+                # The k-d tree is still used, alongside the ingested rows.
+                self.assertEqual(restored.plan(filters, rent=False).access, QueryPlan.KD_TREE)
+                self.assertEqual(list(map(summarize_approach, restored.query(filters))),
+                                 list(map(summarize_approach, expected.query(filters))))
+
+    def test_partial_delta_is_ignored(self):
+        neos, approaches = self.delta()
+        self.assertTrue(append_snapshot(self.path, neos, approaches))
+        complete = self.path.read_bytes()
+        with open(self.path, 'ab') as f:
+            f.write(snapshot.DELTA_MAGIC + b'\x40\0\0\0{"neos"')
+        self.assertEqual(len(read_snapshot(self.path, self.sources)._neos),
+                         len(self.db._neos) + 1)
+
+        # The next delta replaces it.
+        self.assertTrue(append_snapshot(self.path, neos, approaches))
+        self.assertTrue(self.path.read_bytes().startswith(complete))
+        self.assertEqual(len(read_snapshot(self.path, self.sources)._neos),
+                         len(self.db._neos) + 1)
+
+    def test_large_deltas_are_not_appended(self):
+        approaches = list(self.db._approaches)
+        count = int(snapshot.MAX_DELTA_FRACTION * (len(self.db._neos) + len(approaches)))
+        size = self.path.stat().st_size
+        self.assertTrue(append_snapshot(self.path, (), approaches[:count // 2]))
+        self.assertFalse(append_snapshot(self.path, (), approaches[:count - count // 2 + 1]))
+        with self.assertRaises(FileNotFoundError):
+            append_snapshot(self.tmp / 'missing.snapshot', (), approaches[:1])
+        with self.assertRaises(ValueError):
+            append_snapshot(self.sources[0], (), approaches[:1])
+
+        # Saving the database afresh folds the deltas in.
+        write_snapshot(self.db, self.path, self.sources)
+        self.assertEqual(self.path.stat().st_size, size)
+
+    def test_snapshot_is_stale_when_a_source_changes(self):
+        stat = self.sources[1].stat()
+        os.utime(self.sources[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertIsNone(read_snapshot(self.path, self.sources))
+
+    def test_main_restores_into_columns(self):
+        parser, _, _ = main.make_parser()
+        args = parser.parse_args(['--neofile', str(self.sources[0]),
+                                  '--cadfile', str(self.sources[1]),
+                                  '--snapshot', str(self.path), 'inspect', '--pdes', '433'])
+        with contextlib.redirect_stdout(io.StringIO()):
+            restored = main.load_database(args)
+        self.assertIsInstance(restored, ColumnarNEODatabase)
+        self.assertEqual([summarize_approach(approach) for approach in restored._approaches],
+                         [summarize_approach(approach) for approach in self.db._approaches])
+
+    def test_missing_or_corrupt_snapshot_is_ignored(self):
+        self.assertIsNone(read_snapshot(self.tmp / 'missing.snapshot', self.sources))
+        self.path.write_bytes(b'not a snapshot')
+        self.assertIsNone(read_snapshot(self.path, self.sources))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -13,21 +13,25 @@ To run these tests from the project root, run:
 
 These tests should pass when Task 4 is complete.
 """
+import bz2
 import collections
 import collections.abc
 import contextlib
 import csv
 import datetime
+import gzip
 import io
 import json
+import lzma
 import pathlib
+import tempfile
 import unittest
 import unittest.mock
 
 
 from extract import load_neos, load_approaches
 from database import NEODatabase
-from write import write_to_csv, write_to_json
+from write import output_format, write_to_csv, write_to_json, write_to_jsonl
 
 
 TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
@@ -226,5 +230,129 @@ class TestWriteToJSON(unittest.TestCase):
         self.assertIsInstance(approach['neo']['potentially_hazardous'], bool)
 
 
+class TestStreamingJSON(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = build_results(20)
+
+    @unittest.mock.patch('write.open')
+    def write(self, results, mock_file, **kwargs):
+        with UncloseableStringIO() as buf:
+            mock_file.return_value = buf
+            write_to_json(results, None, **kwargs)
+            return buf.getvalue()
+
+    def test_json_matches_json_dump_with_indent(self):
+        for n in (0, 1, 20):
+            with self.subTest(results=n):
+                value = self.write(self.results[:n])
+                self.assertEqual(value, json.dumps(json.loads(value), indent=2))
+                self.assertEqual(len(json.loads(value)), n)
+
+    def test_compact_json_has_the_same_data(self):
+        value = self.write(self.results, compact=True)
+        self.assertNotIn('\n', value)
+        self.assertEqual(value, json.dumps(json.loads(value), separators=(',', ':')))
+        self.assertEqual(json.loads(value), json.loads(self.write(self.results)))
+
+    def test_json_is_written_as_results_arrive(self):
+        written = []
+
+        def results():
+            for result in self.results[:3]:
+                yield result
+                written.append(buf.getvalue().count('datetime_utc'))
+
+        with unittest.mock.patch('write.open') as mock_file, UncloseableStringIO() as buf:
+            mock_file.return_value = buf
+            write_to_json(results(), None)
+        self.assertEqual(written, [1, 2, 3])
+
+
+class TestBatchedCSV(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = build_results(20)
+
+    @unittest.mock.patch('write.open')
+    def write(self, results, mock_file):
+        with UncloseableStringIO() as buf:
+            mock_file.return_value = buf
+            write_to_csv(results, None)
+            return buf.getvalue()
+
+    def test_csv_matches_dict_writer(self):
+        fieldnames = ('datetime_utc', 'distance_au', 'velocity_km_s',
+                      'designation', 'name', 'diameter_km', 'potentially_hazardous')
+        with io.StringIO() as buf:
+            writer = csv.DictWriter(buf, fieldnames=fieldnames, lineterminator='\n')
+            writer.writeheader()
+            for result in self.results:
+                writer.writerow(dict(zip(fieldnames, (
+                    result.time, result.distance, result.velocity, result.designation,
+                    result.neo.name, result.neo.diameter, result.neo.hazardous))))
+            expected = buf.getvalue()
+
+        for batch_size in (1, 3, 20, 4096):
+            with self.subTest(batch_size=batch_size), \
+                    unittest.mock.patch('write.CSV_BATCH_SIZE', batch_size):
+                self.assertEqual(self.write(self.results), expected)
+
+    def test_csv_of_no_results_has_only_a_header(self):
+        self.assertEqual(self.write([]).count('\n'), 1)
+
+
+class TestOutputFormats(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = build_results(20)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.root = pathlib.Path(self.tmp.name)
+
+    def test_output_format_ignores_compression(self):
+        self.assertEqual(output_format(pathlib.Path('out.csv')), 'csv')
+        self.assertEqual(output_format(pathlib.Path('out.JSON.gz')), 'json')
+        self.assertEqual(output_format(pathlib.Path('out.ndjson.xz')), 'jsonl')
+        self.assertEqual(output_format(pathlib.Path('out.jsonl.bz2')), 'jsonl')
+        self.assertIsNone(output_format(pathlib.Path('out.gz')))
+        self.assertIsNone(output_format(pathlib.Path('out.txt')))
+
+    def test_jsonl_has_one_approach_per_line(self):
+        path = self.root / 'out.jsonl'
+        write_to_jsonl(self.results, path)
+        lines = path.read_text().splitlines()
+        self.assertEqual(len(lines), len(self.results))
+
+        expected = self.root / 'out.json'
+        write_to_json(self.results, expected)
+        self.assertEqual([json.loads(line) for line in lines], json.loads(expected.read_text()))
+
+    def test_compressed_output_matches_plain_output(self):
+        writers = (('csv', write_to_csv), ('json', write_to_json), ('jsonl', write_to_jsonl))
+        for suffix, writer in writers:
+            plain = self.root / f'out.{suffix}'
+            writer(self.results, plain)
+            for compression, module in (('gz', gzip), ('bz2', bz2), ('xz', lzma)):
+                for background in (False, True):
+                    with self.subTest(suffix=suffix, compression=compression,
+                                      background=background):
+                        path = self.root / f'out.{suffix}.{compression}'
+                        writer(self.results, path, background=background)
+                        self.assertEqual(module.decompress(path.read_bytes()),
+                                         plain.read_bytes())
+
+    def test_background_writer_reports_errors(self):
+        def results():
+            yield from self.results[:2]
+            raise RuntimeError("query failed")
+
+        path = self.root / 'out.jsonl.gz'
+        with self.assertRaises(RuntimeError):
+            write_to_jsonl(results(), path, background=True)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,20 +1,151 @@
-"""Write a stream of close approaches to CSV or to JSON.
+"""Write a stream of close approaches to CSV, to JSON or to JSON Lines.
 
-This module exports two functions: `write_to_csv` and `write_to_json`, each of
-which accept an `results` stream of close approaches and a path to which to
-write the data.
+This module exports three functions: `write_to_csv`, `write_to_json` and
+`write_to_jsonl`, each of which accept an `results` stream of close approaches
+and a path to which to write the data.
 
 These functions are invoked by the main module with the output of the `limit`
 function and the filename supplied by the user at the command line. The file's
-extension determines which of these functions is used.
+extension determines which of these functions is used (see `output_format`).
+
+If the filename ends in `.gz`, `.bz2` or `.xz`, the output is compressed to
+match. With `background=True`, the compression (and the writing) happens in a
+background thread, overlapping with finding the results - the compressors
+release the GIL while they work.
 """
+import bz2
 import csv
+import gzip
+import itertools
 import json
+import lzma
+import os
+import queue
+import threading
 
 from helpers import datetime_to_str
 
 
-def write_to_csv(results, filename, delimiter=","):
+# The modules that compress files with each suffix.
+COMPRESSORS = {'.gz': gzip, '.bz2': bz2, '.xz': lzma}
+
+# The size of the buffer under a plain output file.
+BUFFER_SIZE = 1 << 20
+
+# How many CSV rows to format before writing them all at once.
+CSV_BATCH_SIZE = 4096
+
+# The formats that `output_format` recognizes.
+FORMATS = {'.csv': 'csv', '.json': 'json', '.jsonl': 'jsonl',
+           '.ndjson': 'jsonl'}
+
+
+def output_format(filename):
+    """Return the format of an output file from its name.
+
+    :param filename: A Path-like object, such as `results.csv.gz`.
+    :return: One of 'csv', 'json' or 'jsonl', or None if it's not recognized.
+    """
+    stem, suffix = os.path.splitext(os.fspath(filename))
+    if suffix.lower() in COMPRESSORS:
+        stem, suffix = os.path.splitext(stem)
+    return FORMATS.get(suffix.lower())
+
+
+class _BackgroundWriter:
+    """A text file wrapper that writes to its file in a background thread.
+
+    Text is collected into chunks of about `CHUNK_SIZE` characters, which are
+    handed to the thread through a bounded queue, so a slow file (such as a
+    compressed one) applies back-pressure rather than buffering without limit.
+    An error in the thread is raised by the next `write`, or by `close`.
+    """
+
+    CHUNK_SIZE = 1 << 16
+    DEPTH = 8
+
+    def __init__(self, f):
+        """Create a new `_BackgroundWriter` around an open text file."""
+        self._f = f
+        self._pending = []
+        self._size = 0
+        self._error = None
+        self._queue = queue.Queue(self.DEPTH)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Write the queued chunks to the file, until the end is queued."""
+        while True:
+            chunk = self._queue.get()
+            if chunk is None:
+                return
+            if self._error is None:
+                try:
+                    self._f.write(chunk)
+                except BaseException as err:
+                    # Keep draining the queue, so the writer never blocks.
+                    self._error = err
+
+    def _put(self, chunk):
+        """Queue a chunk of text for the thread."""
+        if self._error is not None:
+            raise self._error
+        self._queue.put(chunk)
+
+    def write(self, text):
+        """Write some text (eventually)."""
+        self._pending.append(text)
+        self._size += len(text)
+        if self._size >= self.CHUNK_SIZE:
+            self._put(''.join(self._pending))
+            self._pending = []
+            self._size = 0
+        return len(text)
+
+    def close(self):
+        """Write any remaining text, wait for the thread and close the file."""
+        try:
+            if self._pending:
+                self._put(''.join(self._pending))
+                self._pending = []
+        finally:
+            self._queue.put(None)
+            self._thread.join()
+            self._f.close()
+        if self._error is not None:
+            raise self._error
+
+    def __enter__(self):
+        """Return this writer, in a `with` statement."""
+        return self
+
+    def __exit__(self, *exc_info):
+        """Close this writer, at the end of a `with` statement."""
+        self.close()
+
+
+def _open(filename, newline=None, background=False):
+    """Open an output file for writing text, compressed to match its name.
+
+    :param filename: A Path-like object pointing to the output file.
+    :param newline: As for `open`.
+    :param background: Whether to write (and compress) in a background thread.
+    :return: A text file object, for use in a `with` statement.
+    """
+    compressor = None
+    if filename is not None:
+        extension = os.path.splitext(os.fspath(filename))[1]
+        compressor = COMPRESSORS.get(extension.lower())
+    if compressor is None:
+        f = open(filename, 'w', buffering=BUFFER_SIZE, encoding='UTF8',
+                 newline=newline)
+    else:
+        f = compressor.open(filename, 'wt', encoding='UTF8', newline=newline)
+    return _BackgroundWriter(f) if background else f
+
+
+def write_to_csv(results, filename, delimiter=",", background=False):
     """Write an iterable of `CloseApproach` objects to a CSV file.
 
     The precise output specification is in `README.md`. Roughly, each
@@ -24,35 +155,52 @@ def write_to_csv(results, filename, delimiter=","):
     :param results: An iterable of `CloseApproach` objects.
     :param filename: A Path-like object pointing to where the data should
                      be saved.
+    :param background: Whether to write (and compress) in a background thread.
     """
     fieldnames = (
         'datetime_utc', 'distance_au', 'velocity_km_s',
         'designation', 'name', 'diameter_km', 'potentially_hazardous'
     )
 
-    with open(filename, 'w', encoding='UTF8', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=fieldnames, delimiter=',',
-                                lineterminator='\n')
+    with _open(filename, newline='', background=background) as f:
+        writer = csv.writer(f, delimiter=',', lineterminator='\n')
 
         # write header into file first
-        writer.writeheader()
+        writer.writerow(fieldnames)
 
-        # iterate through results and add to output row
-        for result in results:
-            row_dict = {}
+        # format the results as tuples of the fields, in order, a batch at a
+        # time - `csv.writer` formats each value just as `csv.DictWriter` did
+        results = iter(results)
+        while True:
+            batch = [
+                (result.time, result.distance, result.velocity,
+                 result.designation, neo.name, neo.diameter, neo.hazardous)
+                for result in itertools.islice(results, CSV_BATCH_SIZE)
+                for neo in (result.neo,)
+            ]
+            if not batch:
+                break
+            writer.writerows(batch)
 
-            row_dict['datetime_utc'] = result.time
-            row_dict['distance_au'] = result.distance
-            row_dict['velocity_km_s'] = result.velocity
-            row_dict['designation'] = result.designation
-            row_dict['name'] = result.neo.name
-            row_dict['diameter_km'] = result.neo.diameter
-            row_dict['potentially_hazardous'] = result.neo.hazardous
 
-            writer.writerow(row_dict)
+def _serialize(result):
+    """Serialize a `CloseApproach`, and its NEO, for JSON output."""
+    # dict is dictionary serializing approaches
+    # with embedded dictionary serialized neo
+    return dict(
+        datetime_utc=datetime_to_str(result.time),
+        distance_au=result.distance,
+        velocity_km_s=result.velocity,
+        neo={
+            "designation": result.neo.designation,
+            "name": result.neo.name,
+            "diameter_km": result.neo.diameter,
+            "potentially_hazardous": result.neo.hazardous
+        }
+    )
 
 
-def write_to_json(results, filename):
+def write_to_json(results, filename, compact=False, background=False):
     """Write an iterable of `CloseApproach` objects to a JSON file.
 
     The precise output specification is in `README.md`. Roughly, the output
@@ -60,29 +208,53 @@ def write_to_json(results, filename):
     to their values and the 'neo' key mapping to a dictionary of the associated
     NEO's attributes.
 
+    The list is written one close approach at a time, as each arrives from
+    `results`, so memory use doesn't grow with the number of results. The
+    output is exactly what `json.dump(..., indent=2)` would produce for the
+    whole list (or, if `compact`, for `separators=(',', ':')`).
+
     :param results: An iterable of `CloseApproach` objects.
     :param filename: A Path-like object pointing to where the data should be
     saved.
+    :param compact: Whether to leave out the indentation and spaces.
+    :param background: Whether to write (and compress) in a background thread.
     """
+    if compact:
+        encode = json.JSONEncoder(separators=(',', ':')).encode
+        opening, separator, closing = '[', ',', ']'
+    else:
+        encoder = json.JSONEncoder(indent=2)
+        # Each element is indented one level deeper than on its own.
+        def encode(obj):
+            return encoder.encode(obj).replace('\n', '\n  ')
+        opening, separator, closing = '[\n  ', ',\n  ', '\n]'
+
     # opening file to where data should be saved
-    with open(filename, 'w') as f:
-        # list to capture iteration
-        ouput = []
+    with _open(filename, background=background) as f:
+        first = True
         # iteration through the results
         for result in results:
-            # dict is dictionary serializing approaches
-            # with embedded dictionary serialized neo
-            results_dict = dict(
-                datetime_utc=datetime_to_str(result.time),
-                distance_au=result.distance,
-                velocity_km_s=result.velocity,
-                neo={
-                    "designation": result.neo.designation,
-                    "name": result.neo.name,
-                    "diameter_km": result.neo.diameter,
-                    "potentially_hazardous": result.neo.hazardous
-                }
-            )
-            ouput.append(results_dict)
-        # write iterated output to file f
-        json.dump(ouput, f, indent=2)
+            # write each serialized approach to file f as soon as it's ready
+            f.write(opening if first else separator)
+            f.write(encode(_serialize(result)))
+            first = False
+        f.write('[]' if first else closing)
+
+
+def write_to_jsonl(results, filename, background=False):
+    """Write an iterable of `CloseApproach` objects to a JSON Lines file.
+
+    Each line of the file is one close approach, serialized (compactly) as
+    the elements of `write_to_json`'s list are. Each line stands alone, so
+    the file can be read, or split, line by line.
+
+    :param results: An iterable of `CloseApproach` objects.
+    :param filename: A Path-like object pointing to where the data should be
+                     saved.
+    :param background: Whether to write (and compress) in a background thread.
+    """
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    with _open(filename, background=background) as f:
+        for result in results:
+            f.write(encode(_serialize(result)))
+            f.write('\n')